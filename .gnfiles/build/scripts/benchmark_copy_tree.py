@@ -0,0 +1,164 @@
+#
+# Copyright © 2025 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+# Benchmarks the copying of fs_utils on a synthetic tree, against the copying
+# of one file at a time by shutil.
+#
+#   benchmark_copy_tree.py --work-dir /tmp/copy_bench --files 50000
+#
+import argparse
+import os
+import random
+import shutil
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ),
+)
+
+from build.scripts import fs_utils  # noqa: E402
+
+
+class ArgumentInfo(argparse.Namespace):
+    def __init__(self):
+        super().__init__()
+
+        self.work_dir: str
+        self.files: int
+        self.files_per_dir: int
+        self.large_files: int
+        self.large_file_mb: int
+        self.jobs: list[int]
+
+
+def create_tree(args: ArgumentInfo, src_dir: str) -> int:
+    """Creates the source tree: small files of 0-16 KB like resources and
+    sources, and a few large files like shared libraries. Returns the total
+    size."""
+
+    rng = random.Random(0)
+    total_size = 0
+
+    for i in range(args.files):
+        sub_dir = os.path.join(
+            src_dir,
+            f"d{i // (args.files_per_dir * 16)}",
+            f"d{i // args.files_per_dir}",
+        )
+        if i % args.files_per_dir == 0:
+            os.makedirs(sub_dir, exist_ok=True)
+
+        size = rng.randint(0, 16 * 1024)
+        with open(os.path.join(sub_dir, f"f{i}.txt"), "wb") as f:
+            f.write(os.urandom(size))
+        total_size += size
+
+    large_dir = os.path.join(src_dir, "lib")
+    os.makedirs(large_dir, exist_ok=True)
+    chunk = os.urandom(1024 * 1024)
+    for i in range(args.large_files):
+        with open(os.path.join(large_dir, f"lib{i}.so"), "wb") as f:
+            for _ in range(args.large_file_mb):
+                f.write(chunk)
+        total_size += args.large_file_mb * 1024 * 1024
+
+    return total_size
+
+
+def copy_tree_serially(src_dir: str, dst_dir: str) -> None:
+    # What fs_utils.copy_tree used to do.
+    for name in os.listdir(src_dir):
+        src_item_path = os.path.join(src_dir, name)
+        dst_item_path = os.path.join(dst_dir, name)
+        if os.path.isdir(src_item_path):
+            os.makedirs(dst_item_path, exist_ok=True)
+            copy_tree_serially(src_item_path, dst_item_path)
+        else:
+            shutil.copy(src_item_path, dst_item_path)
+            os.utime(dst_item_path)
+
+
+def measure(
+    name: str, func, dst_dir: str, total_size: int, clean: bool = True
+) -> None:
+    if clean:
+        if os.path.exists(dst_dir):
+            shutil.rmtree(dst_dir)
+        os.makedirs(dst_dir)
+
+    start = time.monotonic()
+    func()
+    elapsed = time.monotonic() - start
+
+    mb_per_s = total_size / 1024 / 1024 / elapsed
+    print(f"  {name:<28} {elapsed:>8.2f} s {mb_per_s:>10.1f} MB/s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the copying of a synthetic tree."
+    )
+    parser.add_argument("--work-dir", type=str, required=True)
+    parser.add_argument("--files", type=int, default=50000)
+    parser.add_argument("--files-per-dir", type=int, default=100)
+    parser.add_argument("--large-files", type=int, default=4)
+    parser.add_argument("--large-file-mb", type=int, default=64)
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        action="append",
+        help="The number of copying threads to measure, could be repeated",
+    )
+
+    arg_info = ArgumentInfo()
+    args = parser.parse_args(namespace=arg_info)
+
+    src_dir = os.path.join(args.work_dir, "src")
+    dst_dir = os.path.join(args.work_dir, "dst")
+    manifest_dir = os.path.join(args.work_dir, "sync_manifests")
+
+    if os.path.exists(args.work_dir):
+        shutil.rmtree(args.work_dir)
+
+    total_size = create_tree(args, src_dir)
+    print(
+        f"{args.files} files and {args.large_files} x {args.large_file_mb} MB"
+        f" files, {total_size / 1024 / 1024:.0f} MB in total"
+    )
+
+    measure(
+        "shutil, one at a time",
+        lambda: copy_tree_serially(src_dir, dst_dir),
+        dst_dir,
+        total_size,
+    )
+
+    for jobs in dict.fromkeys(args.jobs or [1, fs_utils.get_copy_jobs()]):
+
+        def copy(jobs=jobs) -> None:
+            os.environ[fs_utils.COPY_JOBS_ENV] = str(jobs)
+            fs_utils.copy_tree(src_dir, dst_dir)
+
+        measure(f"fs_utils, {jobs} threads", copy, dst_dir, total_size)
+
+    os.environ.pop(fs_utils.COPY_JOBS_ENV, None)
+
+    def sync() -> None:
+        fs_utils.sync_tree(src_dir, dst_dir, manifest_dir)
+
+    measure("fs_utils, first sync", sync, dst_dir, total_size)
+    measure("fs_utils, no-op sync", sync, dst_dir, total_size, clean=False)
+
+    shutil.rmtree(args.work_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+#
+# Copyright © 2025 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import argparse
+import json
+import os
+import re
+import sys
+from build.scripts import ninja_log, ninja_manifest
+
+
+STATS_FILE = "tgn_stats.json"
+
+# The internal targets created by the `ten_package` and `ten_package_test`
+# templates, see ten_package.gni.
+_TEN_PACKAGE_TARGET_PATTERN = re.compile(
+    r"^(.*)_(?:copy_build_result|resource_\d+|shared_library|executable)$"
+)
+
+
+class ArgumentInfo(argparse.Namespace):
+    def __init__(self):
+        super().__init__()
+
+        self.out_dir: str
+        self.top: int
+        self.json: bool
+
+
+def get_ten_package_label(label: str) -> str:
+    """Returns the label of the `ten_package` which the target belongs to, or
+    "" if it is not an internal target of a `ten_package`."""
+
+    label_dir, _, name = label.partition(":")
+    match = _TEN_PACKAGE_TARGET_PATTERN.match(name)
+    if not match:
+        return ""
+    return f"{label_dir}:{match.group(1)}"
+
+
+def _kind_of(category: str) -> str:
+    if category in ninja_manifest.COMPILE_CATEGORIES:
+        return "compile"
+    if category in ninja_manifest.LINK_CATEGORIES:
+        return "link"
+    return "action"
+
+
+def collect_build_stats(out_dir: str, top: int = 10) -> dict:
+    """Collects the timing of every edge of the last build in the out dir."""
+
+    builds = ninja_log.read_ninja_log(out_dir)
+    entries = builds[-1] if builds else []
+
+    manifest = None
+    if os.path.exists(os.path.join(out_dir, "build.ninja")):
+        manifest = ninja_manifest.parse_ninja_manifest(out_dir)
+    edges_by_output = manifest.edges_by_output() if manifest else {}
+
+    records = []
+    for entry in entries:
+        edge = edges_by_output.get(entry.outputs[0])
+        if manifest:
+            category = ninja_manifest.classify_edge(edge, manifest)
+        else:
+            category = "OTHER"
+
+        records.append(
+            {
+                "output": entry.outputs[0],
+                "duration_ms": entry.duration_ms,
+                "category": category,
+                "kind": _kind_of(category),
+                "label": edge.label if edge else "",
+            }
+        )
+
+    wall_time_ms = 0
+    if entries:
+        wall_time_ms = max(e.end_ms for e in entries) - min(
+            e.start_ms for e in entries
+        )
+    cpu_time_ms = sum(e.duration_ms for e in entries)
+
+    slowest: dict[str, list[dict]] = {}
+    for kind in ["compile", "link", "action"]:
+        slowest[kind] = sorted(
+            (r for r in records if r["kind"] == kind),
+            key=lambda r: r["duration_ms"],
+            reverse=True,
+        )[:top]
+
+    by_category: dict[str, dict] = {}
+    by_package: dict[str, dict] = {}
+    for record in records:
+        category = by_category.setdefault(
+            record["category"],
+            {
+                "category": record["category"],
+                "count": 0,
+                "total_ms": 0,
+                "max_ms": 0,
+            },
+        )
+        category["count"] += 1
+        category["total_ms"] += record["duration_ms"]
+        category["max_ms"] = max(category["max_ms"], record["duration_ms"])
+
+        package_label = get_ten_package_label(record["label"])
+        if package_label:
+            package = by_package.setdefault(
+                package_label,
+                {
+                    "package": package_label,
+                    "count": 0,
+                    "total_ms": 0,
+                    "compile_ms": 0,
+                    "link_ms": 0,
+                    "action_ms": 0,
+                },
+            )
+            package["count"] += 1
+            package["total_ms"] += record["duration_ms"]
+            package[record["kind"] + "_ms"] += record["duration_ms"]
+
+    return {
+        "out_dir": out_dir,
+        "edges": len(records),
+        "wall_time_ms": wall_time_ms,
+        "cpu_time_ms": cpu_time_ms,
+        "parallelism": (
+            round(cpu_time_ms / wall_time_ms, 2) if wall_time_ms else 0
+        ),
+        "slowest": slowest,
+        "by_category": sorted(
+            by_category.values(), key=lambda c: c["total_ms"], reverse=True
+        ),
+        "by_package": sorted(
+            by_package.values(), key=lambda p: p["total_ms"], reverse=True
+        ),
+    }
+
+
+def _format_ms(ms: int) -> str:
+    return f"{ms / 1000:.2f}s"
+
+
+def format_build_stats(stats: dict) -> str:
+    lines = []
+
+    if not stats["edges"]:
+        lines.append(f"No build recorded in {stats['out_dir']}.")
+        return "\n".join(lines)
+
+    lines.append(f"Build stats of {stats['out_dir']}")
+    lines.append(
+        f"  edges: {stats['edges']}  wall time:"
+        f" {_format_ms(stats['wall_time_ms'])}  cpu time:"
+        f" {_format_ms(stats['cpu_time_ms'])}  parallelism:"
+        f" {stats['parallelism']:.2f}"
+    )
+
+    for kind, records in stats["slowest"].items():
+        if not records:
+            continue
+        lines.append("")
+        lines.append(f"Slowest {kind} edges:")
+        for record in records:
+            lines.append(
+                f"  {_format_ms(record['duration_ms']):>9}"
+                f"  {record['category']:<8}  {record['output']}"
+            )
+
+    lines.append("")
+    lines.append("By rule:")
+    for category in stats["by_category"]:
+        lines.append(
+            f"  {_format_ms(category['total_ms']):>9}"
+            f"  {category['count']:>6} edges"
+            f"  max {_format_ms(category['max_ms']):>8}"
+            f"  {category['category']}"
+        )
+
+    if stats["by_package"]:
+        lines.append("")
+        lines.append("By ten_package:")
+        for package in stats["by_package"]:
+            lines.append(
+                f"  {_format_ms(package['total_ms']):>9}"
+                f"  {package['count']:>6} edges"
+                f"  compile {_format_ms(package['compile_ms']):>8}"
+                f"  link {_format_ms(package['link_ms']):>8}"
+                f"  action {_format_ms(package['action_ms']):>8}"
+                f"  {package['package']}"
+            )
+
+    return "\n".join(lines)
+
+
+def write_build_stats(out_dir: str, stats: dict) -> str:
+    stats_file = os.path.join(out_dir, STATS_FILE)
+    with open(stats_file, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+    return stats_file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report the build time of each edge from '.ninja_log'."
+    )
+    parser.add_argument("--out-dir", type=str, required=True)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        default=False,
+        help="Print the report as JSON",
+    )
+
+    arg_info = ArgumentInfo()
+    args = parser.parse_args(namespace=arg_info)
+
+    result = collect_build_stats(os.path.abspath(args.out_dir), args.top)
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        print(format_build_stats(result))
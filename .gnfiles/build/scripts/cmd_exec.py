@@ -4,9 +4,19 @@
 # Licensed under the Apache License, Version 2.0, with certain conditions.
 # Refer to the "LICENSE" file in the root directory for more information.
 #
+import abc
+import codecs
+import collections
+import re
 import sys
 import os
+import signal
+import stat
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 
 
 # `psutil` is not a builtin module, so use it if it exists.
@@ -86,13 +96,197 @@ def run_cmd(argv: list[str], log_level: int = 0) -> tuple[int, str]:
     return returncode, output_text
 
 
+# The lines of the output kept by run_cmd_realtime(capture="tail").
+DEFAULT_TAIL_LINES = 200
+
+# How long a process group is given to exit after SIGTERM, before SIGKILL.
+KILL_GRACE_PERIOD = 5
+
+
+class OutputSink(abc.ABC):
+    """Receives the lines of the output of a command run by
+    run_cmd_realtime(), without the line endings."""
+
+    @abc.abstractmethod
+    def write_line(self, line: str) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class ConsoleSink(OutputSink):
+    def __init__(self, prefix: str = "", stream=None) -> None:
+        self.prefix = prefix
+        self.stream = stream
+
+    def write_line(self, line: str) -> None:
+        stream = self.stream or sys.stdout
+        stream.write(f"{self.prefix}{line}\n")
+        stream.flush()
+
+
+class LogFileSink(OutputSink):
+    def __init__(self, path: str) -> None:
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write_line(self, line: str) -> None:
+        self.file.write(line)
+        self.file.write("\n")
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class RingBufferSink(OutputSink):
+    """Keeps the last 'max_lines' lines, e.g. to show the tail of the output
+    of a failed command."""
+
+    def __init__(self, max_lines: int = DEFAULT_TAIL_LINES) -> None:
+        self.lines: collections.deque[str] = collections.deque(
+            maxlen=max_lines
+        )
+
+    def write_line(self, line: str) -> None:
+        self.lines.append(line)
+
+    def text(self) -> str:
+        return "".join(f"{line}\n" for line in self.lines)
+
+
+class CollectSink(OutputSink):
+    def __init__(self) -> None:
+        self.lines: list[str] = []
+
+    def write_line(self, line: str) -> None:
+        self.lines.append(line)
+
+    def text(self) -> str:
+        return "".join(f"{line}\n" for line in self.lines)
+
+
+def _kill_process_group(child: subprocess.Popen) -> None:
+    """Kills the command and all the processes it started."""
+
+    if sys.platform == "win32":
+        if child.poll() is not None:
+            return
+        subprocess.call(
+            ["taskkill", "/T", "/F", "/PID", str(child.pid)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        return
+
+    # The command is the leader of its own process group, see
+    # run_cmd_realtime(), the group might outlive it.
+    try:
+        os.killpg(child.pid, signal.SIGTERM)
+    except OSError:
+        return
+
+    try:
+        child.wait(KILL_GRACE_PERIOD)
+    except subprocess.TimeoutExpired:
+        pass
+
+    try:
+        os.killpg(child.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def _read_chunks_by_thread(stream, chunks: collections.deque, ready):
+    try:
+        while True:
+            data = stream.read(65536)
+            if not data:
+                break
+            chunks.append(data)
+            ready.set()
+    finally:
+        chunks.append(b"")
+        ready.set()
+
+
+def _stream_output(
+    child: subprocess.Popen, deadline: float | None, on_data
+) -> bool:
+    """Passes the output of 'child' to 'on_data' as it comes. Returns False if
+    'deadline' is reached first."""
+
+    assert child.stdout is not None
+
+    if sys.platform == "win32":
+        # The pipes could not be selected on Windows.
+        chunks: collections.deque[bytes] = collections.deque()
+        ready = threading.Event()
+        reader = threading.Thread(
+            target=_read_chunks_by_thread,
+            args=(child.stdout, chunks, ready),
+            daemon=True,
+        )
+        reader.start()
+
+        while True:
+            timeout = None if deadline is None else deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                return False
+            if not ready.wait(timeout):
+                continue
+            ready.clear()
+            while chunks:
+                data = chunks.popleft()
+                if not data:
+                    return True
+                on_data(data)
+
+    import selectors
+
+    fd = child.stdout.fileno()
+    with selectors.DefaultSelector() as selector:
+        selector.register(fd, selectors.EVENT_READ)
+        while True:
+            timeout = 0.5
+            if deadline is not None:
+                if deadline <= time.monotonic():
+                    return False
+                timeout = min(timeout, deadline - time.monotonic())
+
+            if not selector.select(max(0, timeout)):
+                # The processes started by the command in the background
+                # might keep the pipe open after the command exits.
+                if child.poll() is not None:
+                    return True
+                continue
+
+            data = os.read(fd, 65536)
+            if not data:
+                return True
+            on_data(data)
+
+
 def run_cmd_realtime(
     cmd,
     cwd: str | None = None,
     env: dict[str, str] | None = None,
     log_level: int = 0,
-):
-    # print(cmd)
+    sinks: list[OutputSink] | None = None,
+    timeout: float | None = None,
+    capture: str = "all",
+    tail_lines: int = DEFAULT_TAIL_LINES,
+) -> tuple[int, str]:
+    """Runs 'cmd', streaming its output line by line to 'sinks', and to the
+    console if 'log_level' >= 2.
+
+    Returns (returncode, output), where output is all the output if 'capture'
+    is "all", the last 'tail_lines' lines if it is "tail", or "" if it is
+    "none". The memory used does not grow with the output otherwise.
+
+    If 'timeout' seconds pass before the command exits, it is killed with all
+    the processes it started, and subprocess.TimeoutExpired is raised with
+    the tail of the output.
+    """
 
     my_cmd = cmd
     set_shell = True
@@ -108,22 +302,25 @@ def run_cmd_realtime(
         if sys.platform == "win32" and cmd[:3] != "cmd":
             my_cmd = "cmd /c " + cmd
 
-    # Use UTF-8 encoding with the `replace` option to avoid decode errors when
-    # Python handling the `output_text`.
+    # Run the command in its own process group, so that it could be killed
+    # with everything it starts.
+    if sys.platform == "win32":
+        group_kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        group_kwargs = {"start_new_session": True}
+
     child = subprocess.Popen(
         my_cmd,
+        stdin=subprocess.DEVNULL,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
-        text=True,
-        encoding="utf-8",
-        errors="replace",
         shell=set_shell,
         bufsize=0,
         env=env,
         cwd=cwd,
+        **group_kwargs,
     )
 
-    console_log = ""
     pid = child.pid
     process_name = ""
 
@@ -134,43 +331,230 @@ def run_cmd_realtime(
         except (psutil.NoSuchProcess, psutil.AccessDenied):
             pass
 
-    line = ""
+    all_sinks: list[OutputSink] = list(sinks or [])
+    if log_level == 3:
+        all_sinks.append(ConsoleSink(f"{cmd}: {process_name}({pid}) > "))
+    elif log_level == 2:
+        all_sinks.append(ConsoleSink(f"{process_name}({pid}) > "))
+
+    captured: CollectSink | RingBufferSink | None = None
+    if capture == "all":
+        captured = CollectSink()
+    elif capture == "tail":
+        captured = RingBufferSink(tail_lines)
+    if captured is not None:
+        all_sinks.append(captured)
+
+    # Always keep a tail for reporting the timeout.
+    if isinstance(captured, RingBufferSink):
+        tail = captured
+    else:
+        tail = RingBufferSink(tail_lines)
+        all_sinks.append(tail)
+
+    # Use UTF-8 encoding with the `replace` option to avoid decode errors when
+    # Python handling the output.
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+
+    def on_data(data: bytes) -> None:
+        nonlocal pending
+        pending += decoder.decode(data)
+        if "\n" not in pending:
+            return
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            line = line.rstrip("\r")
+            for sink in all_sinks:
+                sink.write_line(line)
+
+    deadline = None if timeout is None else time.monotonic() + timeout
 
     try:
-        while child.poll() is None:
-            if child.stdout:
-                line = child.stdout.readline()
-
-            if line != "":
-                console_log += line
-                if log_level > 0:
-                    sys.stdout.flush()
-                    if log_level == 3:
-                        sys.stdout.write(
-                            "{}: {}{} > {}\n".format(
-                                cmd,
-                                process_name if process_name else "",
-                                f"({pid})",
-                                line.rstrip(),
-                            )
-                        )
-                    elif log_level == 2:
-                        sys.stdout.write(
-                            "{}{} > {}\n".format(
-                                process_name if process_name else "",
-                                f"({pid})",
-                                line.rstrip(),
-                            )
-                        )
-
-                    sys.stdout.flush()
-    except Exception as e:
-        sys.stdout.write(
-            "{}{} > {}\n".format(
-                process_name if process_name else "", f"({pid})", line.rstrip()
+        if not _stream_output(child, deadline, on_data):
+            _kill_process_group(child)
+            raise subprocess.TimeoutExpired(
+                cmd, timeout or 0, output=tail.text()
             )
+
+        pending += decoder.decode(b"", final=True)
+        if pending:
+            for sink in all_sinks:
+                sink.write_line(pending.rstrip("\r"))
+
+        child.wait()
+    except BaseException as e:
+        # Do not leave the command running, e.g. on Ctrl-C, which is not sent
+        # to its process group by the terminal.
+        if not isinstance(e, subprocess.TimeoutExpired):
+            _kill_process_group(child)
+            sys.stdout.write(
+                "{}({}) > {}\n".format(process_name, pid, repr(e))
+            )
+        raise
+    finally:
+        if child.stdout:
+            child.stdout.close()
+
+    return child.returncode, captured.text() if captured is not None else ""
+
+
+# -------------------------------------------------------------------------
+# Running commands concurrently.
+# -------------------------------------------------------------------------
+
+
+@dataclass
+class CommandResult:
+    argv: list[str] | str
+    returncode: int
+    # In seconds.
+    duration: float
+    # The stdout and stderr, merged, if captured.
+    output: str
+
+
+class JobServer:
+    """A client of the jobserver of GNU make (or any build tool speaking its
+    protocol), which is found in MAKEFLAGS. A token has to be taken from the
+    jobserver to run a command, except the one the process owns implicitly.
+    """
+
+    def __init__(self, read_fd: int, write_fd: int, fifo: str = "") -> None:
+        self.read_fd = read_fd
+        self.write_fd = write_fd
+        self.fifo = fifo
+        self.lock = threading.Lock()
+        self.implicit_token_free = True
+
+    @staticmethod
+    def from_env() -> "JobServer | None":
+        if sys.platform == "win32":
+            # The jobserver is a named semaphore on Windows.
+            return None
+
+        makeflags = os.environ.get("MAKEFLAGS", "")
+        match = re.search(r"--jobserver-auth=fifo:(\S+)", makeflags)
+        if match:
+            try:
+                fd = os.open(match.group(1), os.O_RDWR)
+            except OSError:
+                return None
+            return JobServer(fd, fd, fifo=match.group(1))
+
+        match = re.search(
+            r"--jobserver-(?:auth|fds)=(\d+),(\d+)", makeflags
         )
-        print(repr(e))
-        raise e
+        if match:
+            read_fd, write_fd = int(match.group(1)), int(match.group(2))
+            try:
+                # make only passes the descriptors to the recipes marked with
+                # '+', they might be closed or reused otherwise.
+                for fd in [read_fd, write_fd]:
+                    if not stat.S_ISFIFO(os.fstat(fd).st_mode):
+                        return None
+            except OSError:
+                return None
+            return JobServer(read_fd, write_fd)
+
+        return None
+
+    def acquire(self) -> bytes:
+        """Blocks until a token is available, returns it. b"" stands for the
+        implicit token."""
+
+        import select
+
+        while True:
+            # The implicit token might be released while waiting for the
+            # jobserver.
+            with self.lock:
+                if self.implicit_token_free:
+                    self.implicit_token_free = False
+                    return b""
+
+            readable, _, _ = select.select([self.read_fd], [], [], 0.1)
+            if readable:
+                # Another process might take the token first, the read blocks
+                # until the next one then.
+                token = os.read(self.read_fd, 1)
+                if token:
+                    return token
+
+    def release(self, token: bytes) -> None:
+        if not token:
+            with self.lock:
+                self.implicit_token_free = True
+            return
+        os.write(self.write_fd, token)
+
+    def close(self) -> None:
+        if self.fifo:
+            os.close(self.read_fd)
+
+
+def run_commands(
+    commands: list[list[str]] | list[str],
+    jobs: int = 0,
+    cwd: str | None = None,
+    env: dict[str, str] | None = None,
+    shell: bool = False,
+    capture: bool = True,
+    use_jobserver: bool = True,
+) -> list[CommandResult]:
+    """Runs the commands concurrently, at most 'jobs' at a time, returns their
+    results in the order of 'commands'.
+
+    The commands are argv lists run without a shell, unless 'shell' is true.
+    If 'jobs' is 0, it is the number of usable CPUs. If 'use_jobserver' is true
+    and a jobserver is found in MAKEFLAGS, a command is only started when a
+    token is got from it, so that the build as a whole does not run more jobs
+    than it is allowed to.
+    """
+
+    if not commands:
+        return []
+
+    if jobs <= 0:
+        from build.scripts import get_cpu_count
+
+        jobs = get_cpu_count.get_cpu_count()
+    jobs = min(jobs, len(commands))
+
+    jobserver = JobServer.from_env() if use_jobserver else None
+
+    def run(command: list[str] | str) -> CommandResult:
+        token = jobserver.acquire() if jobserver else b""
+        try:
+            start = time.monotonic()
+            result = subprocess.run(
+                command,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE if capture else subprocess.DEVNULL,
+                stderr=subprocess.STDOUT if capture else subprocess.DEVNULL,
+                shell=shell,
+                cwd=cwd,
+                env=env,
+                encoding="utf-8",
+                errors="replace",
+            )
+            return CommandResult(
+                argv=command,
+                returncode=result.returncode,
+                duration=time.monotonic() - start,
+                output=result.stdout or "",
+            )
+        finally:
+            if jobserver:
+                jobserver.release(token)
+
+    try:
+        if jobs <= 1:
+            return [run(command) for command in commands]
 
-    return child.returncode, console_log
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(run, commands))
+    finally:
+        if jobserver:
+            jobserver.close()
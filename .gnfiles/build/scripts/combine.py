@@ -4,9 +4,10 @@
 # Licensed under the Apache License, Version 2.0, with certain conditions.
 # Refer to the "LICENSE" file in the root directory for more information.
 #
+import json
 import os
 import sys
-from build.scripts import cmd_exec
+from build.scripts import cmd_exec, get_cpu_count
 
 
 def deleteFile(f):
@@ -14,16 +15,232 @@ def deleteFile(f):
         os.remove(f)
 
 
+THIN_ARCHIVE_MAGIC = b"!<thin>\n"
+
+# The sidecar manifest of --incremental, '<output>.manifest.json', records
+# the inputs of the archive and their sizes and mtimes, and the names of its
+# members.
+MANIFEST_VERSION = 3
+
+# The objects are archived in chunks of at least this many objects, in
+# parallel, and the chunks are merged with the other archives by the MRI
+# script.
+MIN_OBJS_PER_CHUNK = 64
+
+# CreateProcess() limits the length of the command line on Windows.
+MAX_WIN_COMMAND_LENGTH = 32000
+
+
 def split_objs(ar, tmp_file, objs):
-    command = '"{0}" qc {1} {2}'.format(ar, tmp_file, " ".join(objs))
-    if sys.platform == "win32" and len(command) >= 8191:
-        split_objs(ar, tmp_file, objs[: len(objs) / 2])
-        split_objs(ar, tmp_file, objs[len(objs) / 2 :])  # noqa
+    """Archives 'objs' into one or more temporary archives, returns their
+    paths."""
+
+    if not objs:
+        return []
+
+    jobs = get_cpu_count.get_cpu_count()
+    chunk_size = max(MIN_OBJS_PER_CHUNK, -(-len(objs) // jobs))
+    chunks = [
+        objs[i : i + chunk_size]  # noqa
+        for i in range(0, len(objs), chunk_size)
+    ]
+
+    if sys.platform == "win32":
+        split_chunks = []
+        while chunks:
+            chunk = chunks.pop(0)
+            length = len(ar) + len(tmp_file) + sum(len(o) + 3 for o in chunk)
+            if length >= MAX_WIN_COMMAND_LENGTH and len(chunk) > 1:
+                half = len(chunk) // 2
+                chunks[:0] = [chunk[:half], chunk[half:]]
+            else:
+                split_chunks.append(chunk)
+        chunks = split_chunks
+
+    if len(chunks) == 1:
+        tmp_files = [tmp_file]
     else:
-        cmd_exec.get_cmd_output(command)
+        tmp_files = [
+            "{}.{}.a".format(tmp_file[: -len(".a")], i)
+            for i in range(len(chunks))
+        ]
+
+    for f in tmp_files:
+        deleteFile(f)
+
+    results = cmd_exec.run_commands(
+        [[ar, "qc", f] + chunk for f, chunk in zip(tmp_files, chunks)]
+    )
+    for result in results:
+        if result.returncode != 0:
+            sys.stderr.write(result.output)
+            for f in tmp_files:
+                deleteFile(f)
+            sys.exit(-1)
+
+    return tmp_files
+
+
+def is_thin_archive(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(THIN_ARCHIVE_MAGIC)) == THIN_ARCHIVE_MAGIC
+    except OSError:
+        return False
+
+
+def quote_rsp_arg(arg):
+    # The quoting of the response files of binutils and llvm.
+    if not any(c in arg for c in " \t\"'\\"):
+        return arg
+    return '"{}"'.format(arg.replace("\\", "\\\\").replace('"', '\\"'))
+
+
+def combine_thin(ar, output, objs, archs):
+    """Creates 'output' as a thin archive, which only references the objects
+    instead of containing them. The members of the nested thin archives are
+    added instead of the archives, by ar. Returns False if any of the nested
+    archives is not thin, its members could not be referenced then."""
+
+    if not all(is_thin_archive(a) for a in archs):
+        return False
+
+    deleteFile(output)
+
+    members_rspfile = output + ".members.rsp"
+    with open(members_rspfile, "w", encoding="utf-8") as f:
+        for member in objs + archs:
+            f.write(quote_rsp_arg(member) + "\n")
+
+    result = cmd_exec.run_commands(
+        [[ar, "qcsT", output, "@" + members_rspfile]]
+    )[0]
+    deleteFile(members_rspfile)
+    if result.returncode != 0:
+        sys.stderr.write(result.output)
+        deleteFile(output)
+        sys.exit(-1)
+
+    return True
+
+
+def get_stat(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def load_manifest(manifest_file):
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest
+
+
+def list_members(ar, output):
+    """Returns the names of the members of 'output', or None if they could
+    not be listed."""
+
+    result = cmd_exec.run_commands([[ar, "t", output]])[0]
+    if result.returncode != 0:
+        return None
+    return result.output.splitlines()
+
+
+def save_manifest(
+    manifest_file, ar, output, thin, created_thin, inputs, members
+):
+    # 'thin' is what is asked for, 'created_thin' is what the archive is, a
+    # normal archive is created if a nested archive is not thin.
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "ar": ar,
+        "thin": thin,
+        "created_thin": created_thin,
+        "inputs": [[path, get_stat(path)] for path in inputs],
+        "members": members,
+        "output": get_stat(output),
+    }
+    tmp_file = manifest_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_file, manifest_file)
+
+
+def update_incrementally(ar, output, objs, archs, thin, manifest):
+    """Replaces the members of 'output' whose objects have changed since the
+    archive was created or updated, as recorded in 'manifest'. Returns False
+    if the archive has to be created again: the inputs are not the same, a
+    nested archive has changed, or the archive itself has been modified."""
+
+    if (
+        manifest.get("ar") != ar
+        or manifest.get("thin") != thin
+        or not os.path.exists(output)
+        or get_stat(output) != manifest.get("output")
+    ):
+        return False
+
+    inputs = objs + archs
+    recorded = manifest.get("inputs", [])
+    if [path for path, _ in recorded] != inputs:
+        return False
+
+    # The members are replaced by their names, which are the file names of
+    # the objects in a normal archive. The members of the nested archives are
+    # in the archive too, an object whose name is not unique among all the
+    # members could replace the wrong one.
+    members = manifest.get("members")
+    if members is None:
+        return False
+    member_names = {}
+    for member in members:
+        name = os.path.basename(member)
+        member_names[name] = member_names.get(name, 0) + 1
+    if any(member_names.get(os.path.basename(o)) != 1 for o in objs):
+        return False
+
+    changed = []
+    for path, input_stat in recorded:
+        if get_stat(path) != input_stat:
+            if path in archs:
+                return False
+            changed.append(path)
+
+    if not changed:
+        # Nothing to replace, but the archive has to be newer than its
+        # inputs for ninja.
+        os.utime(output)
+        return True
+
+    mode = "rcsT" if manifest.get("created_thin") else "rcs"
+    result = cmd_exec.run_commands([[ar, mode, output] + changed])[0]
+    if result.returncode != 0:
+        sys.stderr.write(result.output)
+        return False
+
+    return True
 
 
 def combine(argv):
+    # --thin: create a thin archive if possible.
+    # --incremental: only replace the changed members of the archive created
+    #   before, if possible.
+    thin = False
+    incremental = False
+    while argv and argv[0].startswith("--"):
+        if argv[0] == "--thin":
+            thin = True
+        elif argv[0] == "--incremental":
+            incremental = True
+        else:
+            print("Unknown option " + argv[0])
+            sys.exit(-1)
+        argv = argv[1:]
+
     if len(argv) < 3:
         print("Wrong argument")
         print(argv)
@@ -34,14 +251,11 @@ def combine(argv):
     out_path = os.path.dirname(output)
     tmp_file = output + ".tmp.a"
     mri_file = output + ".mri"
+    manifest_file = output + ".manifest.json"
     if len(out_path) != 0 and not os.path.exists(out_path):
         os.makedirs(out_path)
     if not os.path.exists(rspfile):
         sys.exit(-1)
-    if os.path.exists(tmp_file):
-        deleteFile(tmp_file)
-    if os.path.exists(mri_file):
-        deleteFile(mri_file)
     f = open(rspfile, "r", encoding="utf-8")
     contents = f.read()
     f.close()
@@ -49,22 +263,76 @@ def combine(argv):
     objs = [o for o in all_files if o.endswith(".o")]
     archs = [o for o in all_files if o.endswith(".a")]
 
+    if incremental:
+        manifest = load_manifest(manifest_file)
+        if manifest and update_incrementally(
+            ar, output, objs, archs, thin, manifest
+        ):
+            save_manifest(
+                manifest_file,
+                ar,
+                output,
+                thin,
+                manifest.get("created_thin", False),
+                objs + archs,
+                manifest["members"],
+            )
+            sys.exit(0)
+
+    # The archive is created again, from scratch.
+    deleteFile(manifest_file)
+    deleteFile(output)
+
+    created_thin = thin and combine_thin(ar, output, objs, archs)
+    if not created_thin:
+        combine_full(ar, output, objs, archs, tmp_file, mri_file)
+
+    if incremental:
+        members = list_members(ar, output)
+        if members is not None:
+            save_manifest(
+                manifest_file,
+                ar,
+                output,
+                thin,
+                created_thin,
+                objs + archs,
+                members,
+            )
+    sys.exit(0)
+
+
+def combine_full(ar, output, objs, archs, tmp_file, mri_file):
+    """Creates 'output' as a normal archive, containing the objects and the
+    members of the nested archives."""
+
+    if os.path.exists(tmp_file):
+        deleteFile(tmp_file)
+    if os.path.exists(mri_file):
+        deleteFile(mri_file)
+
     # combine all .o
-    split_objs(ar, tmp_file, objs)
+    tmp_files = split_objs(ar, tmp_file, objs)
     # then combine all .a
     fi = open(mri_file, "w", encoding="utf-8")
     fi.write("create {}\n".format(output))
-    if len(objs) != 0:
-        fi.write("addlib {}\n".format(tmp_file))
+    for f in tmp_files:
+        fi.write("addlib {}\n".format(f))
     for a in archs:
         fi.write("addlib {}\n".format(a))
     fi.write("save\n")
     fi.write("end\n")
     fi.close()
-    cmd_exec.get_cmd_output('"{0}" -M <{1}'.format(ar, mri_file))
+    status, mri_output = cmd_exec.get_cmd_output(
+        '"{0}" -M <{1}'.format(ar, mri_file)
+    )
     deleteFile(mri_file)
-    deleteFile(tmp_file)
-    sys.exit(0)
+    for f in tmp_files:
+        deleteFile(f)
+    if status != 0:
+        sys.stderr.write(mri_output)
+        sys.stderr.write("\n")
+        sys.exit(-1)
 
 
 if __name__ == "__main__":
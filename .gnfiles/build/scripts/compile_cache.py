@@ -0,0 +1,495 @@
+#
+# Copyright © 2025 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+# A local content-addressed cache of the object files compiled by the gcc/clang
+# toolchain. It is used as a prefix of the compiler command in gcc.gni when the
+# gn arg 'enable_compile_cache' is true:
+#
+#   python3 compile_cache.py --cache-dir <dir> --max-size-mb <n> -- \
+#       clang++ -MMD -MF obj/foo.o.d ... -c ../../foo.cc -o obj/foo.o
+#
+# Like the 'direct mode' of ccache, a compilation is identified in two steps:
+#
+# 1. The manifest key is the hash of the compiler identity, the command line,
+#    the working directory and the contents of the source file.
+# 2. The manifest records the headers listed in the '-MMD' depfile of each
+#    previous compilation with the same manifest key, together with their
+#    contents hashes. If all the headers of one entry are unchanged, its result
+#    (the object file and the depfile) is copied to the outputs.
+#
+# This script is executed for every compilation, so it imports as little as
+# possible.
+#
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import fcntl
+
+    has_fcntl = True
+except ImportError:
+    has_fcntl = False
+
+
+CACHE_VERSION = "1"
+DEFAULT_MAX_SIZE_MB = 5120
+
+# Never cache compilations which could produce different results with the
+# same inputs.
+_UNCACHEABLE_ARGS = {"-E", "-M", "-MM", "-save-temps", "-ftime-report"}
+
+
+def get_default_cache_dir() -> str:
+    cache_dir = os.environ.get("TGN_COMPILE_CACHE_DIR", "")
+    if cache_dir:
+        return cache_dir
+    return os.path.join(os.path.expanduser("~"), ".cache", "tgn", "compile")
+
+
+class CompileCache:
+    def __init__(self, cache_dir: str, max_size_mb: int) -> None:
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = max_size_mb * 1024 * 1024
+        self.stats_file = os.path.join(self.cache_dir, "stats.json")
+        self.lock_file = os.path.join(self.cache_dir, "lock")
+
+    # ---------------------------------------------------------------------
+    # Locking and statistics.
+    # ---------------------------------------------------------------------
+
+    def _with_lock(self, fn):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.lock_file, "a", encoding="utf-8") as lock:
+            if has_fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                return fn()
+            finally:
+                if has_fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def read_stats(self) -> dict:
+        stats = {
+            "hits": 0,
+            "misses": 0,
+            "uncacheable": 0,
+            "errors": 0,
+            "size": 0,
+            "evictions": 0,
+        }
+        try:
+            with open(self.stats_file, "r", encoding="utf-8") as f:
+                stats.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        return stats
+
+    def _write_stats(self, stats: dict) -> None:
+        _atomic_write(
+            self.stats_file, json.dumps(stats, indent=2).encode("utf-8")
+        )
+
+    def update_stats(self, **deltas: int) -> dict:
+        def update():
+            stats = self.read_stats()
+            for key, delta in deltas.items():
+                stats[key] = stats.get(key, 0) + delta
+            self._write_stats(stats)
+            return stats
+
+        return self._with_lock(update)
+
+    # ---------------------------------------------------------------------
+    # Storage.
+    # ---------------------------------------------------------------------
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.cache_dir, kind, key[:2], key[2:])
+
+    def load_manifest(self, manifest_key: str) -> list[dict]:
+        try:
+            with open(
+                self._path("manifests", manifest_key), "r", encoding="utf-8"
+            ) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def save_manifest(self, manifest_key: str, entries: list[dict]) -> None:
+        # Only keep the most recent variations of the headers.
+        _atomic_write(
+            self._path("manifests", manifest_key),
+            json.dumps(entries[-8:]).encode("utf-8"),
+        )
+
+    def fetch(self, result_key: str, obj_file: str, dep_file: str) -> bool:
+        result_dir = self._path("results", result_key)
+        try:
+            _copy_out(os.path.join(result_dir, "object"), obj_file)
+            if dep_file:
+                _copy_out(os.path.join(result_dir, "depfile"), dep_file)
+            # The mtime of the result is the LRU clock.
+            os.utime(result_dir)
+        except OSError:
+            return False
+        return True
+
+    def store(self, result_key: str, obj_file: str, dep_file: str) -> None:
+        result_dir = self._path("results", result_key)
+        os.makedirs(os.path.dirname(result_dir), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(
+            prefix=".tmp-", dir=os.path.dirname(result_dir)
+        )
+        try:
+            shutil.copyfile(obj_file, os.path.join(tmp_dir, "object"))
+            if dep_file:
+                shutil.copyfile(dep_file, os.path.join(tmp_dir, "depfile"))
+            size = _tree_size(tmp_dir)
+            try:
+                os.rename(tmp_dir, result_dir)
+            except OSError:
+                # Another compilation stored the same result concurrently.
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        stats = self.update_stats(size=size)
+        if stats["size"] > self.max_size:
+            self._with_lock(self.evict)
+
+    def evict(self) -> None:
+        """Removes the least recently used results until the cache is below
+        90% of its maximum size."""
+
+        results = []
+        results_root = os.path.join(self.cache_dir, "results")
+        for bucket in _scandir(results_root):
+            for entry in _scandir(bucket.path):
+                if entry.name.startswith(".tmp-"):
+                    continue
+                try:
+                    mtime = entry.stat().st_mtime
+                except OSError:
+                    continue
+                results.append((mtime, entry.path, _tree_size(entry.path)))
+
+        total = sum(size for _, _, size in results)
+        evictions = 0
+        target = self.max_size * 9 // 10
+        for _, path, size in sorted(results):
+            if total <= target:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            evictions += 1
+
+        stats = self.read_stats()
+        stats["size"] = total
+        stats["evictions"] = stats.get("evictions", 0) + evictions
+        self._write_stats(stats)
+
+    def clear(self) -> None:
+        def clear():
+            for kind in ["results", "manifests"]:
+                shutil.rmtree(
+                    os.path.join(self.cache_dir, kind), ignore_errors=True
+                )
+            self._write_stats(
+                dict(self.read_stats(), size=0, evictions=0)
+            )
+
+        self._with_lock(clear)
+
+
+def _scandir(path: str) -> list[os.DirEntry]:
+    try:
+        return [e for e in os.scandir(path) if e.is_dir()]
+    except OSError:
+        return []
+
+
+def _tree_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return size
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _copy_out(src: str, dst: str) -> None:
+    # Write to a temporary file first, so that an interrupted copy never
+    # leaves a truncated object file behind.
+    tmp = dst + ".tmp"
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def _hash_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def get_compiler_identity(compiler: str) -> str:
+    path = shutil.which(compiler) or compiler
+    path = os.path.realpath(path)
+    st = os.stat(path)
+    return f"{path}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def parse_depfile(path: str) -> list[str]:
+    """Returns the dependencies listed in a make-style depfile."""
+
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        content = f.read().replace("\\\r\n", " ").replace("\\\n", " ")
+
+    deps = []
+    for line in content.splitlines():
+        _, separator, rest = line.partition(": ")
+        if not separator:
+            continue
+        token = ""
+        escaped = False
+        for c in rest:
+            if escaped:
+                token += c
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c.isspace():
+                if token:
+                    deps.append(token)
+                token = ""
+            else:
+                token += c
+        if token:
+            deps.append(token)
+    return deps
+
+
+def parse_compile_command(argv: list[str]) -> dict | None:
+    """Finds the source, the object file and the depfile of a compile
+    command. Returns None if the command can not be cached."""
+
+    source = ""
+    obj_file = ""
+    dep_file = ""
+    has_compile = False
+
+    i = 1
+    while i < len(argv):
+        arg = argv[i]
+        if arg in _UNCACHEABLE_ARGS:
+            return None
+        if arg == "-c":
+            has_compile = True
+            # gcc.gni always passes the source right after '-c'.
+            if i + 1 < len(argv) and not argv[i + 1].startswith("-"):
+                source = argv[i + 1]
+                i += 1
+        elif arg == "-o" and i + 1 < len(argv):
+            obj_file = argv[i + 1]
+            i += 1
+        elif arg == "-MF" and i + 1 < len(argv):
+            dep_file = argv[i + 1]
+            i += 1
+        elif arg.startswith("@"):
+            # The contents of a response file are not part of the key.
+            return None
+        i += 1
+
+    if not has_compile or not source or not obj_file:
+        return None
+
+    return {"source": source, "object": obj_file, "depfile": dep_file}
+
+
+def _deps_match(deps: list[list]) -> bool:
+    """Checks whether the recorded [path, size, mtime_ns, sha256] of every
+    dependency still matches."""
+
+    for path, size, mtime_ns, digest in deps:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        if st.st_size != size:
+            return False
+        if st.st_mtime_ns == mtime_ns:
+            continue
+        if _hash_file(path) != digest:
+            return False
+    return True
+
+
+def run_compiler(argv: list[str]) -> int:
+    return subprocess.call(argv)
+
+
+def compile_with_cache(cache: CompileCache, argv: list[str]) -> int:
+    command = parse_compile_command(argv)
+    if command is None:
+        try:
+            cache.update_stats(uncacheable=1)
+        except OSError:
+            pass
+        return run_compiler(argv)
+
+    try:
+        hasher = hashlib.sha256()
+        for part in [
+            CACHE_VERSION,
+            get_compiler_identity(argv[0]),
+            os.getcwd(),
+            "\0".join(argv[1:]),
+            _hash_file(command["source"]),
+        ]:
+            hasher.update(part.encode("utf-8"))
+            hasher.update(b"\0")
+        manifest_key = hasher.hexdigest()
+
+        entries = cache.load_manifest(manifest_key)
+        for entry in reversed(entries):
+            if _deps_match(entry["deps"]) and cache.fetch(
+                entry["result"], command["object"], command["depfile"]
+            ):
+                cache.update_stats(hits=1)
+                return 0
+    except Exception:
+        # The cache must never break the build, compile as usual.
+        try:
+            cache.update_stats(errors=1)
+        except OSError:
+            pass
+        return run_compiler(argv)
+
+    start = time.monotonic()
+    returncode = run_compiler(argv)
+    if returncode != 0:
+        return returncode
+
+    try:
+        deps = []
+        if command["depfile"] and os.path.exists(command["depfile"]):
+            for path in parse_depfile(command["depfile"]):
+                st = os.stat(path)
+                deps.append(
+                    [path, st.st_size, st.st_mtime_ns, _hash_file(path)]
+                )
+
+        hasher = hashlib.sha256(manifest_key.encode("utf-8"))
+        for path, _, _, digest in deps:
+            hasher.update(f"{path}\0{digest}\0".encode("utf-8"))
+        result_key = hasher.hexdigest()
+
+        cache.store(result_key, command["object"], command["depfile"])
+
+        entries = [e for e in entries if e["result"] != result_key]
+        entries.append(
+            {
+                "result": result_key,
+                "deps": deps,
+                "compile_ms": int((time.monotonic() - start) * 1000),
+            }
+        )
+        cache.save_manifest(manifest_key, entries)
+        cache.update_stats(misses=1)
+    except Exception:
+        try:
+            cache.update_stats(errors=1)
+        except OSError:
+            pass
+
+    return 0
+
+
+def format_stats(cache: CompileCache) -> str:
+    stats = cache.read_stats()
+    lookups = stats["hits"] + stats["misses"]
+    hit_rate = stats["hits"] * 100.0 / lookups if lookups else 0.0
+
+    return "\n".join(
+        [
+            f"Compile cache: {cache.cache_dir}",
+            f"  hits:        {stats['hits']}",
+            f"  misses:      {stats['misses']}",
+            f"  hit rate:    {hit_rate:.1f}%",
+            f"  uncacheable: {stats['uncacheable']}",
+            f"  errors:      {stats['errors']}",
+            f"  evictions:   {stats['evictions']}",
+            f"  size:        {stats['size'] / 1024 / 1024:.1f} MB"
+            f" / {cache.max_size / 1024 / 1024:.0f} MB",
+        ]
+    )
+
+
+def main(argv: list[str]) -> int:
+    # Parse the options by hand, argparse would double the startup time of
+    # every compilation.
+    cache_dir = ""
+    max_size_mb = DEFAULT_MAX_SIZE_MB
+    action = "compile"
+
+    i = 0
+    while i < len(argv) and argv[i] != "--":
+        arg = argv[i]
+        if arg.startswith("--cache-dir="):
+            cache_dir = arg.split("=", 1)[1]
+        elif arg.startswith("--max-size-mb="):
+            max_size_mb = int(arg.split("=", 1)[1])
+        elif arg in ("--stats", "--clear"):
+            action = arg[2:]
+        else:
+            sys.stderr.write(f"compile_cache.py: unknown option {arg}\n")
+            return 1
+        i += 1
+
+    cache = CompileCache(cache_dir or get_default_cache_dir(), max_size_mb)
+
+    if action == "stats":
+        print(format_stats(cache))
+        return 0
+    if action == "clear":
+        cache.clear()
+        print(f"Compile cache {cache.cache_dir} is cleared.")
+        return 0
+
+    compiler_argv = argv[i + 1 :]  # noqa
+    if not compiler_argv:
+        sys.stderr.write("compile_cache.py: missing the compiler command\n")
+        return 1
+
+    return compile_with_cache(cache, compiler_argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -6,7 +6,7 @@
 #
 import os
 import argparse
-from build.scripts import fs_utils, timestamp_proxy
+from build.scripts import fs_utils, log, timestamp_proxy
 
 
 class ArgumentInfo(argparse.Namespace):
@@ -17,9 +17,14 @@ class ArgumentInfo(argparse.Namespace):
         self.destination: str
         self.tg_timestamp_proxy_file: str | None = None
         self.files_only: bool = False
+        self.incremental: bool = False
+        self.checksum: bool = False
+        self.sync_manifest_dir: str | None = None
+        self.link_mode: str = "copy"
+        self.log_level: int = 0
 
 
-def main():
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(
         description="Copy source files to destination."
     )
@@ -36,9 +41,39 @@ def main():
         default=False,
         help="Ensure source and destination are files",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=False,
+        help="Only copy the changed files of a directory, and remove the ones"
+        " no longer in the source",
+    )
+    parser.add_argument(
+        "--checksum",
+        action="store_true",
+        default=False,
+        help="With --incremental, compare the content of the touched files",
+    )
+    parser.add_argument(
+        "--sync-manifest-dir",
+        required=False,
+        help="With --incremental, the directory of the manifests recording"
+        " what was copied, which must not be in the destination",
+    )
+    parser.add_argument(
+        "--link-mode",
+        choices=fs_utils.LINK_MODES,
+        default="copy",
+        help="How to put the files to the destination, 'auto' tries reflink,"
+        " then hardlink, then copy",
+    )
+    parser.add_argument("--log-level", default=0, type=int, required=False)
 
     arg_info = ArgumentInfo()
-    args = parser.parse_args(namespace=arg_info)
+    args = parser.parse_args(argv, namespace=arg_info)
+
+    if args.incremental and args.sync_manifest_dir is None:
+        parser.error("--incremental requires --sync-manifest-dir")
 
     try:
         if args.files_only:
@@ -71,12 +106,22 @@ def main():
             ) from e
 
         try:
-            fs_utils.copy(args.source, args.destination)
+            stats = fs_utils.copy(
+                args.source,
+                args.destination,
+                incremental=args.incremental,
+                checksum=args.checksum,
+                link_mode=args.link_mode,
+                manifest_dir=args.sync_manifest_dir,
+            )
         except Exception as e:
             raise RuntimeError(
                 f"Failed to copy {args.source} to {args.destination}: {str(e)}"
             ) from e
 
+        if stats is not None and args.log_level >= 1:
+            log.info(f"Copied {args.source} => {args.destination}: {stats}")
+
         # Touch the tg_timestamp_proxy_file if specified.
         timestamp_proxy.touch_timestamp_proxy_file(args.tg_timestamp_proxy_file)
 
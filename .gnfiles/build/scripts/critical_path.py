@@ -0,0 +1,286 @@
+#
+# Copyright © 2025 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import argparse
+import json
+import os
+import sys
+from build.scripts import ninja_log, ninja_manifest
+
+
+class ArgumentInfo(argparse.Namespace):
+    def __init__(self):
+        super().__init__()
+
+        self.out_dir: str
+        self.target: str
+        self.cpu_count: int
+        self.json: bool
+
+
+def _edge_duration_ms(
+    edge: ninja_manifest.NinjaEdge, durations: dict[str, int]
+) -> int | None:
+    if edge.rule == "phony":
+        return 0
+    for output in edge.all_outputs:
+        if output in durations:
+            return durations[output]
+    return None
+
+
+def index_producers(edges: list[ninja_manifest.NinjaEdge]) -> dict[str, int]:
+    """Maps every output to the index of the edge producing it."""
+
+    producers: dict[str, int] = {}
+    for index, edge in enumerate(edges):
+        for output in edge.all_outputs:
+            producers[output] = index
+    return producers
+
+
+def compute_finish_times(
+    edges: list[ninja_manifest.NinjaEdge],
+    weights: list[int],
+    producers: dict[str, int],
+) -> list[tuple[int, int]]:
+    """Computes, for every edge, the earliest time it could finish with
+    unlimited cores, i.e. the weight of the longest chain of edges ending with
+    it, and the edge preceding it in that chain (-1 if none).
+    """
+
+    finish: list[tuple[int, int] | None] = [None] * len(edges)
+    visiting = [False] * len(edges)
+
+    # Use an explicit stack instead of recursion, the chains of a large graph
+    # are far deeper than the default recursion limit.
+    for root in range(len(edges)):
+        if finish[root] is not None:
+            continue
+
+        stack = [(root, False)]
+        while stack:
+            index, expanded = stack.pop()
+            if finish[index] is not None:
+                continue
+
+            inputs = [
+                producers[path]
+                for path in edges[index].all_inputs
+                if path in producers
+            ]
+
+            if not expanded:
+                if visiting[index]:
+                    # A cycle, which ninja would refuse to build anyway.
+                    continue
+                visiting[index] = True
+                stack.append((index, True))
+                stack.extend(
+                    (i, False) for i in inputs if finish[i] is None
+                )
+                continue
+
+            best_ms, predecessor = 0, -1
+            for i in inputs:
+                result = finish[i]
+                if result is not None and result[0] > best_ms:
+                    best_ms, predecessor = result[0], i
+            finish[index] = (best_ms + weights[index], predecessor)
+
+    return [result if result is not None else (0, -1) for result in finish]
+
+
+def find_critical_path(out_dir: str, target: str = "") -> dict:
+    """Finds the longest chain of edges, weighted by their last duration in
+    '.ninja_log', which bounds the wall time of the build.
+
+    'target' could be a ninja output, e.g. 'obj/foo/bar.stamp', or a gn
+    label, e.g. '//foo:bar'. If it is empty, the whole graph is considered.
+    """
+
+    manifest = ninja_manifest.parse_ninja_manifest(out_dir)
+    durations = ninja_log.read_last_durations(out_dir)
+
+    edges = manifest.edges
+    weights = [_edge_duration_ms(edge, durations) or 0 for edge in edges]
+
+    producers = index_producers(edges)
+    finish = compute_finish_times(edges, weights, producers)
+
+    if target:
+        candidates = [
+            index
+            for index, edge in enumerate(edges)
+            if target in edge.all_outputs or edge.label == target
+        ]
+        if not candidates:
+            raise ValueError(f"Unknown target '{target}'")
+    else:
+        candidates = list(range(len(edges)))
+
+    # All the edges needed by the candidates, to compute the total work.
+    needed = set()
+    stack = list(candidates)
+    while stack:
+        index = stack.pop()
+        if index in needed:
+            continue
+        needed.add(index)
+        stack.extend(
+            producers[path]
+            for path in edges[index].all_inputs
+            if path in producers
+        )
+
+    path = []
+    if candidates:
+        index = max(candidates, key=lambda i: finish[i][0])
+        while index != -1:
+            path.append(index)
+            index = finish[index][1]
+        path.reverse()
+
+    chain = []
+    elapsed_ms = 0
+    for index in path:
+        edge = edges[index]
+        if edge.rule == "phony":
+            continue
+        elapsed_ms += weights[index]
+        chain.append(
+            {
+                "output": edge.all_outputs[0] if edge.all_outputs else "",
+                "category": ninja_manifest.classify_edge(edge, manifest),
+                "label": edge.label,
+                "duration_ms": weights[index],
+                "elapsed_ms": elapsed_ms,
+            }
+        )
+
+    builds = ninja_log.read_ninja_log(out_dir)
+    last_wall_time_ms = 0
+    if builds and builds[-1]:
+        last_wall_time_ms = max(e.end_ms for e in builds[-1]) - min(
+            e.start_ms for e in builds[-1]
+        )
+
+    return {
+        "out_dir": out_dir,
+        "target": target,
+        "edges": len(needed),
+        "edges_without_timing": sum(
+            1
+            for i in needed
+            if _edge_duration_ms(edges[i], durations) is None
+        ),
+        "total_work_ms": sum(weights[i] for i in needed),
+        "critical_path_ms": elapsed_ms,
+        "last_wall_time_ms": last_wall_time_ms,
+        "critical_path": chain,
+    }
+
+
+def estimate_wall_time_ms(result: dict, cpu_count: int) -> int:
+    """The lower bound of the wall time with 'cpu_count' cores, a build can
+    neither be shorter than its critical path nor than its total work spread
+    over all the cores."""
+
+    return max(
+        result["critical_path_ms"],
+        result["total_work_ms"] // max(1, cpu_count),
+    )
+
+
+def _format_ms(ms: int) -> str:
+    return f"{ms / 1000:.2f}s"
+
+
+def format_critical_path(result: dict, cpu_count: int) -> str:
+    lines = []
+
+    lines.append(
+        f"Critical path of {result['target'] or 'all'} in {result['out_dir']}"
+    )
+    for step in result["critical_path"]:
+        lines.append(
+            f"  {_format_ms(step['elapsed_ms']):>9}"
+            f"  +{_format_ms(step['duration_ms']):>8}"
+            f"  {step['category']:<8}  {step['output']}"
+        )
+
+    critical_path_ms = result["critical_path_ms"]
+    total_work_ms = result["total_work_ms"]
+    estimated_ms = estimate_wall_time_ms(result, cpu_count)
+
+    lines.append("")
+    lines.append(f"  edges:                   {result['edges']}")
+    if result["edges_without_timing"]:
+        lines.append(
+            "  edges without timing:    "
+            f"{result['edges_without_timing']} (counted as 0s)"
+        )
+    lines.append(f"  total work:              {_format_ms(total_work_ms)}")
+    lines.append(f"  critical path:           {_format_ms(critical_path_ms)}")
+    if result["last_wall_time_ms"]:
+        lines.append(
+            "  last build wall time:    "
+            f"{_format_ms(result['last_wall_time_ms'])}"
+        )
+    lines.append(
+        f"  best case with {cpu_count} cores: {_format_ms(estimated_ms)}"
+    )
+    lines.append(
+        f"  best case, unlimited:    {_format_ms(critical_path_ms)}"
+    )
+
+    lines.append("")
+    if critical_path_ms and estimated_ms <= critical_path_ms:
+        lines.append(
+            "The build is bound by the critical path, more cores will not"
+            " help, splitting the targets on the critical path will."
+        )
+    elif critical_path_ms:
+        lines.append(
+            "The build is bound by the number of cores, the critical path"
+            f" allows up to {total_work_ms / critical_path_ms:.1f}x"
+            " parallelism."
+        )
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Find the longest chain of edges in the ninja graph, weighted by"
+            " the durations in '.ninja_log'."
+        )
+    )
+    parser.add_argument("--out-dir", type=str, required=True)
+    parser.add_argument("--target", type=str, default="")
+    parser.add_argument("--cpu-count", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        default=False,
+        help="Print the result as JSON",
+    )
+
+    arg_info = ArgumentInfo()
+    args = parser.parse_args(namespace=arg_info)
+
+    critical_path = find_critical_path(
+        os.path.abspath(args.out_dir), args.target
+    )
+    if args.json:
+        critical_path["estimated_wall_time_ms"] = estimate_wall_time_ms(
+            critical_path, args.cpu_count
+        )
+        json.dump(critical_path, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        print(format_critical_path(critical_path, args.cpu_count))
@@ -4,12 +4,322 @@
 # Licensed under the Apache License, Version 2.0, with certain conditions.
 # Refer to the "LICENSE" file in the root directory for more information.
 #
+import errno
+import hashlib
+import json
 import stat
 import os
 import shutil
-import subprocess
+import sys
 import inspect
-from build.scripts import log
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from build.scripts import get_cpu_count, log, trash
+
+try:
+    import fcntl
+
+    has_fcntl = True
+except ImportError:
+    has_fcntl = False
+
+
+# The manifest of sync_tree() and sync_files() records what was copied, so
+# that the next sync could skip the unchanged entries and remove the ones no
+# longer in the source. There is one manifest per source and destination, in
+# a directory given by the caller, outside of the destination which might be
+# packaged, refer to get_sync_manifest_file().
+SYNC_MANIFEST_VERSION = 2
+
+# The directory of the sync manifests in the out dir of gn.
+SYNC_MANIFEST_DIR_NAME = "tgn_sync_manifests"
+
+# Overrides the number of threads copying the files of a tree.
+COPY_JOBS_ENV = "TGN_COPY_JOBS"
+
+# Fewer files than this are copied by the calling thread.
+MIN_FILES_PER_COPY_JOB = 8
+
+# How a file is put to its destination:
+#   copy:     copy the content.
+#   reflink:  share the content with the source on a copy-on-write file
+#             system (btrfs, xfs, ...), the destination is still a separate
+#             file.
+#   hardlink: link the destination to the source, which must be on the same
+#             file system. The destination is the same file as the source,
+#             modifying one in place modifies the other.
+#   auto:     reflink, otherwise hardlink, otherwise copy.
+LINK_MODES = ["auto", "hardlink", "reflink", "copy"]
+
+# ioctl(dest_fd, FICLONE, src_fd) in <linux/fs.h>.
+FICLONE = 0x40049409
+
+# The errors of copy_file_range() and sendfile() meaning the file systems or
+# the files do not support them, the file is copied by read() and write().
+_KERNEL_COPY_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV,
+    errno.ENOSYS,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+    errno.EBADF,
+    errno.ETXTBSY,
+}
+
+
+@dataclass
+class SyncStats:
+    copied: int = 0
+    skipped: int = 0
+    deleted: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"copied: {self.copied}, skipped: {self.skipped},"
+            f" deleted: {self.deleted}"
+        )
+
+
+# -------------------------------------------------------------------------
+# The copy engine.
+# -------------------------------------------------------------------------
+
+
+def _kernel_copy(src_fd: int, dst_fd: int) -> bool:
+    """Copies the rest of 'src_fd' to 'dst_fd' in the kernel, so that the
+    content does not pass through the user space, and could even be shared
+    (reflink) or copied by the server on some file systems. Returns False if
+    nothing is copied because it is not supported."""
+
+    copy_funcs = []
+    if hasattr(os, "copy_file_range"):
+        copy_funcs.append(
+            lambda count: os.copy_file_range(src_fd, dst_fd, count)
+        )
+    if hasattr(os, "sendfile"):
+        copy_funcs.append(
+            lambda count: os.sendfile(dst_fd, src_fd, None, count)
+        )
+
+    for copy_func in copy_funcs:
+        copied = 0
+        try:
+            while True:
+                n = copy_func(1024 * 1024 * 1024)
+                if n == 0:
+                    break
+                copied += n
+        except OSError as exc:
+            if copied or exc.errno not in _KERNEL_COPY_UNSUPPORTED_ERRNOS:
+                raise
+            continue
+
+        # Some special files, e.g. in /proc, report nothing to copy.
+        if copied:
+            return True
+        break
+
+    return False
+
+
+def _copy_file_content(src_file: str, dst_file: str) -> None:
+    """Same as shutil.copy() but copies the content in the kernel."""
+
+    # Never write through a hard link, it might be linked to the source.
+    try:
+        if os.lstat(dst_file).st_nlink > 1:
+            os.remove(dst_file)
+    except FileNotFoundError:
+        pass
+
+    with open(src_file, "rb") as fsrc:
+        mode = stat.S_IMODE(os.fstat(fsrc.fileno()).st_mode)
+
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        try:
+            dst_fd = os.open(dst_file, flags, mode)
+        except PermissionError:
+            # Ensure the destination file is writable, so that the copying
+            # operation would not be fail due to this.
+            os.chmod(dst_file, os.stat(dst_file).st_mode | stat.S_IWUSR)
+            dst_fd = os.open(dst_file, flags, mode)
+
+        with open(dst_fd, "wb") as fdst:
+            if not _kernel_copy(fsrc.fileno(), dst_fd):
+                shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+
+    os.chmod(dst_file, mode)
+
+
+def _get_tmp_path(dst_file: str) -> str:
+    return os.path.join(
+        os.path.dirname(dst_file),
+        f".tmp-{os.getpid()}-{threading.get_ident()}-"
+        + os.path.basename(dst_file),
+    )
+
+
+def _reflink_file(src_file: str, dst_file: str) -> None:
+    if not has_fcntl or not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "reflink is not supported")
+
+    tmp_file = _get_tmp_path(dst_file)
+    try:
+        with open(src_file, "rb") as fsrc, open(tmp_file, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copymode(src_file, tmp_file)
+        os.replace(tmp_file, dst_file)
+    except OSError:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+def _hardlink_file(src_file: str, dst_file: str) -> None:
+    try:
+        if os.path.samestat(os.lstat(dst_file), os.stat(src_file)):
+            return
+    except FileNotFoundError:
+        pass
+
+    # Replace the destination atomically, it might be in use.
+    tmp_file = _get_tmp_path(dst_file)
+    os.link(src_file, tmp_file)
+    try:
+        os.replace(tmp_file, dst_file)
+    finally:
+        if os.path.lexists(tmp_file):
+            os.remove(tmp_file)
+
+
+def create_symlink(
+    target: str, link_path: str, target_is_directory: bool = False
+) -> None:
+    """Creates a symlink to 'target' at 'link_path', replacing the file or
+    the symlink there atomically."""
+
+    if sys.platform == "win32":
+        # A directory symlink could not be replaced on Windows.
+        remove_path(link_path)
+        os.symlink(target, link_path, target_is_directory=target_is_directory)
+        return
+
+    tmp_link = _get_tmp_path(link_path)
+    os.symlink(target, tmp_link, target_is_directory=target_is_directory)
+    try:
+        os.replace(tmp_link, link_path)
+    except OSError:
+        os.remove(tmp_link)
+        raise
+
+
+def _copy_symlink(src_link: str, dst_link: str) -> None:
+    if os.path.isdir(dst_link) and not os.path.islink(dst_link):
+        remove_tree(dst_link)
+
+    create_symlink(
+        os.readlink(src_link),
+        dst_link,
+        target_is_directory=os.path.isdir(src_link),
+    )
+
+
+def _copy_entry(file_pair: tuple[str, str], link_mode: str = "copy") -> str:
+    """Copies a file or a symlink, returns how it is copied, one of
+    LINK_MODES other than 'auto'."""
+
+    src_file, dst_file = file_pair
+    if os.path.islink(src_file):
+        _copy_symlink(src_file, dst_file)
+        return "copy"
+
+    if link_mode in ("auto", "reflink"):
+        try:
+            _reflink_file(src_file, dst_file)
+            return "reflink"
+        except OSError:
+            if link_mode == "reflink":
+                raise
+
+    if link_mode in ("auto", "hardlink"):
+        try:
+            _hardlink_file(src_file, dst_file)
+            return "hardlink"
+        except OSError:
+            if link_mode == "hardlink":
+                raise
+
+    _copy_file_content(src_file, dst_file)
+    return "copy"
+
+
+def get_copy_jobs() -> int:
+    override = os.environ.get(COPY_JOBS_ENV, "")
+    if override.isdigit() and int(override) > 0:
+        return int(override)
+
+    # Most of the time of copying a small file is spent on the syscalls and
+    # in the interpreter, which do not scale beyond the CPUs.
+    return min(16, get_cpu_count.get_cpu_count())
+
+
+def copy_files(
+    file_pairs: list[tuple[str, str]], jobs: int = 0, link_mode: str = "copy"
+) -> None:
+    """Copies each (source, destination) pair, by a bounded pool of threads.
+    The destination directories are created once before copying. The
+    symlinks are copied as symlinks, the files as 'link_mode' says."""
+
+    dst_dirs = {os.path.dirname(os.path.abspath(dst)) for _, dst in file_pairs}
+    for dst_dir in sorted(dst_dirs):
+        os.makedirs(dst_dir, exist_ok=True)
+
+    if jobs <= 0:
+        jobs = get_copy_jobs()
+    jobs = min(jobs, len(file_pairs) // MIN_FILES_PER_COPY_JOB)
+
+    copy_entry = partial(_copy_entry, link_mode=link_mode)
+
+    if jobs <= 1:
+        for file_pair in file_pairs:
+            copy_entry(file_pair)
+        return
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        # Raise the first exception, if any.
+        for _ in executor.map(copy_entry, file_pairs):
+            pass
+
+
+def list_tree(
+    src_path: str, dst_path: str
+) -> tuple[list[str], list[tuple[str, str]]]:
+    """Returns the destination directories, and the (source, destination)
+    pairs of the files and symlinks to copy 'src_path' into 'dst_path'. The
+    trash being removed in the background is left out."""
+
+    dst_dirs = [dst_path]
+    file_pairs = []
+
+    pending = [(src_path, dst_path)]
+    while pending:
+        src_dir, dst_dir = pending.pop()
+        with os.scandir(src_dir) as it:
+            for entry in it:
+                if entry.name == trash.TRASH_DIR_NAME:
+                    continue
+
+                dst_item_path = os.path.join(dst_dir, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    dst_dirs.append(dst_item_path)
+                    pending.append((entry.path, dst_item_path))
+                else:
+                    file_pairs.append((entry.path, dst_item_path))
+
+    return dst_dirs, file_pairs
 
 
 def remove_readonly(func, path, excinfo):
@@ -20,12 +330,468 @@ def remove_readonly(func, path, excinfo):
         raise excinfo[1]
 
 
-def remove_tree(path: str) -> None:
-    if os.path.exists(path):
-        shutil.rmtree(path, onerror=remove_readonly)
+def remove_tree(path: str, background: bool = False) -> None:
+    """Removes the directory tree 'path'. If 'background' is true, the tree is
+    moved out of the way and removed by a background process, so that the
+    caller could continue immediately, and even create 'path' again."""
+
+    if not os.path.exists(path):
+        return
+
+    if background:
+        if trash.move_to_trash(path):
+            return
+
+    shutil.rmtree(path, onerror=remove_readonly)
+
+
+def remove_path(path: str) -> None:
+    """Removes a file, a symlink or a directory tree, if it exists. A symlink
+    to a directory is removed, not the directory."""
+
+    if not os.path.lexists(path):
+        return
+
+    if os.path.isdir(path) and not os.path.islink(path):
+        remove_tree(path)
+        return
+
+    try:
+        os.remove(path)
+    except (IsADirectoryError, PermissionError):
+        # A symlink to a directory on Windows.
+        if sys.platform != "win32":
+            raise
+        os.rmdir(path)
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load_sync_manifest(manifest_path: str) -> dict:
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if manifest.get("version") != SYNC_MANIFEST_VERSION:
+        return {}
+    return manifest
+
+
+def find_out_root(path: str) -> str | None:
+    """Returns the out dir of gn containing 'path', the nearest directory
+    above it with 'args.gn', or None."""
+
+    path = os.path.abspath(path)
+    while True:
+        if os.path.isfile(os.path.join(path, "args.gn")):
+            return path
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
 
+def get_sync_manifest_file(
+    manifest_dir: str, src_path: str, dst_path: str
+) -> str:
+    """Returns the manifest in 'manifest_dir' of syncing 'src_path' into
+    'dst_path'. Several sources could be synced into the same destination,
+    each sync only removes the entries it has copied before."""
+
+    key = os.path.abspath(src_path) + "\0" + os.path.abspath(dst_path)
+    return os.path.join(
+        manifest_dir,
+        hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + ".json",
+    )
+
+
+def _save_sync_manifest(manifest_path: str, manifest: dict) -> None:
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    fd, tmp_file = tempfile.mkstemp(
+        prefix=".tmp-", dir=os.path.dirname(manifest_path)
+    )
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_file, manifest_path)
+
+
+def _remove_entry(path: str) -> None:
+    if os.path.isdir(path) and not os.path.islink(path):
+        remove_tree(path)
+    else:
+        os.remove(path)
+
+
+def _check_synced_file(
+    src_file: str,
+    dst_file: str,
+    src_st: os.stat_result,
+    record: dict | None,
+    checksum: bool,
+) -> dict | None:
+    """Returns the new record of the entry if the destination is what the
+    previous sync left, and the source is unchanged, otherwise None and the
+    file needs to be copied."""
+
+    src_stat = [src_st.st_size, src_st.st_mtime_ns]
+
+    try:
+        dst_st = os.lstat(dst_file)
+    except FileNotFoundError:
+        return None
+
+    if not stat.S_ISREG(dst_st.st_mode):
+        _remove_entry(dst_file)
+        return None
+
+    dst_stat = [dst_st.st_size, dst_st.st_mtime_ns]
+
+    synced = (
+        record is not None
+        and record.get("type") == "file"
+        and record["dst"] == dst_stat
+    )
+    if synced and record["src"] == src_stat:
+        return record
+
+    # Touched, e.g. by a checkout, or not synced before, but maybe the same
+    # content.
+    if checksum and dst_st.st_size == src_st.st_size:
+        if synced and "sha256" in record:
+            dst_sha256 = record["sha256"]
+        else:
+            dst_sha256 = _file_sha256(dst_file)
+
+        sha256 = _file_sha256(src_file)
+        if sha256 == dst_sha256:
+            return {
+                "type": "file",
+                "src": src_stat,
+                "dst": dst_stat,
+                "sha256": sha256,
+            }
+
+    return None
+
+
+def _sync_link(
+    src_link: str, dst_link: str, record: dict | None
+) -> tuple[dict, bool]:
+    target = os.readlink(src_link)
+    new_record = {"type": "link", "target": target}
+
+    if os.path.islink(dst_link):
+        if (
+            record is not None
+            and record.get("target") == target
+            and os.readlink(dst_link) == target
+        ):
+            return new_record, False
+        os.remove(dst_link)
+    elif os.path.lexists(dst_link):
+        _remove_entry(dst_link)
+
+    _copy_symlink(src_link, dst_link)
+    return new_record, True
+
+
+def _copy_synced_files(
+    to_copy: list[tuple[str, str, str, list[int]]],
+    entries: dict[str, dict],
+    stats: SyncStats,
+    checksum: bool,
+    link_mode: str,
+) -> None:
+    """Copies the (relative path, source, destination, stat of the source)
+    files in parallel, and records them in 'entries'."""
+
+    copy_files(
+        [(src, dst) for _, src, dst, _ in to_copy], link_mode=link_mode
+    )
+    for rel_path, src, dst, src_stat in to_copy:
+        dst_st = os.lstat(dst)
+        entries[rel_path] = {
+            "type": "file",
+            "src": src_stat,
+            "dst": [dst_st.st_size, dst_st.st_mtime_ns],
+        }
+        if checksum:
+            entries[rel_path]["sha256"] = _file_sha256(src)
+    stats.copied += len(to_copy)
+
+
+def _remove_stale_entries(
+    dst_path: str,
+    old_entries: dict[str, dict],
+    entries: dict[str, dict],
+    stats: SyncStats,
+) -> None:
+    """Removes the entries synced before but not this time, the deepest
+    first, a directory is only removed if nothing else is in it."""
+
+    for rel_path in sorted(
+        set(old_entries) - set(entries), key=len, reverse=True
+    ):
+        dst_item_path = os.path.join(dst_path, rel_path)
+        if old_entries[rel_path]["type"] == "dir":
+            if os.path.isdir(dst_item_path) and not os.path.islink(
+                dst_item_path
+            ):
+                try:
+                    os.rmdir(dst_item_path)
+                    stats.deleted += 1
+                except OSError:
+                    pass
+        elif os.path.lexists(dst_item_path):
+            _remove_entry(dst_item_path)
+            stats.deleted += 1
+
+
+def sync_tree(
+    src_path: str,
+    dst_path: str,
+    manifest_dir: str,
+    checksum: bool = False,
+    link_mode: str = "copy",
+) -> SyncStats:
+    """Incrementally copies the content of 'src_path' into 'dst_path'.
+
+    The entries copied by the previous sync are recorded in a manifest in
+    'manifest_dir', refer to get_sync_manifest_file(). An entry is skipped if
+    neither the source nor the destination has changed since, by their size
+    and mtime, or by the content hash of the source if 'checksum' is true. The
+    entries copied by the previous sync but no longer in the source are
+    removed from 'dst_path', the other entries in 'dst_path' are left alone.
+    """
+
+    if not os.path.exists(src_path):
+        raise FileNotFoundError(src_path + " not exist")
+
+    if not os.path.isdir(src_path):
+        raise NotADirectoryError(src_path + " is not a directory.")
+
+    if os.path.exists(dst_path) and not os.path.isdir(dst_path):
+        raise NotADirectoryError(
+            f"Destination path '{dst_path}' exists and is not a directory."
+        )
+
+    os.makedirs(dst_path, exist_ok=True)
+
+    manifest_path = get_sync_manifest_file(manifest_dir, src_path, dst_path)
+    manifest = _load_sync_manifest(manifest_path)
+    old_entries: dict[str, dict] = manifest.get("entries", {})
+
+    entries: dict[str, dict] = {}
+    stats = SyncStats()
+
+    # (relative path, source, destination, stat of the source) of the files
+    # to copy, they are copied after the walk, in parallel.
+    to_copy: list[tuple[str, str, str, list[int]]] = []
+
+    try:
+        pending = [""]
+        while pending:
+            rel_dir = pending.pop()
+            src_dir = os.path.join(src_path, rel_dir)
+            dst_dir = os.path.join(dst_path, rel_dir)
+
+            with os.scandir(src_dir) as it:
+                for entry in it:
+                    if entry.name == trash.TRASH_DIR_NAME:
+                        continue
+
+                    rel_path = os.path.join(rel_dir, entry.name)
+                    dst_item_path = os.path.join(dst_dir, entry.name)
+                    record = old_entries.get(rel_path)
+
+                    if entry.is_symlink():
+                        entries[rel_path], copied = _sync_link(
+                            entry.path, dst_item_path, record
+                        )
+                    elif entry.is_dir():
+                        if os.path.islink(dst_item_path) or (
+                            os.path.lexists(dst_item_path)
+                            and not os.path.isdir(dst_item_path)
+                        ):
+                            os.remove(dst_item_path)
+                        os.makedirs(dst_item_path, exist_ok=True)
+                        entries[rel_path] = {"type": "dir"}
+                        pending.append(rel_path)
+                        continue
+                    else:
+                        src_st = entry.stat(follow_symlinks=False)
+                        new_record = _check_synced_file(
+                            entry.path,
+                            dst_item_path,
+                            src_st,
+                            record,
+                            checksum,
+                        )
+                        if new_record is None:
+                            to_copy.append(
+                                (
+                                    rel_path,
+                                    entry.path,
+                                    dst_item_path,
+                                    [src_st.st_size, src_st.st_mtime_ns],
+                                )
+                            )
+                            continue
+                        entries[rel_path] = new_record
+                        copied = False
+
+                    if copied:
+                        stats.copied += 1
+                    else:
+                        stats.skipped += 1
+
+        _copy_synced_files(to_copy, entries, stats, checksum, link_mode)
+        _remove_stale_entries(dst_path, old_entries, entries, stats)
+
+        new_manifest = {
+            "version": SYNC_MANIFEST_VERSION,
+            "entries": entries,
+        }
+        if new_manifest != manifest:
+            _save_sync_manifest(manifest_path, new_manifest)
+    except Exception as exc:
+        log.error(
+            inspect.cleandoc(
+                f"""Failed to sync tree:
+                {src_path} =>
+                {dst_path}
+                Exception: {exc}"""
+            )
+        )
+        exit(1)
+
+    # Same as copy_tree(), but only if something has changed, so that the
+    # actions depending on 'dst_path' are not dirtied by a no-op sync.
+    if stats.copied or stats.deleted:
+        os.utime(dst_path)
+
+    return stats
+
+
+def sync_files(
+    file_pairs: list[tuple[str, str]],
+    src_path: str,
+    dst_path: str,
+    manifest_dir: str,
+    checksum: bool = False,
+    link_mode: str = "copy",
+    touch: bool = False,
+) -> SyncStats:
+    """Same as sync_tree(), but mirrors the (source, destination) pairs of
+    the files and the symlinks, whose destinations are all in 'dst_path',
+    instead of a source tree. 'src_path' is where the sources are from, the
+    manifest is keyed by it. The unchanged destinations keep their mtimes,
+    unless 'touch' is true, for the actions whose outputs must be newer than
+    their inputs. The parent directories of the destinations are recorded as
+    well, so that a directory left empty by removing the stale entries is
+    removed too."""
+
+    manifest_path = get_sync_manifest_file(manifest_dir, src_path, dst_path)
+    manifest = _load_sync_manifest(manifest_path)
+    old_entries: dict[str, dict] = manifest.get("entries", {})
+
+    entries: dict[str, dict] = {}
+    stats = SyncStats()
+    to_copy: list[tuple[str, str, str, list[int]]] = []
+
+    try:
+        os.makedirs(dst_path, exist_ok=True)
+
+        for src, dst in file_pairs:
+            rel_path = os.path.relpath(dst, dst_path)
+            if rel_path.startswith(os.pardir):
+                raise ValueError(f"{dst} is not in {dst_path}")
+
+            rel_dir = os.path.dirname(rel_path)
+            while rel_dir and rel_dir not in entries:
+                entries[rel_dir] = {"type": "dir"}
+                rel_dir = os.path.dirname(rel_dir)
+
+            record = old_entries.get(rel_path)
+            if os.path.islink(src):
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                entries[rel_path], copied = _sync_link(src, dst, record)
+                if copied:
+                    stats.copied += 1
+                else:
+                    stats.skipped += 1
+                continue
+
+            src_st = os.stat(src)
+            new_record = _check_synced_file(
+                src, dst, src_st, record, checksum
+            )
+            if new_record is None:
+                to_copy.append(
+                    (rel_path, src, dst, [src_st.st_size, src_st.st_mtime_ns])
+                )
+                continue
+
+            # Never touch the source through a hard link.
+            if touch and not os.path.samestat(src_st, os.lstat(dst)):
+                os.utime(dst)
+                dst_st = os.lstat(dst)
+                new_record = dict(
+                    new_record, dst=[dst_st.st_size, dst_st.st_mtime_ns]
+                )
+            entries[rel_path] = new_record
+            stats.skipped += 1
+
+        _copy_synced_files(to_copy, entries, stats, checksum, link_mode)
+        _remove_stale_entries(dst_path, old_entries, entries, stats)
+
+        new_manifest = {
+            "version": SYNC_MANIFEST_VERSION,
+            "entries": entries,
+        }
+        if new_manifest != manifest:
+            _save_sync_manifest(manifest_path, new_manifest)
+    except Exception as exc:
+        log.error(
+            inspect.cleandoc(
+                f"""Failed to sync files into:
+                {dst_path}
+                Exception: {exc}"""
+            )
+        )
+        exit(1)
+
+    return stats
+
+
+def copy_tree(
+    src_path: str,
+    dst_path: str,
+    rm_dst=False,
+    incremental=False,
+    checksum=False,
+    link_mode="copy",
+    manifest_dir: str | None = None,
+) -> SyncStats | None:
+    if incremental and not rm_dst:
+        if manifest_dir is None:
+            raise ValueError("The incremental copying needs a manifest_dir.")
+        return sync_tree(
+            src_path,
+            dst_path,
+            manifest_dir,
+            checksum=checksum,
+            link_mode=link_mode,
+        )
 
-def copy_tree(src_path: str, dst_path: str, rm_dst=False) -> None:
     if not os.path.exists(src_path):
         raise FileNotFoundError(src_path + " not exist")
 
@@ -52,27 +818,13 @@ def copy_tree(src_path: str, dst_path: str, rm_dst=False) -> None:
     try:
         if rm_dst:
             remove_tree(dst_path)
-            # shutil.copytree requires the destination folder is empty,
-            # otherwise, this function will throw exceptions. So use it
-            # in this case.
-            shutil.copytree(
-                src_path,
-                dst_path,
-                symlinks=True,
-                copy_function=shutil.copy,
-            )
-        # Loop all immediate items in src_path, and copy them one by
-        # one.
-        for name in os.listdir(src_path):
-            src_item_path = os.path.join(src_path, name)
-            dest_item_path = os.path.join(dst_path, name)
-            if os.path.isdir(src_item_path):
-                # Create the destination folder if not exist.
-                if not os.path.exists(dest_item_path):
-                    os.makedirs(dest_item_path, exist_ok=True)
-                copy_tree(src_item_path, dest_item_path)
-            else:
-                copy_file(src_item_path, dest_item_path, rm_dst=rm_dst)
+
+        # Create the whole directory structure first, including the empty
+        # directories, then copy the files in parallel.
+        dst_dirs, file_pairs = list_tree(src_path, dst_path)
+        for dst_dir in dst_dirs:
+            os.makedirs(dst_dir, exist_ok=True)
+        copy_files(file_pairs, link_mode=link_mode)
     except Exception as exc:
         log.error(
             inspect.cleandoc(
@@ -106,7 +858,9 @@ def copy_tree(src_path: str, dst_path: str, rm_dst=False) -> None:
             exit(1)
 
 
-def copy_file(src_file: str, dst_file: str, rm_dst=False) -> None:
+def copy_file(
+    src_file: str, dst_file: str, rm_dst=False, link_mode="copy"
+) -> None:
     if not os.path.exists(src_file):
         raise FileNotFoundError(f"{src_file} not exist")
 
@@ -146,15 +900,7 @@ def copy_file(src_file: str, dst_file: str, rm_dst=False) -> None:
         exit(1)
 
     try:
-        if os.path.islink(src_file):
-            subprocess.call(["cp", "-a", src_file, dst_file])
-        else:
-            # Ensure the destination file is writable, so that the copying
-            # operation would not be fail due to this.
-            if os.path.exists(dst_file):
-                st = os.stat(dst_file)
-                os.chmod(dst_file, st.st_mode | stat.S_IWUSR)
-            shutil.copy(src_file, dst_file)
+        copied_by = _copy_entry((src_file, dst_file), link_mode)
     except Exception as exc:
         log.error(
             inspect.cleandoc(
@@ -167,6 +913,11 @@ def copy_file(src_file: str, dst_file: str, rm_dst=False) -> None:
         )
         exit(1)
 
+    # A hard linked destination is the build result itself, touching it would
+    # make everything depending on the build result out of date.
+    if copied_by == "hardlink":
+        return
+
     try:
         # Update the file access and modify time to the current time.
         os.utime(dst_file, follow_symlinks=False)
@@ -188,12 +939,45 @@ def copy_file(src_file: str, dst_file: str, rm_dst=False) -> None:
             exit(1)
 
 
-def copy(src: str, dst: str, rm_dst=False) -> None:
+def copy(
+    src: str,
+    dst: str,
+    rm_dst=False,
+    incremental=False,
+    checksum=False,
+    link_mode="copy",
+    manifest_dir: str | None = None,
+) -> SyncStats | None:
     if os.path.exists(src):
         # Perform copying.
         if os.path.isdir(src):
-            copy_tree(src, dst, rm_dst)
+            return copy_tree(
+                src,
+                dst,
+                rm_dst,
+                incremental,
+                checksum,
+                link_mode,
+                manifest_dir,
+            )
+        elif incremental and not rm_dst:
+            if manifest_dir is None:
+                raise ValueError(
+                    "The incremental copying needs a manifest_dir."
+                )
+            # The destination is touched like copy_file() does, it is the
+            # output of the copy action.
+            return sync_files(
+                [(src, dst)],
+                src,
+                os.path.dirname(os.path.abspath(dst)),
+                manifest_dir,
+                checksum=checksum,
+                link_mode=link_mode,
+                touch=True,
+            )
         else:
-            copy_file(src, dst, rm_dst)
+            copy_file(src, dst, rm_dst, link_mode)
+            return None
     else:
         raise FileNotFoundError(f"{src} does not exist.")
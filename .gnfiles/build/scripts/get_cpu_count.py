@@ -4,17 +4,127 @@
 # Licensed under the Apache License, Version 2.0, with certain conditions.
 # Refer to the "LICENSE" file in the root directory for more information.
 #
+import argparse
+import math
 import multiprocessing
+import os
 import sys
 
 
-def main():
+# Overrides the detected CPU count, e.g. on a CI runner whose limits are not
+# visible to the processes.
+CPU_COUNT_ENV = "TGN_CPU_COUNT"
+
+
+def read_file(path: str) -> str | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def get_cgroup_paths() -> dict[str, str]:
+    """Returns the cgroup of the current process for each controller, the
+    cgroup v2 hierarchy is keyed by ""."""
+
+    paths = {}
+    content = read_file("/proc/self/cgroup") or ""
+    for line in content.splitlines():
+        parts = line.split(":", 2)
+        if len(parts) != 3:
+            continue
+        _, controllers, path = parts
+        if not controllers:
+            paths[""] = path
+        for controller in controllers.split(","):
+            paths[controller] = path
+    return paths
+
+
+def get_cgroup_dirs(mount_point: str, cgroup_path: str) -> list[str]:
+    # Inside a container, the cgroup of the process is usually mounted as the
+    # root of the hierarchy, while on a host it is a sub directory. Check the
+    # cgroup and all its ancestors, the smallest limit wins.
+    dirs = []
+    path = cgroup_path.strip("/")
+    while True:
+        dirs.append(os.path.join(mount_point, path) if path else mount_point)
+        if not path:
+            break
+        path = os.path.dirname(path)
+    return dirs
+
+
+def get_cgroup_cpu_limit() -> float | None:
+    """Returns the CPU quota of the cgroup v1 or v2 of the current process, in
+    CPUs, or None if it is not limited."""
+
+    if not sys.platform.startswith("linux"):
+        return None
+
+    cgroup_paths = get_cgroup_paths()
+    limits = []
+
+    # cgroup v2: 'cpu.max' contains '<quota> <period>' or 'max <period>'.
+    if "" in cgroup_paths:
+        for directory in get_cgroup_dirs("/sys/fs/cgroup", cgroup_paths[""]):
+            content = read_file(os.path.join(directory, "cpu.max"))
+            if not content:
+                continue
+            quota, _, period = content.partition(" ")
+            if quota != "max" and period:
+                limits.append(int(quota) / int(period))
+
+    # cgroup v1: 'cpu.cfs_quota_us' is -1 if not limited.
+    for mount_point in ["/sys/fs/cgroup/cpu,cpuacct", "/sys/fs/cgroup/cpu"]:
+        if not os.path.isdir(mount_point):
+            continue
+        for directory in get_cgroup_dirs(
+            mount_point, cgroup_paths.get("cpu", "/")
+        ):
+            quota = read_file(os.path.join(directory, "cpu.cfs_quota_us"))
+            period = read_file(os.path.join(directory, "cpu.cfs_period_us"))
+            if quota and period and int(quota) > 0 and int(period) > 0:
+                limits.append(int(quota) / int(period))
+        break
+
+    return min(limits) if limits else None
+
+
+def get_cpu_count() -> int:
+    """Returns the number of CPUs the build could use, honoring the env
+    override, the CPU affinity and the cgroup CPU quota."""
+
+    override = os.environ.get(CPU_COUNT_ENV, "")
+    if override.isdigit() and int(override) > 0:
+        return int(override)
+
     try:
-        cpu_count = multiprocessing.cpu_count()
+        if hasattr(os, "sched_getaffinity"):
+            cpu_count = len(os.sched_getaffinity(0))
+        else:
+            cpu_count = multiprocessing.cpu_count()
     except Exception:
         cpu_count = 1
 
-    print(cpu_count)
+    try:
+        limit = get_cgroup_cpu_limit()
+    except (OSError, ValueError):
+        limit = None
+    if limit is not None:
+        cpu_count = min(cpu_count, math.ceil(limit))
+
+    return max(1, cpu_count)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print the number of CPUs the build could use."
+    )
+    parser.parse_args()
+
+    print(get_cpu_count())
     return 0
 
 
@@ -7,6 +7,12 @@
 import argparse
 import json
 import os
+import tempfile
+
+
+# The memo of the results in the out dir, see '--cache-dir'.
+CACHE_FILE = "tgn_dependent_pkgs_cache.json"
+CACHE_VERSION = 1
 
 
 class ArgumentInfo(argparse.Namespace):
@@ -16,6 +22,7 @@ class ArgumentInfo(argparse.Namespace):
         self.pkg_base_dir: str
         self.app_base_dir: str
         self.pkg_type: list[str]
+        self.cache_dir: str | None = None
 
 
 def filter_folders_with_buildgn(
@@ -30,13 +37,8 @@ def filter_folders_with_buildgn(
 
 
 def load_manifest_dependencies(pkg_base_dir: str) -> list[dict]:
-    manifest_path = os.path.join(pkg_base_dir, "manifest.json")
-    if os.path.isfile(manifest_path):
-        with open(manifest_path, "r", encoding="utf-8") as f:
-            manifest_data = json.load(f)
-            if "dependencies" in manifest_data:
-                return manifest_data["dependencies"]
-    return []
+    manifest_data = load_manifest(pkg_base_dir)
+    return manifest_data.get("dependencies", [])
 
 
 def load_manifest(path: str) -> dict:
@@ -47,77 +49,175 @@ def load_manifest(path: str) -> dict:
     return {}
 
 
-def get_dependent_and_buildable_pkgs(args: ArgumentInfo) -> None:
-    dependencies = load_manifest_dependencies(args.pkg_base_dir)
+def _get_mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return -1
+
+
+def index_dependencies(
+    app_base_dir: str, dependencies: list[dict], watched_paths: list[str]
+) -> set[tuple[str, str]]:
+    """Returns the (type, name) of all the dependencies. The manifest of a
+    dependency specified by 'path' is loaded to retrieve them, once for each
+    path."""
+
+    loaded_manifests: dict[str, dict] = {}
+    index = set()
+
+    for dep in dependencies:
+        dep_name = dep.get("name")
+        dep_type = dep.get("type")
+
+        # If 'name' or 'type' is missing but 'path' is present, load
+        # `manifest.json` to retrieve them.
+        if not dep_name or not dep_type:
+            dep_path = dep.get("path")
+            if not dep_path:
+                # If there is no 'path' field, skip this dependency.
+                continue
+
+            combined_path = os.path.join(app_base_dir, dep_path)
+            if combined_path not in loaded_manifests:
+                watched_paths.append(
+                    os.path.join(combined_path, "manifest.json")
+                )
+                loaded_manifests[combined_path] = load_manifest(combined_path)
+
+            loaded_manifest = loaded_manifests[combined_path]
+            dep_name = loaded_manifest.get("name")
+            dep_type = loaded_manifest.get("type")
+            if not dep_name or not dep_type:
+                # If the necessary information is still missing, skip this
+                # dependency.
+                continue
+
+        index.add((dep_type, dep_name))
 
-    ten_pkg_type_dirs_info = {
-        "ten_packages": args.pkg_type,
-    }
+    return index
 
+
+def find_dependent_and_buildable_pkgs(
+    args: ArgumentInfo,
+) -> tuple[list[str], list[str]]:
+    """Returns the dependent and buildable packages, and the paths whose
+    mtimes determine the result."""
+
+    watched_paths = [os.path.join(args.pkg_base_dir, "manifest.json")]
+
+    dependencies = load_manifest_dependencies(args.pkg_base_dir)
+    dependency_index = index_dependencies(
+        args.app_base_dir, dependencies, watched_paths
+    )
+
+    ten_packages = "ten_packages"
     matching_folders = []
 
-    for (
-        ten_packages,
-        ten_pkg_type_dirs,
-    ) in ten_pkg_type_dirs_info.items():
-        for ten_pkg_type_dir in ten_pkg_type_dirs:
-            ten_pkg_type_path = os.path.join(
-                args.app_base_dir, ten_packages, ten_pkg_type_dir
+    # Scan each type dir once for all the requested types.
+    for ten_pkg_type_dir in dict.fromkeys(args.pkg_type):
+        ten_pkg_type_path = os.path.join(
+            args.app_base_dir, ten_packages, ten_pkg_type_dir
+        )
+
+        # Adding or removing a package changes the mtime of the type dir.
+        watched_paths.append(ten_pkg_type_path)
+
+        wanted = {name for t, name in dependency_index if t == ten_pkg_type_dir}
+        if not wanted or not os.path.isdir(ten_pkg_type_path):
+            continue
+
+        # Adding or removing the BUILD.gn of a package changes the mtime of
+        # the package dir.
+        watched_paths.extend(
+            os.path.join(ten_pkg_type_path, name) for name in sorted(wanted)
+        )
+
+        # Keep the order of the directory listing.
+        ten_pkg_paths = [
+            f
+            for f in os.listdir(ten_pkg_type_path)
+            if f in wanted and os.path.isdir(os.path.join(ten_pkg_type_path, f))
+        ]
+
+        # Filter subdirectories that contain a BUILD.gn file.
+        for ten_pkg_dir in filter_folders_with_buildgn(
+            ten_pkg_type_path, ten_pkg_paths
+        ):
+            matching_folders.append(
+                f"{ten_packages}/{ten_pkg_type_dir}/{ten_pkg_dir}"
             )
 
-            if os.path.isdir(ten_pkg_type_path):
-                # List all sub-directories in this directory.
-                ten_pkg_paths = [
-                    f
-                    for f in os.listdir(ten_pkg_type_path)
-                    if os.path.isdir(os.path.join(ten_pkg_type_path, f))
-                ]
-
-                # Filter subdirectories that contain a BUILD.gn file.
-                ten_pkg_dirs_with_buildgn = filter_folders_with_buildgn(
-                    ten_pkg_type_path, ten_pkg_paths
-                )
+    return matching_folders, watched_paths
+
+
+def _cache_key(args: ArgumentInfo) -> str:
+    return json.dumps(
+        [
+            os.path.abspath(args.app_base_dir),
+            os.path.abspath(args.pkg_base_dir),
+            args.pkg_type,
+        ]
+    )
 
-                # Check if the subfolder matches any dependency name and type.
-                for ten_pkg_dir in ten_pkg_dirs_with_buildgn:
-                    for dep in dependencies:
-                        dep_name = dep.get("name")
-                        dep_type = dep.get("type")
-
-                        # If 'name' or 'type' is missing but 'path' is present,
-                        # load `manifest.json` to retrieve them.
-                        if not dep_name or not dep_type:
-                            dep_path = dep.get("path")
-                            if dep_path:
-                                combined_path = os.path.join(
-                                    args.app_base_dir,
-                                    dep_path,
-                                )
-
-                                # Load `manifest.json` from the specified path.
-                                loaded_manifest = load_manifest(combined_path)
-                                dep_name = loaded_manifest.get("name")
-                                dep_type = loaded_manifest.get("type")
-                                if not dep_name or not dep_type:
-                                    # If the necessary information is still
-                                    # missing, skip this dependency.
-                                    continue
-                            else:
-                                # If there is no 'path' field, skip this
-                                # dependency.
-                                continue
-
-                        if (
-                            ten_pkg_dir == dep_name
-                            and ten_pkg_type_dir == dep_type
-                        ):
-                            matching_folders.append(
-                                (
-                                    f"{ten_packages}/"
-                                    f"{ten_pkg_type_dir}/"
-                                    f"{ten_pkg_dir}"
-                                )
-                            )
+
+def _load_cache(cache_file: str) -> dict:
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache.get("entries", {})
+
+
+def _save_cache(cache_file: str, entries: dict) -> None:
+    # gn runs the scripts concurrently, replace the file atomically, losing an
+    # entry only means computing it again.
+    cache_dir = os.path.dirname(cache_file)
+    fd, tmp_file = tempfile.mkstemp(prefix=".tmp-", dir=cache_dir)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "entries": entries}, f)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def get_dependent_and_buildable_pkgs(args: ArgumentInfo) -> None:
+    cache_file = ""
+    entries: dict = {}
+    key = _cache_key(args)
+
+    if args.cache_dir:
+        cache_file = os.path.join(args.cache_dir, CACHE_FILE)
+        entries = _load_cache(cache_file)
+
+        entry = entries.get(key)
+        if entry and all(
+            _get_mtime(path) == mtime for path, mtime in entry["mtimes"]
+        ):
+            for ten_pkg_dir in entry["result"]:
+                print(ten_pkg_dir)
+            return
+
+    matching_folders, watched_paths = find_dependent_and_buildable_pkgs(args)
+
+    if cache_file:
+        # Read the cache again, other entries might have been added while the
+        # result was computed.
+        entries = _load_cache(cache_file)
+        entries[key] = {
+            "result": matching_folders,
+            "mtimes": [
+                (os.path.abspath(path), _get_mtime(path))
+                for path in watched_paths
+            ],
+        }
+        _save_cache(cache_file, entries)
 
     # Print the matching sub-folders.
     for ten_pkg_dir in matching_folders:
@@ -130,6 +230,12 @@ if __name__ == "__main__":
     parser.add_argument("--app-base-dir", type=str, required=True)
     parser.add_argument("--pkg-base-dir", type=str, required=True)
     parser.add_argument("--pkg-type", type=str, required=True, action="append")
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        required=False,
+        help="The directory to memoize the results in, usually the out dir",
+    )
 
     arg_info = ArgumentInfo()
     args = parser.parse_args(namespace=arg_info)
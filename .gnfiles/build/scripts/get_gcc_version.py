@@ -8,14 +8,20 @@ import sys
 import subprocess
 
 
-def main(argv):
-    ctx = subprocess.check_output(argv[0] + " --version", shell=True)
-    lines = ctx.splitlines()
+def parse_major_version(version_output: bytes) -> str:
+    """Returns the major version in the output of 'gcc --version'."""
+
+    lines = version_output.splitlines()
     version = str(lines[0].strip()).split(" ")[-1]
     if "." not in version:
         version = str(lines[0].strip()).split(" ")[-2]
     version_numbers = version.split(".")
-    print(version_numbers[0])
+    return version_numbers[0]
+
+
+def main(argv):
+    ctx = subprocess.check_output(argv[0] + " --version", shell=True)
+    print(parse_major_version(ctx))
 
 
 if __name__ == "__main__":
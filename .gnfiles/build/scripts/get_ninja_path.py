@@ -9,9 +9,7 @@ import sys
 import platform
 
 
-def main(argv):
-    if len(argv) != 0:
-        raise ValueError("Invalid parameter")
+def get_ninja_path() -> str:
     dir_name = os.path.dirname(os.path.abspath(__file__))
 
     dir_name = os.path.join(dir_name, "..", "..", "bin")
@@ -38,7 +36,14 @@ def main(argv):
             dir_name = os.path.join(dir_name, "linux", "x64", "ninja")
         dir_name = os.path.abspath(dir_name)
 
-    sys.stdout.write(dir_name)
+    return dir_name
+
+
+def main(argv):
+    if len(argv) != 0:
+        raise ValueError("Invalid parameter")
+
+    sys.stdout.write(get_ninja_path())
     sys.exit(0)
 
 
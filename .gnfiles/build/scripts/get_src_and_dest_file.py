@@ -13,7 +13,8 @@ class ArgumentInfo(argparse.Namespace):
     def __init__(self):
         super().__init__()
 
-        self.input_string: str
+        self.input_string: str | None = None
+        self.input_strings: list[str] | None = None
         # The delimiter that separates the source and the target.
         self.src_dest_delimiter: str | None = None
         # The delimiter that separates the source_base.
@@ -71,12 +72,32 @@ def get_src_and_dest_file(
     )
 
 
+def get_src_and_dest_files(
+    input_strings: list[str],
+    src_base_delimiter: str | None,
+    src_dest_delimiter: str | None,
+) -> list[SrcDestInfo]:
+    return [
+        get_src_and_dest_file(
+            input_string, src_base_delimiter, src_dest_delimiter
+        )
+        for input_string in input_strings
+    ]
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Split an input string and return JSON of parts."
     )
-    parser.add_argument(
-        "--input-string", type=str, required=True, help="String to be split."
+    input_group = parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument(
+        "--input-string", type=str, help="String to be split."
+    )
+    input_group.add_argument(
+        "--input-strings",
+        type=str,
+        nargs="*",
+        help="Strings to be split, the result is a JSON list.",
     )
     parser.add_argument(
         "--src-dest-delimiter",
@@ -94,8 +115,17 @@ if __name__ == "__main__":
     arg_info = ArgumentInfo()
     args = parser.parse_args(namespace=arg_info)
 
-    result = get_src_and_dest_file(
-        args.input_string, args.src_base_delimiter, args.src_dest_delimiter
-    )
-
-    print(json.dumps(asdict(result), indent=2))
+    if args.input_strings is not None:
+        results = get_src_and_dest_files(
+            args.input_strings,
+            args.src_base_delimiter,
+            args.src_dest_delimiter,
+        )
+        print(json.dumps([asdict(result) for result in results], indent=2))
+    else:
+        result = get_src_and_dest_file(
+            args.input_string,
+            args.src_base_delimiter,
+            args.src_dest_delimiter,
+        )
+        print(json.dumps(asdict(result), indent=2))
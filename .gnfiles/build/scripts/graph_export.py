@@ -0,0 +1,489 @@
+#
+# Copyright © 2025 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import argparse
+import collections
+import json
+import os
+from build.scripts import build_stats, ninja_manifest
+
+
+GRAPH_FILE_NAME = "ag_graph"
+
+
+class ArgumentInfo(argparse.Namespace):
+    def __init__(self):
+        super().__init__()
+
+        self.out_dir: str
+        self.target: str
+        self.depth: int | None
+        self.prefix: str
+        self.collapse: bool
+        self.format: list[str]
+
+
+class TargetGraph:
+    """The dependency graph between gn targets, 'deps[a]' contains 'b' if 'a'
+    consumes an output of 'b'."""
+
+    def __init__(self) -> None:
+        self.kinds: dict[str, str] = {}
+        self.deps: dict[str, set[str]] = {}
+
+    def add_node(self, label: str, kind: str) -> None:
+        self.deps.setdefault(label, set())
+        self.kinds[label] = _merge_kinds(self.kinds.get(label), kind)
+
+    def add_edge(self, label: str, dep: str) -> None:
+        if label != dep:
+            self.deps[label].add(dep)
+
+
+# The kinds of targets, ordered from the most to the least significant one.
+_KINDS = ["ten_package", "link", "archive", "compile", "action", "group"]
+
+
+def _merge_kinds(a: str | None, b: str) -> str:
+    if a is None:
+        return b
+    return a if _KINDS.index(a) <= _KINDS.index(b) else b
+
+
+def _kind_of(category: str) -> str:
+    if category == "LD":
+        return "link"
+    if category == "AR":
+        return "archive"
+    if category in ninja_manifest.COMPILE_CATEGORIES:
+        return "compile"
+    if category.startswith("ACTION") or category == "COPY":
+        return "action"
+    return "group"
+
+
+def load_target_graph(
+    manifest: ninja_manifest.NinjaManifest, collapse: bool
+) -> TargetGraph:
+    """Creates the target graph from the parsed ninja files.
+
+    If 'collapse' is true, the internal targets of each `ten_package`, such as
+    '<name>_copy_build_result' and '<name>_resource_N', are merged into the
+    node of the package, which is also the label of its group target.
+    """
+
+    def node_of(label: str) -> str:
+        if collapse:
+            package = build_stats.get_ten_package_label(label)
+            if package:
+                return package
+        return label
+
+    graph = TargetGraph()
+    producers: dict[str, str] = {}
+
+    for edge in manifest.edges:
+        if not edge.label:
+            continue
+
+        node = node_of(edge.label)
+        kind = _kind_of(ninja_manifest.classify_edge(edge, manifest))
+        if collapse and node != edge.label:
+            kind = "ten_package"
+        graph.add_node(node, kind)
+
+        for output in edge.all_outputs:
+            producers[output] = node
+
+    for edge in manifest.edges:
+        if not edge.label:
+            continue
+
+        node = node_of(edge.label)
+        for path in edge.all_inputs:
+            dep = producers.get(path)
+            if dep is not None:
+                graph.add_edge(node, dep)
+
+    return graph
+
+
+def resolve_target(
+    manifest: ninja_manifest.NinjaManifest, target: str, graph: TargetGraph
+) -> str:
+    """Resolves a gn label, or a ninja output, to a node of the graph."""
+
+    if target in graph.deps:
+        return target
+
+    edge = manifest.edges_by_output().get(target)
+    if edge is not None and edge.label:
+        package = build_stats.get_ten_package_label(edge.label)
+        if package in graph.deps:
+            return package
+        if edge.label in graph.deps:
+            return edge.label
+
+    raise ValueError(f"Unknown target '{target}'")
+
+
+def filter_graph(
+    graph: TargetGraph,
+    root: str = "",
+    depth: int | None = None,
+    prefix: str = "",
+) -> TargetGraph:
+    """Keeps the nodes within 'depth' steps of the dependencies of 'root', and
+    the nodes whose label starts with 'prefix', e.g. '//core/src'."""
+
+    if root:
+        selected = {root: 0}
+        queue = collections.deque([root])
+        while queue:
+            label = queue.popleft()
+            if depth is not None and selected[label] >= depth:
+                continue
+            for dep in graph.deps[label]:
+                if dep not in selected:
+                    selected[dep] = selected[label] + 1
+                    queue.append(dep)
+        labels = set(selected)
+    else:
+        labels = set(graph.deps)
+
+    if prefix:
+        if not prefix.startswith("//"):
+            prefix = "//" + prefix.lstrip("/")
+        labels = {
+            label
+            for label in labels
+            if label.startswith(prefix) or label == root
+        }
+
+    result = TargetGraph()
+    for label in labels:
+        result.add_node(label, graph.kinds[label])
+    for label in labels:
+        for dep in graph.deps[label]:
+            if dep in labels:
+                result.add_edge(label, dep)
+    return result
+
+
+def layout_graph(graph: TargetGraph) -> dict[str, tuple[int, int]]:
+    """Assigns a (layer, row) position to every node.
+
+    The layer of a node is the length of its longest chain of dependencies,
+    so every edge goes from right to left. The nodes of a layer are ordered by
+    the average row of their dependencies, to reduce the crossings.
+    """
+
+    layers: dict[str, int] = {}
+    for start in graph.deps:
+        if start in layers:
+            continue
+        stack = [(start, False)]
+        visiting = set()
+        while stack:
+            label, expanded = stack.pop()
+            if label in layers:
+                continue
+            if not expanded:
+                if label in visiting:
+                    continue
+                visiting.add(label)
+                stack.append((label, True))
+                stack.extend(
+                    (dep, False)
+                    for dep in graph.deps[label]
+                    if dep not in layers
+                )
+                continue
+            layers[label] = 1 + max(
+                (layers.get(dep, -1) for dep in graph.deps[label]),
+                default=-1,
+            )
+
+    by_layer: dict[int, list[str]] = {}
+    for label, layer in layers.items():
+        by_layer.setdefault(layer, []).append(label)
+
+    positions: dict[str, tuple[int, int]] = {}
+    for layer in sorted(by_layer):
+        labels = sorted(by_layer[layer])
+        if layer > 0:
+
+            def barycenter(label: str) -> float:
+                rows = [
+                    positions[dep][1]
+                    for dep in graph.deps[label]
+                    if dep in positions
+                ]
+                return sum(rows) / len(rows) if rows else 0.0
+
+            labels.sort(key=barycenter)
+        for row, label in enumerate(labels):
+            positions[label] = (layer, row)
+
+    return positions
+
+
+def graph_to_json(graph: TargetGraph, root: str = "") -> dict:
+    labels = sorted(graph.deps)
+    ids = {label: index for index, label in enumerate(labels)}
+    positions = layout_graph(graph)
+
+    return {
+        "root": root,
+        "nodes": [
+            {
+                "id": ids[label],
+                "label": label,
+                "kind": graph.kinds[label],
+                "layer": positions[label][0],
+                "row": positions[label][1],
+            }
+            for label in labels
+        ],
+        # [a, b] means a depends on b.
+        "edges": [
+            [ids[label], ids[dep]]
+            for label in labels
+            for dep in sorted(graph.deps[label])
+        ],
+    }
+
+
+def _dot_quote(text: str) -> str:
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+_DOT_SHAPES = {
+    "ten_package": "box3d",
+    "link": "box",
+    "archive": "folder",
+    "compile": "component",
+    "action": "cds",
+    "group": "ellipse",
+}
+
+
+def graph_to_dot(graph: TargetGraph) -> str:
+    lines = ["digraph ag_graph {", "  rankdir=RL;", "  node [fontsize=10];"]
+    for label in sorted(graph.deps):
+        shape = _DOT_SHAPES[graph.kinds[label]]
+        lines.append(f"  {_dot_quote(label)} [shape={shape}];")
+    for label in sorted(graph.deps):
+        for dep in sorted(graph.deps[label]):
+            lines.append(f"  {_dot_quote(label)} -> {_dot_quote(dep)};")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+_HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>ag_graph</title>
+<style>
+  body { margin: 0; font: 12px sans-serif; overflow: hidden; }
+  #bar { position: fixed; top: 0; left: 0; right: 0; padding: 6px;
+         background: #f3f3f3; border-bottom: 1px solid #ccc; }
+  #info { margin-left: 12px; color: #444; }
+  canvas { position: fixed; top: 34px; left: 0; }
+</style>
+</head>
+<body>
+<div id="bar">
+  <input id="search" size="60" placeholder="Search a label, Enter to select">
+  <span id="info"></span>
+</div>
+<canvas id="view"></canvas>
+<script>
+const graph = __GRAPH__;
+const COLORS = {ten_package: "#d9534f", link: "#337ab7", archive: "#5bc0de",
+                compile: "#5cb85c", action: "#f0ad4e", group: "#999999"};
+const DX = 260, DY = 18;
+const canvas = document.getElementById("view");
+const ctx = canvas.getContext("2d");
+const info = document.getElementById("info");
+const deps = graph.nodes.map(() => []);
+const users = graph.nodes.map(() => []);
+for (const [a, b] of graph.edges) { deps[a].push(b); users[b].push(a); }
+let scale = 1, ox = 20, oy = 20, selected = -1, related = new Set();
+
+function pos(n) { return [n.layer * DX * scale + ox, n.row * DY * scale + oy]; }
+
+function draw() {
+  canvas.width = window.innerWidth;
+  canvas.height = window.innerHeight - 34;
+  ctx.clearRect(0, 0, canvas.width, canvas.height);
+  const w = canvas.width, h = canvas.height, focus = selected >= 0;
+  ctx.lineWidth = 1;
+  for (const [a, b] of graph.edges) {
+    const hot = focus && (a === selected || b === selected);
+    if (focus && !hot && scale < 0.5) continue;
+    const [x1, y1] = pos(graph.nodes[a]), [x2, y2] = pos(graph.nodes[b]);
+    if ((x1 < 0 && x2 < 0) || (x1 > w && x2 > w) ||
+        (y1 < 0 && y2 < 0) || (y1 > h && y2 > h)) continue;
+    ctx.strokeStyle = hot ? "#000" : "rgba(0,0,0,0.08)";
+    ctx.beginPath(); ctx.moveTo(x1, y1); ctx.lineTo(x2, y2); ctx.stroke();
+  }
+  const showText = DY * scale >= 9;
+  ctx.font = Math.min(12, DY * scale * 0.7) + "px sans-serif";
+  for (const n of graph.nodes) {
+    const [x, y] = pos(n);
+    if (x < -DX || x > w || y < -DY || y > h) continue;
+    const dim = focus && n.id !== selected && !related.has(n.id);
+    ctx.fillStyle = dim ? "#ddd" : COLORS[n.kind];
+    ctx.fillRect(x - 3, y - 3, 6, 6);
+    if (showText) {
+      ctx.fillStyle = dim ? "#bbb" : "#000";
+      ctx.fillText(n.label, x + 6, y + 4);
+    }
+  }
+}
+
+function select(id) {
+  selected = id;
+  related = new Set(id >= 0 ? deps[id].concat(users[id]) : []);
+  if (id >= 0) {
+    const n = graph.nodes[id];
+    info.textContent = n.label + " (" + n.kind + "), " + deps[id].length +
+      " deps, " + users[id].length + " dependents";
+  } else {
+    info.textContent = graph.nodes.length + " nodes, " +
+      graph.edges.length + " edges, drag to pan, wheel to zoom";
+  }
+  draw();
+}
+
+function nodeAt(mx, my) {
+  let best = -1, bestD = 64;
+  for (const n of graph.nodes) {
+    const [x, y] = pos(n), d = (x - mx) ** 2 + (y - my) ** 2;
+    if (d < bestD) { best = n.id; bestD = d; }
+  }
+  return best;
+}
+
+let drag = null;
+canvas.addEventListener("mousedown", e => {
+  drag = {x: e.clientX, y: e.clientY, ox, oy, moved: false};
+});
+window.addEventListener("mousemove", e => {
+  if (!drag) return;
+  ox = drag.ox + e.clientX - drag.x; oy = drag.oy + e.clientY - drag.y;
+  drag.moved = true; draw();
+});
+window.addEventListener("mouseup", e => {
+  if (drag && !drag.moved) select(nodeAt(e.offsetX, e.offsetY));
+  drag = null;
+});
+canvas.addEventListener("wheel", e => {
+  e.preventDefault();
+  const f = e.deltaY < 0 ? 1.2 : 1 / 1.2;
+  ox = e.offsetX - (e.offsetX - ox) * f; oy = e.offsetY - (e.offsetY - oy) * f;
+  scale *= f; draw();
+}, {passive: false});
+document.getElementById("search").addEventListener("keydown", e => {
+  if (e.key !== "Enter") return;
+  const q = e.target.value.trim();
+  const n = graph.nodes.find(n => n.label === q) ||
+            graph.nodes.find(n => n.label.includes(q));
+  if (!n) return;
+  scale = 1; ox = canvas.width / 2 - n.layer * DX;
+  oy = canvas.height / 2 - n.row * DY;
+  select(n.id);
+});
+window.addEventListener("resize", draw);
+const root = graph.nodes.find(n => n.label === graph.root);
+select(root ? root.id : -1);
+</script>
+</body>
+</html>
+"""
+
+
+def graph_to_html(graph_json: dict) -> str:
+    # '</' must not appear inside the <script> element.
+    data = json.dumps(graph_json, separators=(",", ":")).replace("</", "<\\/")
+    return _HTML_TEMPLATE.replace("__GRAPH__", data)
+
+
+def export_graph(
+    out_dir: str,
+    target: str = "",
+    depth: int | None = None,
+    prefix: str = "",
+    collapse: bool = False,
+    formats: list[str] | None = None,
+) -> list[str]:
+    """Exports the target graph into the out dir, returns the written files.
+
+    The supported formats are 'json', 'dot' and 'html', the html file is a
+    self-contained viewer which does not need graphviz.
+    """
+
+    if formats is None:
+        formats = ["json", "dot"]
+
+    manifest = ninja_manifest.parse_ninja_manifest(out_dir)
+    graph = load_target_graph(manifest, collapse)
+
+    root = resolve_target(manifest, target, graph) if target else ""
+    graph = filter_graph(graph, root, depth, prefix)
+
+    graph_json = graph_to_json(graph, root)
+
+    written = []
+    for fmt in formats:
+        path = os.path.join(out_dir, f"{GRAPH_FILE_NAME}.{fmt}")
+        if fmt == "json":
+            content = json.dumps(graph_json, separators=(",", ":"))
+        elif fmt == "dot":
+            content = graph_to_dot(graph)
+        elif fmt == "html":
+            content = graph_to_html(graph_json)
+        else:
+            raise ValueError(f"Unsupported graph format '{fmt}'")
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        written.append(path)
+
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export the dependency graph between gn targets."
+    )
+    parser.add_argument("--out-dir", type=str, required=True)
+    parser.add_argument("--target", type=str, default="")
+    parser.add_argument("--depth", type=int, default=None)
+    parser.add_argument("--prefix", type=str, default="")
+    parser.add_argument("--collapse", action="store_true", default=False)
+    parser.add_argument(
+        "--format",
+        type=str,
+        action="append",
+        choices=["json", "dot", "html"],
+        default=[],
+    )
+
+    arg_info = ArgumentInfo()
+    args = parser.parse_args(namespace=arg_info)
+
+    for written_file in export_graph(
+        os.path.abspath(args.out_dir),
+        args.target,
+        args.depth,
+        args.prefix,
+        args.collapse,
+        args.format or None,
+    ):
+        print(written_file)
@@ -0,0 +1,167 @@
+#
+# Copyright © 2025 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+# The thin client of helper_server.py, used instead of the helper scripts by
+# the actions when the gn arg 'enable_helper_server' is true:
+#
+#   python3 helper_client.py copy_fs_entry --source ... --destination ...
+#   python3 helper_client.py combine ar libfoo.a @libfoo.a.rsp
+#
+# The request is sent to the helper server of the current directory (the out
+# dir, where ninja runs the actions), which runs the script in-process. If the
+# server is not running, it is started in the background and the script is run
+# by the client itself, so the result is always the same as running the script
+# directly.
+#
+# This script is executed for every action, so it imports as little as
+# possible.
+#
+import json
+import os
+import socket
+import sys
+
+SOCKET_FILE = "tgn_helper.sock"
+LOCK_FILE = "tgn_helper.lock"
+
+# The scripts which could be run by the helper server, and their entry points,
+# which take the command line arguments.
+HANDLERS = {
+    "copy_fs_entry": ("build.scripts.copy_fs_entry", "main"),
+    "combine": ("build.scripts.combine", "combine"),
+}
+
+# Connecting to a busy server could take a while, but not longer than this.
+CONNECT_TIMEOUT = 5.0
+
+
+def _gnfiles_dir() -> str:
+    return os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+
+
+def get_handler(name: str):
+    module_name, function_name = HANDLERS[name]
+
+    gnfiles_dir = _gnfiles_dir()
+    if gnfiles_dir not in sys.path:
+        sys.path.insert(0, gnfiles_dir)
+
+    module = __import__(module_name, fromlist=[function_name])
+    return getattr(module, function_name)
+
+
+def run_locally(name: str, argv: list[str]) -> int:
+    try:
+        result = get_handler(name)(argv)
+    except SystemExit as e:
+        result = e.code
+        if result is not None and not isinstance(result, int):
+            sys.stderr.write(f"{result}\n")
+            result = 1
+    return result or 0
+
+
+def send_request(name: str, argv: list[str]) -> dict | None:
+    """Sends the request to the helper server, returns None if the server is
+    not running or is not able to handle it."""
+
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.settimeout(CONNECT_TIMEOUT)
+        client.connect(SOCKET_FILE)
+        client.settimeout(None)
+
+        request = {"script": name, "argv": argv, "cwd": os.getcwd()}
+        client.sendall(json.dumps(request).encode("utf-8"))
+        client.shutdown(socket.SHUT_WR)
+
+        chunks = []
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    except OSError:
+        return None
+    finally:
+        client.close()
+
+    try:
+        response = json.loads(b"".join(chunks).decode("utf-8"))
+    except ValueError:
+        return None
+
+    if response.get("fallback"):
+        return None
+    return response
+
+
+def is_server_running() -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+
+    try:
+        with open(LOCK_FILE, "a", encoding="utf-8") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return True
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    except OSError:
+        pass
+    return False
+
+
+def start_server() -> None:
+    if not hasattr(socket, "AF_UNIX") or is_server_running():
+        return
+
+    import subprocess
+
+    server = os.path.join(os.path.dirname(__file__), "helper_server.py")
+    try:
+        subprocess.Popen(
+            [sys.executable, server],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+            close_fds=True,
+        )
+    except OSError:
+        pass
+
+
+def main(argv: list[str]) -> int:
+    if not argv or argv[0] not in HANDLERS:
+        sys.stderr.write(
+            "Usage: helper_client.py <{}> [args...]\n".format(
+                "|".join(HANDLERS)
+            )
+        )
+        return 1
+
+    name, script_argv = argv[0], argv[1:]
+
+    response = send_request(name, script_argv)
+    if response is None:
+        start_server()
+        return run_locally(name, script_argv)
+
+    sys.stdout.write(response.get("stdout", ""))
+    sys.stderr.write(response.get("stderr", ""))
+    return response.get("returncode", 1)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,245 @@
+#
+# Copyright © 2025 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+# A long-lived helper server, which runs the helper scripts listed in
+# helper_client.HANDLERS in-process, so that the actions do not pay for the
+# startup of a Python interpreter and the imports of the scripts each time.
+#
+# The server listens on a Unix socket in the current directory (the out dir),
+# it is started by helper_client.py on demand and exits after being idle for a
+# while, or when the scripts it has loaded are modified.
+#
+import argparse
+import io
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+import traceback
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ),
+)
+
+from build.scripts import helper_client  # noqa: E402
+
+try:
+    import fcntl
+
+    has_fcntl = True
+except ImportError:
+    has_fcntl = False
+
+
+DEFAULT_IDLE_TIMEOUT = 300
+
+
+class ArgumentInfo(argparse.Namespace):
+    def __init__(self):
+        super().__init__()
+
+        self.idle_timeout: int
+
+
+class ThreadLocalStream(io.TextIOBase):
+    """Replaces sys.stdout and sys.stderr, so that the output of each request
+    is captured separately, while the requests are handled concurrently."""
+
+    def __init__(self, stream) -> None:
+        super().__init__()
+        self.stream = stream
+        self.local = threading.local()
+
+    def capture(self, buffer: io.StringIO | None) -> None:
+        self.local.buffer = buffer
+
+    def _target(self):
+        buffer = getattr(self.local, "buffer", None)
+        return buffer if buffer is not None else self.stream
+
+    def write(self, s: str) -> int:
+        return self._target().write(s)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def isatty(self) -> bool:
+        return False
+
+
+class HelperServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, idle_timeout: int) -> None:
+        super().__init__(helper_client.SOCKET_FILE, RequestHandler)
+
+        self.idle_timeout = idle_timeout
+        self.cwd = os.getcwd()
+        self.lock = threading.Lock()
+        self.active_requests = 0
+        self.last_activity = time.monotonic()
+        self.stale = False
+
+        self.stdout = ThreadLocalStream(sys.stdout)
+        self.stderr = ThreadLocalStream(sys.stderr)
+        sys.stdout = self.stdout
+        sys.stderr = self.stderr
+
+        # Import the scripts before handling any request, the loggers they
+        # create at import time write to the captured streams.
+        self.handlers = {
+            name: helper_client.get_handler(name)
+            for name in helper_client.HANDLERS
+        }
+        self.module_mtimes = self._get_module_mtimes()
+
+    def _get_module_mtimes(self) -> dict[str, int]:
+        scripts_dir = os.path.dirname(os.path.abspath(__file__))
+
+        mtimes = {}
+        for module in list(sys.modules.values()):
+            path = getattr(module, "__file__", None)
+            if path and os.path.dirname(os.path.abspath(path)) == scripts_dir:
+                try:
+                    mtimes[path] = os.stat(path).st_mtime_ns
+                except OSError:
+                    mtimes[path] = 0
+        return mtimes
+
+    def is_stale(self) -> bool:
+        if not self.stale:
+            self.stale = self._get_module_mtimes() != self.module_mtimes
+        return self.stale
+
+    def run_script(self, name: str, argv: list[str]) -> dict:
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        self.stdout.capture(stdout)
+        self.stderr.capture(stderr)
+        try:
+            returncode = self.handlers[name](argv) or 0
+        except SystemExit as e:
+            returncode = e.code
+            if returncode is not None and not isinstance(returncode, int):
+                stderr.write(f"{returncode}\n")
+                returncode = 1
+            returncode = returncode or 0
+        except Exception:
+            stderr.write(traceback.format_exc())
+            returncode = 1
+        finally:
+            self.stdout.capture(None)
+            self.stderr.capture(None)
+
+        return {
+            "returncode": returncode,
+            "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue(),
+        }
+
+    def watch_idle(self) -> None:
+        while True:
+            time.sleep(1)
+            with self.lock:
+                if self.active_requests:
+                    continue
+                idle = time.monotonic() - self.last_activity
+                if self.stale or idle > self.idle_timeout:
+                    break
+        self.shutdown()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    server: HelperServer
+
+    def handle(self) -> None:
+        server = self.server
+        with server.lock:
+            server.active_requests += 1
+        try:
+            response = self._handle_request()
+            self.wfile.write(json.dumps(response).encode("utf-8"))
+        finally:
+            with server.lock:
+                server.active_requests -= 1
+                server.last_activity = time.monotonic()
+
+    def _handle_request(self) -> dict:
+        server = self.server
+
+        try:
+            request = json.loads(self.rfile.read().decode("utf-8"))
+        except ValueError:
+            return {"fallback": True}
+
+        # The client runs the script by itself if the server could not run
+        # it the same way.
+        if (
+            request.get("cwd") != server.cwd
+            or request.get("script") not in server.handlers
+            or server.is_stale()
+        ):
+            return {"fallback": True}
+
+        return server.run_script(request["script"], request.get("argv", []))
+
+
+def serve(idle_timeout: int) -> int:
+    if not has_fcntl:
+        return 1
+
+    # Only one server for each out dir, the lock is held until the server
+    # exits.
+    lock = open(helper_client.LOCK_FILE, "a", encoding="utf-8")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return 0
+
+    try:
+        # The socket of a server which was killed.
+        if os.path.exists(helper_client.SOCKET_FILE):
+            os.remove(helper_client.SOCKET_FILE)
+
+        server = HelperServer(idle_timeout)
+        watcher = threading.Thread(target=server.watch_idle, daemon=True)
+        watcher.start()
+        try:
+            server.serve_forever(poll_interval=0.5)
+        finally:
+            server.server_close()
+            if os.path.exists(helper_client.SOCKET_FILE):
+                os.remove(helper_client.SOCKET_FILE)
+    finally:
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        lock.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the helper scripts of the actions in-process."
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=int,
+        default=int(
+            os.environ.get("TGN_HELPER_IDLE_TIMEOUT", DEFAULT_IDLE_TIMEOUT)
+        ),
+        help="Exit after being idle for this many seconds",
+    )
+
+    arg_info = ArgumentInfo()
+    args = parser.parse_args(namespace=arg_info)
+
+    sys.exit(serve(args.idle_timeout))
@@ -0,0 +1,362 @@
+#
+# Copyright © 2025 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+# Sizes the link pool by the available memory, and learns the peak RSS of each
+# link from the previous builds.
+#
+#   link_memory.py depth --out-dir <out dir> --cpu-count <n>
+#     Prints the depth of the link pool, the available memory divided by the
+#     estimated peak RSS of a link, at most the CPU count.
+#
+#   link_memory.py run --output <output> -- <link command>
+#     Runs a link and records its peak RSS in the out dir. The toolchain uses it
+#     as the prefix of the link commands when 'enable_link_memory_tracking' is
+#     true. A link whose last peak RSS exceeds its share of the memory is a
+#     heavy link, it has to take one of the few heavy link slots first, so
+#     that the heavy links do not run all at once.
+#
+#   link_memory.py show --out-dir <out dir>
+#     Prints the recorded peak RSS of the links.
+#
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# gn runs the script from the out dir, without PYTHONPATH if gn is not started
+# by tgn.
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ),
+)
+
+from build.scripts import get_cpu_count  # noqa: E402
+
+try:
+    import fcntl
+    import resource
+
+    has_fcntl = True
+except ImportError:
+    has_fcntl = False
+
+
+HISTORY_FILE = "tgn_link_memory.json"
+HISTORY_VERSION = 1
+
+# The estimated peak RSS of a link, when there is no record yet.
+DEFAULT_LINK_RSS = 1024 * 1024 * 1024
+
+
+class ArgumentInfo(argparse.Namespace):
+    def __init__(self):
+        super().__init__()
+
+        self.action: str
+        self.out_dir: str
+        self.cpu_count: int
+        self.output: str
+        self.command: list[str]
+
+
+def get_cgroup_memory_available() -> int | None:
+    """Returns the memory which could still be used under the cgroup v1 or v2
+    memory limit of the current process, or None if it is not limited."""
+
+    if not sys.platform.startswith("linux"):
+        return None
+
+    cgroup_paths = get_cpu_count.get_cgroup_paths()
+    available = []
+
+    def add(limit: str | None, usage: str | None) -> None:
+        if not limit or not limit.isdigit():
+            return
+        # cgroup v1 reports an unlimited cgroup with a huge number.
+        if int(limit) >= 1 << 62:
+            return
+        used = int(usage) if usage and usage.isdigit() else 0
+        available.append(max(0, int(limit) - used))
+
+    if "" in cgroup_paths:
+        for directory in get_cpu_count.get_cgroup_dirs(
+            "/sys/fs/cgroup", cgroup_paths[""]
+        ):
+            add(
+                get_cpu_count.read_file(os.path.join(directory, "memory.max")),
+                get_cpu_count.read_file(
+                    os.path.join(directory, "memory.current")
+                ),
+            )
+
+    if os.path.isdir("/sys/fs/cgroup/memory"):
+        for directory in get_cpu_count.get_cgroup_dirs(
+            "/sys/fs/cgroup/memory", cgroup_paths.get("memory", "/")
+        ):
+            add(
+                get_cpu_count.read_file(
+                    os.path.join(directory, "memory.limit_in_bytes")
+                ),
+                get_cpu_count.read_file(
+                    os.path.join(directory, "memory.usage_in_bytes")
+                ),
+            )
+
+    return min(available) if available else None
+
+
+def get_mem_available() -> int | None:
+    """Returns 'MemAvailable' of /proc/meminfo, or None if unknown."""
+
+    content = get_cpu_count.read_file("/proc/meminfo") or ""
+    for line in content.splitlines():
+        if line.startswith("MemAvailable:"):
+            return int(line.split()[1]) * 1024
+    return None
+
+
+def get_available_memory() -> int | None:
+    candidates = [
+        m
+        for m in [get_cgroup_memory_available(), get_mem_available()]
+        if m is not None
+    ]
+    return min(candidates) if candidates else None
+
+
+# -------------------------------------------------------------------------
+# The history of the peak RSS of the links.
+# -------------------------------------------------------------------------
+
+
+def _history_path(out_dir: str) -> str:
+    return os.path.join(out_dir, HISTORY_FILE)
+
+
+def load_history(out_dir: str) -> dict:
+    try:
+        with open(_history_path(out_dir), "r", encoding="utf-8") as f:
+            history = json.load(f)
+    except (OSError, ValueError):
+        history = {}
+
+    if history.get("version") != HISTORY_VERSION:
+        history = {"version": HISTORY_VERSION, "links": {}}
+    return history
+
+
+def save_history(out_dir: str, history: dict) -> None:
+    fd, tmp_file = tempfile.mkstemp(prefix=".tmp-", dir=out_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_file, _history_path(out_dir))
+
+
+def update_history(out_dir: str, update) -> None:
+    """Applies 'update' to the history, the concurrent links are serialized
+    by a lock file."""
+
+    if not has_fcntl:
+        history = load_history(out_dir)
+        update(history)
+        save_history(out_dir, history)
+        return
+
+    with open(_history_path(out_dir) + ".lock", "a", encoding="utf-8") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            history = load_history(out_dir)
+            update(history)
+            save_history(out_dir, history)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def estimate_link_rss(history: dict) -> int:
+    """The estimated peak RSS of a link, the 75th percentile of the recorded
+    ones."""
+
+    peaks = sorted(link["peak_rss"] for link in history["links"].values())
+    if not peaks:
+        return DEFAULT_LINK_RSS
+    return peaks[(len(peaks) - 1) * 3 // 4]
+
+
+def stabilize_depth(depth: int, cpu_count: int, previous_depth: int) -> int:
+    """The depth of the link pool is in the file gn reads, a change of it
+    runs 'gn gen' again. The available memory changes all the time, so the
+    depth is rounded down to a power of two, or is the CPU count, and
+    'previous_depth' is kept unless 'depth' has dropped to half of it or has
+    reached twice of it."""
+
+    if previous_depth and previous_depth // 2 < depth < previous_depth * 2:
+        return min(previous_depth, cpu_count)
+    if depth >= cpu_count:
+        return cpu_count
+    return 1 << (depth.bit_length() - 1)
+
+
+def get_link_pool_depth(
+    out_dir: str, cpu_count: int, previous_depth: int = 0
+) -> int:
+    """Returns the depth of the link pool, stabilized against the previous
+    one, refer to stabilize_depth()."""
+
+    history = load_history(out_dir)
+    available = get_available_memory()
+
+    depth = cpu_count
+    if available is not None:
+        depth = min(depth, available // estimate_link_rss(history))
+    depth = stabilize_depth(max(1, depth), cpu_count, previous_depth)
+
+    # The links share the memory of the build, which is recorded for the
+    # heavy link slots.
+    if os.path.isdir(out_dir):
+        budget = available or 0
+
+        def update(history: dict) -> None:
+            history["memory_budget"] = budget
+            history["link_pool_depth"] = depth
+
+        update_history(out_dir, update)
+
+    return depth
+
+
+# -------------------------------------------------------------------------
+# Running a link.
+# -------------------------------------------------------------------------
+
+
+def _acquire_heavy_link_slot(out_dir: str, slots: int):
+    """Blocks until one of the heavy link slots is free, returns its lock."""
+
+    while True:
+        for slot in range(slots):
+            lock = open(
+                os.path.join(out_dir, f"{HISTORY_FILE}.slot{slot}.lock"),
+                "a",
+                encoding="utf-8",
+            )
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return lock
+            except OSError:
+                lock.close()
+        time.sleep(0.1)
+
+
+def run_link(out_dir: str, output: str, command: list[str]) -> int:
+    if not has_fcntl:
+        return subprocess.call(command)
+
+    history = load_history(out_dir)
+    last_peak = history["links"].get(output, {}).get("peak_rss", 0)
+
+    slot_lock = None
+    budget = history.get("memory_budget", 0)
+    depth = history.get("link_pool_depth", 0)
+    if budget and depth and last_peak > budget // depth:
+        slot_lock = _acquire_heavy_link_slot(
+            out_dir, max(1, budget // last_peak)
+        )
+
+    start = time.monotonic()
+    try:
+        returncode = subprocess.call(command)
+    finally:
+        if slot_lock is not None:
+            fcntl.flock(slot_lock, fcntl.LOCK_UN)
+            slot_lock.close()
+
+    if returncode != 0:
+        return returncode
+
+    # This process runs nothing but the link, so the largest child is the
+    # linker. ru_maxrss is in KB on Linux and in bytes on macOS.
+    peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if sys.platform != "darwin":
+        peak_rss *= 1024
+
+    def update(history: dict) -> None:
+        history["links"][output] = {
+            "peak_rss": peak_rss,
+            "duration_ms": int((time.monotonic() - start) * 1000),
+        }
+
+    try:
+        update_history(out_dir, update)
+    except OSError:
+        pass
+
+    return 0
+
+
+def format_history(out_dir: str, top: int) -> str:
+    history = load_history(out_dir)
+    links = sorted(
+        history["links"].items(),
+        key=lambda item: item[1]["peak_rss"],
+        reverse=True,
+    )
+
+    mb = 1024 * 1024
+    lines = [f"Peak RSS of the links in {out_dir}"]
+    for output, link in links[:top]:
+        lines.append(f"  {link['peak_rss'] / mb:>9.0f} MB  {output}")
+
+    lines.append("")
+    lines.append(
+        f"  estimated peak RSS of a link: {estimate_link_rss(history) / mb:.0f}"
+        " MB"
+    )
+    if history.get("memory_budget"):
+        lines.append(
+            "  memory available at gen:     "
+            f"{history['memory_budget'] / mb:.0f} MB"
+        )
+    if history.get("link_pool_depth"):
+        lines.append(
+            f"  link pool depth:              {history['link_pool_depth']}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Size the link pool by the memory the links need."
+    )
+    parser.add_argument("action", choices=["depth", "run", "show"])
+    parser.add_argument("--out-dir", type=str, default=".")
+    parser.add_argument("--cpu-count", type=int, default=0)
+    parser.add_argument("--output", type=str, default="")
+
+    # The link command follows '--', it is not parsed.
+    argv = sys.argv[1:]
+    command = []
+    if "--" in argv:
+        command = argv[argv.index("--") + 1 :]  # noqa
+        argv = argv[: argv.index("--")]
+
+    arg_info = ArgumentInfo()
+    args = parser.parse_args(argv, namespace=arg_info)
+    args.command = command
+
+    if args.action == "depth":
+        cpu_count = args.cpu_count or get_cpu_count.get_cpu_count()
+        print(get_link_pool_depth(args.out_dir, cpu_count))
+    elif args.action == "run":
+        if not args.command or not args.output:
+            parser.error("'run' needs --output and the link command")
+        sys.exit(run_link(args.out_dir, args.output, args.command))
+    else:
+        print(format_history(args.out_dir, 20))
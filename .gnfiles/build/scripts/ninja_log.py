@@ -0,0 +1,91 @@
+#
+# Copyright © 2025 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import os
+from dataclasses import dataclass, field
+
+
+NINJA_LOG_FILE = ".ninja_log"
+
+
+@dataclass
+class NinjaLogEntry:
+    # The start and end time of the edge, in milliseconds, relative to the
+    # start of the build.
+    start_ms: int
+    end_ms: int
+    command_hash: str
+    outputs: list[str] = field(default_factory=list)
+
+    @property
+    def duration_ms(self) -> int:
+        return self.end_ms - self.start_ms
+
+
+def read_ninja_log(out_dir: str) -> list[list[NinjaLogEntry]]:
+    """Reads the '.ninja_log' in the out dir.
+
+    Every line of '.ninja_log' is 'start end mtime output command_hash',
+    separated by tabs. ninja appends the finished edges to the file in the
+    order they finish, so the end time decreasing means a new build starts.
+    An edge with several outputs has one line per output, those lines are
+    merged into one entry.
+
+    Returns the entries of each build recorded in the file, the last one is
+    the most recent build. Returns an empty list if there is no log.
+    """
+
+    log_file = os.path.join(out_dir, NINJA_LOG_FILE)
+    if not os.path.exists(log_file):
+        return []
+
+    builds: list[list[NinjaLogEntry]] = []
+    entries: dict[tuple[int, int, str], NinjaLogEntry] = {}
+    last_end_ms = -1
+
+    with open(log_file, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 5:
+                continue
+
+            try:
+                start_ms = int(fields[0])
+                end_ms = int(fields[1])
+            except ValueError:
+                continue
+
+            if end_ms < last_end_ms:
+                builds.append(list(entries.values()))
+                entries = {}
+            last_end_ms = end_ms
+
+            key = (start_ms, end_ms, fields[4])
+            entry = entries.get(key)
+            if entry is None:
+                entry = NinjaLogEntry(start_ms, end_ms, fields[4])
+                entries[key] = entry
+            entry.outputs.append(fields[3])
+
+    if entries:
+        builds.append(list(entries.values()))
+
+    return builds
+
+
+def read_last_durations(out_dir: str) -> dict[str, int]:
+    """Returns the most recent duration of every output in '.ninja_log', in
+    milliseconds."""
+
+    durations: dict[str, int] = {}
+    for build in read_ninja_log(out_dir):
+        for entry in build:
+            for output in entry.outputs:
+                durations[output] = entry.duration_ms
+    return durations
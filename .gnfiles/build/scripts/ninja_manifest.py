@@ -0,0 +1,226 @@
+#
+# Copyright © 2025 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import os
+import re
+from dataclasses import dataclass, field
+
+
+@dataclass
+class NinjaEdge:
+    rule: str
+    outputs: list[str] = field(default_factory=list)
+    implicit_outputs: list[str] = field(default_factory=list)
+    inputs: list[str] = field(default_factory=list)
+    implicit_inputs: list[str] = field(default_factory=list)
+    order_only_inputs: list[str] = field(default_factory=list)
+    variables: dict[str, str] = field(default_factory=dict)
+
+    # The gn label of the target which the edge belongs to, e.g.
+    # '//foo/bar:baz', or "" if unknown.
+    label: str = ""
+
+    @property
+    def all_outputs(self) -> list[str]:
+        return self.outputs + self.implicit_outputs
+
+    @property
+    def all_inputs(self) -> list[str]:
+        return self.inputs + self.implicit_inputs + self.order_only_inputs
+
+
+@dataclass
+class NinjaManifest:
+    edges: list[NinjaEdge] = field(default_factory=list)
+
+    # The variables of each rule, e.g. 'command', keyed by the rule name. The
+    # rules of gn actions are local to the ninja file of the target, but their
+    # names are unique, so a flat mapping is enough.
+    rules: dict[str, dict[str, str]] = field(default_factory=dict)
+
+    def edges_by_output(self) -> dict[str, NinjaEdge]:
+        result = {}
+        for edge in self.edges:
+            for output in edge.all_outputs:
+                result[output] = edge
+        return result
+
+
+# gn writes the ninja file of each target to
+# '[<toolchain>/]obj/<source dir>/<target name>.ninja'.
+_TARGET_NINJA_FILE_PATTERN = re.compile(r"(?:^|/)obj/(?:(.*)/)?([^/]+)\.ninja$")
+
+
+def label_from_ninja_file(path: str) -> str:
+    match = _TARGET_NINJA_FILE_PATTERN.search(path.replace("\\", "/"))
+    if not match:
+        return ""
+    return "//{}:{}".format(match.group(1) or "", match.group(2))
+
+
+def _unescape(token: str) -> str:
+    return re.sub(r"\$([ :$\n])", r"\1", token)
+
+
+def _split_paths(text: str) -> list[str]:
+    """Splits a list of paths separated by unescaped spaces."""
+
+    return [
+        _unescape(token)
+        for token in re.findall(r"(?:\$.|[^ $])+", text.strip())
+        if token
+    ]
+
+
+def _parse_build_line(text: str) -> NinjaEdge | None:
+    # Find the first unescaped ':', which separates the outputs and the rule.
+    match = re.match(r"((?:\$.|[^:$])*):(.*)$", text)
+    if not match:
+        return None
+
+    outputs_text, rest = match.groups()
+
+    outputs, _, implicit_outputs = outputs_text.partition(" | ")
+    rule_and_inputs = _split_paths(rest)
+    if not rule_and_inputs:
+        return None
+
+    edge = NinjaEdge(rule=rule_and_inputs[0])
+    edge.outputs = _split_paths(outputs)
+    edge.implicit_outputs = _split_paths(implicit_outputs)
+
+    current = edge.inputs
+    for token in rule_and_inputs[1:]:
+        if token == "|":
+            current = edge.implicit_inputs
+        elif token == "||":
+            current = edge.order_only_inputs
+        elif token == "|@":
+            # Validations do not participate in the build order.
+            current = []
+        else:
+            current.append(token)
+
+    return edge
+
+
+def _read_logical_lines(path: str):
+    """Yields the lines of a ninja file, joining the lines ending with '$'."""
+
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        pending = ""
+        for line in f:
+            line = line.rstrip("\r\n")
+            if line.endswith("$") and not line.endswith("$$"):
+                pending += line[:-1]
+                continue
+            yield pending + line
+            pending = ""
+        if pending:
+            yield pending
+
+
+def _parse_file(
+    out_dir: str, rel_path: str, manifest: NinjaManifest, label: str
+) -> None:
+    current: dict[str, str] | None = None
+
+    for line in _read_logical_lines(os.path.join(out_dir, rel_path)):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+
+        if line[0] in " \t":
+            # A variable of the preceding rule, build or pool statement.
+            if current is not None:
+                key, _, value = line.strip().partition("=")
+                current[key.strip()] = value.strip()
+            continue
+
+        current = None
+        keyword, _, rest = line.partition(" ")
+
+        if keyword == "build":
+            edge = _parse_build_line(rest)
+            if edge is not None:
+                edge.label = label
+                manifest.edges.append(edge)
+                current = edge.variables
+        elif keyword == "rule":
+            current = manifest.rules.setdefault(rest.strip(), {})
+        elif keyword in ("subninja", "include"):
+            child = _unescape(rest.strip())
+            if not os.path.exists(os.path.join(out_dir, child)):
+                continue
+            child_label = label_from_ninja_file(child) or label
+            _parse_file(out_dir, child, manifest, child_label)
+
+
+def parse_ninja_manifest(out_dir: str) -> NinjaManifest:
+    """Parses 'build.ninja' generated by gn and all the ninja files it
+    includes.
+
+    Only the subset of the ninja syntax which gn generates is supported, the
+    paths in the result are relative to the out dir, as they are in the ninja
+    files.
+    """
+
+    manifest = NinjaManifest()
+    _parse_file(out_dir, "build.ninja", manifest, "")
+    return manifest
+
+
+# The gn tools, the rules of a non-default toolchain are prefixed with the
+# toolchain name, e.g. 'clang_x64_cxx'. The longer names come first, so that
+# 'solink' is not matched by 'link'.
+_TOOL_CATEGORIES = [
+    ("copy_bundle_data", "COPY"),
+    ("compile_xcassets", "ACTION"),
+    ("solink_module", "LD"),
+    ("objcxx", "OBJCXX"),
+    ("solink", "LD"),
+    ("alink", "AR"),
+    ("stamp", "STAMP"),
+    ("objc", "OBJC"),
+    ("link", "LD"),
+    ("copy", "COPY"),
+    ("cxx", "CXX"),
+    ("asm", "ASM"),
+    ("cc", "CC"),
+    ("rc", "RC"),
+]
+
+COMPILE_CATEGORIES = {"CC", "CXX", "OBJC", "OBJCXX", "ASM", "RC"}
+LINK_CATEGORIES = {"LD", "AR"}
+
+_SCRIPT_PATTERN = re.compile(r"([^\s/\\\"']+\.py)\b")
+
+
+def classify_edge(edge: NinjaEdge | None, manifest: NinjaManifest) -> str:
+    """Returns the category of the edge, such as 'CC', 'LD', 'AR', or
+    'ACTION <script>' for the gn actions."""
+
+    if edge is None:
+        return "OTHER"
+
+    if edge.rule == "phony":
+        return "PHONY"
+
+    # gn names the rules of actions '__<target>___rule'.
+    if edge.rule.startswith("__") and edge.rule.endswith("_rule"):
+        command = manifest.rules.get(edge.rule, {}).get("command", "")
+        match = _SCRIPT_PATTERN.search(command)
+        if match:
+            return f"ACTION {match.group(1)}"
+        return "ACTION"
+
+    if edge.rule == "gn":
+        return "GN"
+
+    for tool, category in _TOOL_CATEGORIES:
+        if edge.rule == tool or edge.rule.endswith("_" + tool):
+            return category
+
+    return edge.rule.upper()
@@ -4,11 +4,20 @@
 # Licensed under the Apache License, Version 2.0, with certain conditions.
 # Refer to the "LICENSE" file in the root directory for more information.
 #
+import filecmp
+import json
 import os
+import shutil
 import sys
 import subprocess
 import argparse
-from build.scripts import fs_utils, log, cmd_exec
+from build.scripts import fs_utils, log, cmd_exec, npm_store
+
+# The versions of the npm and tsc binaries, cached in the output dir by the
+# paths, the sizes and the mtimes of the binaries, so that starting node to
+# get the version of a binary happens once, not in every install action.
+VERSION_CACHE_FILE = "tgn_npm_versions.json"
+VERSION_CACHE_VERSION = 1
 
 
 class NpmInstall:
@@ -22,18 +31,83 @@ class NpmInstall:
             f"              platform: {self.args.platform}\n"
         )
 
+        # install() changes the current directory to the output dir.
+        self.version_cache_file = os.path.join(
+            os.path.abspath(self.args.output_dir), VERSION_CACHE_FILE
+        )
+        self.version_cache = None
+
+        # The store is shared by all the out dirs, it is off unless a
+        # directory is given.
+        self.store = None
+        store_dir = self.args.npm_store_dir or os.environ.get(
+            "TGN_NPM_STORE_DIR", ""
+        )
+        if store_dir:
+            self.store = npm_store.NpmStore(
+                store_dir, self.args.npm_store_max_size_mb
+            )
+
     def show_extra_log(self, str: str) -> None:
         if self.args.log_level >= 1:
             log.info(str)
 
-    def is_tsc_exist(self) -> bool:
-        cmd = "tsc --version"
-        status, _ = cmd_exec.run_cmd_realtime(
-            cmd, log_level=self.args.log_level
-        )
-        if status == 0:
-            return True
+    def load_version_cache(self) -> dict:
+        if self.version_cache is None:
+            try:
+                with open(self.version_cache_file, "r", encoding="utf-8") as f:
+                    self.version_cache = json.load(f)
+            except (OSError, ValueError):
+                self.version_cache = {}
+
+            if self.version_cache.get("version") != VERSION_CACHE_VERSION:
+                self.version_cache = {
+                    "version": VERSION_CACHE_VERSION,
+                    "binaries": {},
+                }
+        return self.version_cache
+
+    def save_version_cache(self) -> None:
+        os.makedirs(os.path.dirname(self.version_cache_file), exist_ok=True)
+        tmp_file = f"{self.version_cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.version_cache, f, indent=2)
+        os.replace(tmp_file, self.version_cache_file)
+
+    def get_version(self, binary: str) -> str:
+        """Returns the output of '<binary> --version', which is only run if
+        the binary is not in the version cache. Raises OSError or
+        CalledProcessError if it could not be run."""
+
+        path = os.path.realpath(binary)
+        st = os.stat(path)
+        identity = [st.st_size, st.st_mtime_ns]
+
+        binaries = self.load_version_cache()["binaries"]
+        if path in binaries and binaries[path][:2] == identity:
+            return binaries[path][2]
+
+        cmd = [binary, "--version"]
+        if sys.platform == "win32" and binary.lower().endswith(
+            (".cmd", ".bat")
+        ):
+            cmd = ["cmd", "/c"] + cmd
+        version = subprocess.run(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            encoding="utf-8",
+            check=True,
+        ).stdout.strip()
+
+        binaries[path] = identity + [version]
+        try:
+            self.save_version_cache()
+        except OSError:
+            pass
+        return version
 
+    def is_tsc_exist(self) -> bool:
         if sys.platform == "win32":
             tsc = os.path.join("node_modules", ".bin", "tsc.cmd")
         else:
@@ -41,29 +115,119 @@ class NpmInstall:
 
         if os.path.exists(tsc):
             return True
-        else:
+
+        # The global one must be runnable.
+        tsc = shutil.which("tsc")
+        if not tsc:
+            return False
+        try:
+            self.get_version(tsc)
+        except (OSError, subprocess.CalledProcessError):
             return False
+        return True
 
-    def check_npm_version(self) -> None:
-        if sys.platform == "win32":
-            my_cmd = ["cmd", "/c", "npm", "--version"]
-        else:
-            my_cmd = ["npm", "--version"]
-        child = subprocess.Popen(
-            my_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-            encoding="utf-8",
+    def run_npm(self, cmd: str) -> int:
+        # The whole output goes to the log file, only the tail is kept in
+        # memory for reporting a failure.
+        log_file = cmd_exec.LogFileSink("npm_install.log")
+        try:
+            status, tail = cmd_exec.run_cmd_realtime(
+                cmd,
+                log_level=self.args.log_level,
+                sinks=[log_file],
+                capture="tail",
+            )
+        finally:
+            log_file.close()
+
+        if status != 0 and self.args.log_level < 2:
+            log.error(
+                f"'{cmd}' exits with {status}, the last lines of the output"
+                f" ({os.path.abspath('npm_install.log')}):\n{tail}"
+            )
+        return status
+
+    def get_tree_key(self) -> str:
+        with open("package.json", "rb") as f:
+            package_json = f.read()
+        with open("package-lock.json", "rb") as f:
+            package_lock = f.read()
+        return self.store.get_tree_key(package_json, package_lock)
+
+    def install_from_store(self) -> bool:
+        """Materializes node_modules from the npm store, if the same
+        dependencies have been installed by 'npm ci' before. The store must
+        never break the build, 'npm ci' runs if anything goes wrong."""
+
+        tmp_dir = f"node_modules.{os.getpid()}.tmp"
+        try:
+            if not self.store.materialize(self.get_tree_key(), tmp_dir):
+                fs_utils.remove_tree(tmp_dir)
+                return False
+
+            fs_utils.remove_tree("node_modules", background=True)
+            os.rename(tmp_dir, "node_modules")
+        except Exception as exc:
+            self.show_extra_log(f"Failed to install from the npm store: {exc}")
+            fs_utils.remove_tree(tmp_dir)
+            return False
+
+        self.show_extra_log(
+            "npm skip install, node_modules is linked from the npm store"
+            f" {self.store.store_dir}."
         )
-        stdout, stderr = child.communicate()
-        if child.returncode:
-            log.error(f"Stderr:\n{stderr}")
+        return True
+
+    def add_to_store(self) -> None:
+        try:
+            with open("package-lock.json", "r", encoding="utf-8") as f:
+                package_lock = json.load(f)
+            self.store.store_tree(
+                self.get_tree_key(), package_lock, "node_modules"
+            )
+        except Exception as exc:
+            self.show_extra_log(f"Failed to add to the npm store: {exc}")
+
+    def check_npm_version(self) -> None:
+        npm = shutil.which("npm")
+        if not npm:
+            log.error("npm is not found in PATH, please install it")
             exit(-1)
-        if int(stdout.split(".")[0]) < 8:
+        try:
+            version = self.get_version(npm)
+        except subprocess.CalledProcessError as exc:
+            log.error(f"Stderr:\n{exc.stderr}")
+            exit(-1)
+        except OSError as exc:
+            log.error(f"Failed to run {npm}: {exc}")
+            exit(-1)
+        if int(version.split(".")[0]) < 8:
             log.error("Your npm version less than 8, please upgrade")
             exit(-1)
 
+    def npm_ci(self) -> None:
+        # npm ci: fail if lock file not satisfied.
+        self.show_extra_log(
+            "npm install (npm ci), because package-lock.json exists."
+        )
+
+        cmd = "npm ci"
+        if self.args.log_level == 1:
+            cmd += " --loglevel verbose"
+        elif self.args.log_level == 2:
+            cmd += " --loglevel silly"
+
+        status = self.run_npm(cmd)
+        if status != 0:
+            # Never take the partial node_modules as up to date, make it older
+            # than package-lock.json, so that 'npm ci' runs again.
+            if os.path.isdir("node_modules"):
+                os.utime("node_modules", (0, 0))
+            raise RuntimeError(f"'{cmd}' exits with {status}")
+
+        if self.store:
+            self.add_to_store()
+
     def install(self):
         os.chdir(self.args.output_dir)
         for i in range(3):
@@ -72,21 +236,8 @@ class NpmInstall:
                     if not os.path.exists("node_modules") or os.path.getmtime(
                         "package-lock.json"
                     ) > os.path.getmtime("node_modules"):
-                        # npm ci: fail if lock file not satisfied.
-                        self.show_extra_log(
-                            "npm install (npm ci), because package-lock.json"
-                            " exists."
-                        )
-
-                        cmd = "npm ci"
-                        if self.args.log_level == 1:
-                            cmd += " --loglevel verbose"
-                        elif self.args.log_level == 2:
-                            cmd += " --loglevel silly"
-
-                        cmd_exec.run_cmd_realtime(
-                            cmd, log_level=self.args.log_level
-                        )
+                        if self.store is None or not self.install_from_store():
+                            self.npm_ci()
                     else:
                         self.show_extra_log(
                             "npm skip install (npm i), because"
@@ -112,14 +263,16 @@ class NpmInstall:
                     elif self.args.log_level == 2:
                         cmd += " --loglevel silly"
 
-                    cmd_exec.run_cmd_realtime(
-                        cmd, log_level=self.args.log_level
-                    )
+                    self.run_npm(cmd)
             except Exception as exc:
                 self.show_extra_log(f"Failed to npm install: {exc}")
+                error = exc
             else:
                 self.show_extra_log("npm install success.")
                 break
+        else:
+            raise RuntimeError(f"Failed to npm install: {error}")
+
         if not self.is_tsc_exist():
             raise RuntimeError(
                 "tsc not found in current npm package and global node dir,"
@@ -127,15 +280,30 @@ class NpmInstall:
             )
 
     def run(self):
-        fs_utils.copy(
-            self.args.package_json,
-            os.path.join(self.args.output_dir, "package.json"),
-        )
+        file_pairs = [
+            (
+                self.args.package_json,
+                os.path.join(self.args.output_dir, "package.json"),
+            )
+        ]
         if self.args.package_lock_json:
-            fs_utils.copy(
-                self.args.package_lock_json,
-                os.path.join(self.args.output_dir, "package-lock.json"),
+            file_pairs.append(
+                (
+                    self.args.package_lock_json,
+                    os.path.join(self.args.output_dir, "package-lock.json"),
+                )
             )
+
+        # Keep the mtimes of the unchanged files, install() compares the mtime
+        # of package-lock.json with node_modules.
+        fs_utils.copy_files(
+            [
+                (src, dst)
+                for src, dst in file_pairs
+                if not os.path.exists(dst)
+                or not filecmp.cmp(src, dst, shallow=False)
+            ]
+        )
         self.check_npm_version()
         self.install()
 
@@ -148,6 +316,18 @@ if __name__ == "__main__":
     parser.add_argument("--output-dir", type=str, required=True)
     parser.add_argument("--platform", type=str, required=True)
     parser.add_argument("--log-level", type=int, default=0, required=True)
+    parser.add_argument(
+        "--npm-store-dir",
+        type=str,
+        default="",
+        help="Materialize node_modules from this npm store, see npm_store.py."
+        " $TGN_NPM_STORE_DIR is used if not given.",
+    )
+    parser.add_argument(
+        "--npm-store-max-size-mb",
+        type=int,
+        default=npm_store.DEFAULT_MAX_SIZE_MB,
+    )
     args = parser.parse_args()
 
     ni = NpmInstall(args)
@@ -34,6 +34,12 @@ spec.loader.exec_module(glob_tsconfig_files)
 class NpmRunBuild:
     def __init__(self, args) -> None:
         self.args = args
+        # Out of 'out_dir', which is packaged. ninja runs the actions in the
+        # out dir of gn.
+        self.sync_manifest_dir = os.path.join(
+            fs_utils.find_out_root(args.out_dir) or os.getcwd(),
+            fs_utils.SYNC_MANIFEST_DIR_NAME,
+        )
         self.show_extra_log(
             "npm_run_build.py\n"
             f"  project_dir: {args.project_dir}\n"
@@ -63,24 +69,47 @@ class NpmRunBuild:
             self.args.tsconfig_file, tsconfig_info
         )
 
-        if os.path.abspath(tsconfig_dir) != os.path.abspath(self.args.out_dir):
-            # Do not remove '/build', because we have enabled the incremental
-            # build of tsc, so that the files in '/build' might not be
-            # re-generated.
-            #
-            # common_utils.remove_tree(prj_root_dir + "/build")
-            fs_utils.remove_tree(self.args.out_dir + "/src")
+        if os.path.abspath(tsconfig_dir) == os.path.abspath(self.args.out_dir):
+            return
+
+        # The sources are mirrored, only the new and the changed ones are
+        # copied, and only the removed ones are deleted, so that the
+        # unchanged ones keep their mtimes for the incremental build of tsc.
+        # Without the manifest of the previous mirroring, e.g. in an out dir
+        # of an older tgn, start from an empty '/src'. Do not remove '/build',
+        # the files in it might not be re-generated by the incremental build.
+        if not os.path.exists(
+            fs_utils.get_sync_manifest_file(
+                self.sync_manifest_dir, tsconfig_dir, self.args.out_dir
+            )
+        ):
+            fs_utils.remove_tree(self.args.out_dir + "/src", background=True)
 
+        # The sources matched by '**/*' include the directories as well as
+        # their files, so the files are keyed by their destinations.
+        file_pairs: dict[str, str] = {}
         for src in sources:
             dst = os.path.relpath(src, tsconfig_dir)
             dst = os.path.join(self.args.out_dir, dst)  # build/../src/**/*
-            os.makedirs(os.path.dirname(dst), exist_ok=True)
-            fs_utils.copy(src, dst)
-
-        fs_utils.copy(
-            self.args.tsconfig_file,
-            os.path.join(self.args.out_dir, "tsconfig.json"),
+            if os.path.isdir(src) and not os.path.islink(src):
+                dst_dirs, dir_file_pairs = fs_utils.list_tree(src, dst)
+                for dst_dir in dst_dirs:
+                    os.makedirs(dst_dir, exist_ok=True)
+                for src_file, dst_file in dir_file_pairs:
+                    file_pairs[dst_file] = src_file
+            else:
+                file_pairs[dst] = src
+
+        # 'tsconfig.json' is written by dump_new_tsconfig().
+        file_pairs.pop(os.path.join(self.args.out_dir, "tsconfig.json"), None)
+
+        stats = fs_utils.sync_files(
+            [(src, dst) for dst, src in file_pairs.items()],
+            tsconfig_dir,
+            self.args.out_dir,
+            self.sync_manifest_dir,
         )
+        self.show_extra_log(f"Synced sources: {stats}")
 
     # Modify the `outDir` and `references` fields in the `tsconfig.json` file
     # and save the updated configuration to the output directory.
@@ -103,9 +132,18 @@ class NpmRunBuild:
 
         out_tsconfig = self.args.out_dir + "/tsconfig.json"
 
+        # Keep the mtime of an unchanged 'tsconfig.json', like the sources.
+        content = json.dumps(tsconfig_info)
+        try:
+            with open(out_tsconfig, "r", encoding="utf-8") as f:
+                if f.read() == content:
+                    return
+        except OSError:
+            pass
+
         with open(out_tsconfig, "w", encoding="utf-8") as f:
             log.info("Dump {0}".format(out_tsconfig))
-            json.dump(tsconfig_info, f)
+            f.write(content)
 
     # Delete the `tsconfig.json` file from the output directory.
     def remove_new_tsconfig(self, prj_root_dir):
@@ -123,14 +161,21 @@ class NpmRunBuild:
 
         self.show_extra_log(" ".join(cmd))
 
-        cmd_exec.run_cmd_realtime(cmd, log_level=self.args.log_level)
+        status, tail = cmd_exec.run_cmd_realtime(
+            cmd, log_level=self.args.log_level, capture="tail"
+        )
+        if status != 0 and self.args.log_level < 2:
+            log.error(
+                f"'{' '.join(cmd)}' exits with {status}, the last lines of the"
+                f" output:\n{tail}"
+            )
 
     def cleanup(self):
         self.show_extra_log("Compile done, cleanup")
 
         # Delete node_modules/ directory.
         if self.args.remove_node_modules and os.path.exists("node_modules"):
-            fs_utils.remove_tree("node_modules")
+            fs_utils.remove_tree("node_modules", background=True)
 
         # Delete tsconfig.tsbuildinfo file.
         if self.args.remove_tsbuildinfo and os.path.exists(
@@ -140,7 +185,7 @@ class NpmRunBuild:
 
         # Delete src/ directory.
         if self.args.remove_src and os.path.exists("src"):
-            fs_utils.remove_tree("src")
+            fs_utils.remove_tree("src", background=True)
 
     def generate_path_json(self):
         if self.args.library_path:
@@ -0,0 +1,522 @@
+#
+# Copyright © 2025 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+# A local content-addressed store of the npm packages, shared by all the out
+# dirs, so that the same dependencies are downloaded and unpacked only once.
+# npm_install.py uses it when it is given a store directory:
+#
+# 1. Each package installed by 'npm ci' is stored under the hash of its
+#    'integrity' in package-lock.json, without its nested node_modules. The
+#    hash of a package with install scripts also includes the platform and the
+#    node binary, as the scripts might build native code.
+# 2. Each node_modules tree is stored under the hash of package.json,
+#    package-lock.json and the platform. It records the paths of its packages,
+#    and holds the rest of the tree which belongs to no package, e.g.
+#    node_modules/.bin and the bundled dependencies.
+#
+# The files are copied into the store, never linked, as the installed tree
+# might be modified in place later, e.g. by the postinstall scripts. A
+# node_modules tree in the store is materialized by reflinking or hard
+# linking the files from the store, without running npm, so it works offline.
+# The files in the store are read-only, as a hard linked file must not be
+# modified in place. The least recently used entries are evicted beyond the
+# maximum size of the store. A tree one of whose packages is evicted is
+# removed when it is looked up, and stored again by the next install.
+#
+#   npm_store.py stats|clear [--store-dir <dir>]
+#
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import stat
+import sys
+import tempfile
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ),
+)
+
+from build.scripts import fs_utils  # noqa: E402
+
+try:
+    import fcntl
+
+    has_fcntl = True
+except ImportError:
+    has_fcntl = False
+
+
+STORE_VERSION = "2"
+DEFAULT_MAX_SIZE_MB = 10240
+
+NODE_MODULES = "node_modules"
+
+
+class ArgumentInfo(argparse.Namespace):
+    def __init__(self):
+        super().__init__()
+
+        self.action: str
+        self.store_dir: str
+        self.max_size_mb: int
+
+
+def get_default_store_dir() -> str:
+    store_dir = os.environ.get("TGN_NPM_STORE_DIR", "")
+    if store_dir:
+        return store_dir
+    return os.path.join(os.path.expanduser("~"), ".cache", "tgn", "npm")
+
+
+def get_node_identity() -> str:
+    path = shutil.which("node")
+    if not path:
+        return ""
+
+    path = os.path.realpath(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return ""
+    return f"{path}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def _hash(*parts: str | bytes) -> str:
+    hasher = hashlib.sha256()
+    for part in (STORE_VERSION,) + parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        hasher.update(part)
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+def get_locked_packages(package_lock: dict) -> dict[str, dict]:
+    """Returns the packages of package-lock.json which could be stored, by
+    their paths relative to node_modules. The lock files of npm 6 and older
+    list no packages."""
+
+    prefix = NODE_MODULES + "/"
+    packages = {}
+    for path, info in package_lock.get("packages", {}).items():
+        # The root package, the workspaces and the links are not stored.
+        if (
+            not path.startswith(prefix)
+            or info.get("link")
+            or not info.get("integrity")
+        ):
+            continue
+        packages[path[len(prefix) :]] = info  # noqa
+    return packages
+
+
+def _list_package(
+    src_dir: str, dst_dir: str
+) -> tuple[list[str], list[tuple[str, str]]]:
+    """Same as fs_utils.list_tree(), but leaves out the nested node_modules
+    of the package."""
+
+    dst_dirs = [dst_dir]
+    file_pairs = []
+    with os.scandir(src_dir) as it:
+        for entry in it:
+            if entry.name == NODE_MODULES:
+                continue
+            dst_item_path = os.path.join(dst_dir, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                sub_dirs, sub_pairs = fs_utils.list_tree(
+                    entry.path, dst_item_path
+                )
+                dst_dirs += sub_dirs
+                file_pairs += sub_pairs
+            else:
+                file_pairs.append((entry.path, dst_item_path))
+    return dst_dirs, file_pairs
+
+
+def _list_rest(
+    node_modules: str, package_paths: set[str], dst_dir: str
+) -> tuple[list[str], list[tuple[str, str]]]:
+    """Lists the entries of 'node_modules' which belong to none of the
+    packages in 'package_paths'."""
+
+    dst_dirs = [dst_dir]
+    file_pairs = []
+
+    pending = [""]
+    while pending:
+        rel_dir = pending.pop()
+        in_package = rel_dir in package_paths
+        with os.scandir(os.path.join(node_modules, rel_dir)) as it:
+            for entry in it:
+                # Only the nested node_modules of a package is not its own.
+                if in_package and entry.name != NODE_MODULES:
+                    continue
+
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if rel_path not in package_paths:
+                        dst_dirs.append(os.path.join(dst_dir, rel_path))
+                    pending.append(rel_path)
+                else:
+                    file_pairs.append(
+                        (entry.path, os.path.join(dst_dir, rel_path))
+                    )
+
+    return dst_dirs, file_pairs
+
+
+def _scandir(path: str) -> list[os.DirEntry]:
+    try:
+        return [e for e in os.scandir(path) if e.is_dir()]
+    except OSError:
+        return []
+
+
+def _tree_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def _make_read_only(path: str) -> None:
+    st = os.lstat(path)
+    if stat.S_ISREG(st.st_mode):
+        os.chmod(path, stat.S_IMODE(st.st_mode) & ~0o222)
+
+
+class NpmStore:
+    def __init__(self, store_dir: str, max_size_mb: int) -> None:
+        self.store_dir = os.path.abspath(store_dir)
+        self.max_size = max_size_mb * 1024 * 1024
+        self.stats_file = os.path.join(self.store_dir, "stats.json")
+        self.lock_file = os.path.join(self.store_dir, "lock")
+        self.platform_identity = "\0".join(
+            [sys.platform, platform.machine(), get_node_identity()]
+        )
+
+    # ---------------------------------------------------------------------
+    # Locking and statistics.
+    # ---------------------------------------------------------------------
+
+    def _with_lock(self, fn, shared: bool = False):
+        """The materializations hold the lock shared, so that the entries
+        they use are not evicted meanwhile."""
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        with open(self.lock_file, "a", encoding="utf-8") as lock:
+            if has_fcntl:
+                fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                return fn()
+            finally:
+                if has_fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def read_stats(self) -> dict:
+        stats = {"hits": 0, "misses": 0, "size": 0, "evictions": 0}
+        try:
+            with open(self.stats_file, "r", encoding="utf-8") as f:
+                stats.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        return stats
+
+    def _write_stats(self, stats: dict) -> None:
+        fd, tmp_file = tempfile.mkstemp(prefix=".tmp-", dir=self.store_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(stats, f, indent=2)
+        os.replace(tmp_file, self.stats_file)
+
+    def update_stats(self, **deltas: int) -> dict:
+        def update():
+            stats = self.read_stats()
+            for key, delta in deltas.items():
+                stats[key] = stats.get(key, 0) + delta
+            self._write_stats(stats)
+            return stats
+
+        return self._with_lock(update)
+
+    # ---------------------------------------------------------------------
+    # Storage.
+    # ---------------------------------------------------------------------
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.store_dir, kind, key[:2], key[2:])
+
+    def get_tree_key(self, package_json: bytes, package_lock: bytes) -> str:
+        return _hash(package_json, package_lock, self.platform_identity)
+
+    def get_package_key(self, info: dict) -> str:
+        if info.get("hasInstallScript"):
+            return _hash(info["integrity"], self.platform_identity)
+        return _hash(info["integrity"])
+
+    def _load_tree_manifest(self, tree_dir: str) -> dict | None:
+        try:
+            with open(
+                os.path.join(tree_dir, "manifest.json"), "r", encoding="utf-8"
+            ) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _remove_incomplete_tree(self, tree_dir: str) -> None:
+        """Removes the tree if any of its packages is not in the store, it
+        could never be materialized then."""
+
+        def remove() -> None:
+            manifest = self._load_tree_manifest(tree_dir)
+            if manifest is None or all(
+                os.path.isdir(self._path("packages", key))
+                for key in manifest["packages"].values()
+            ):
+                return
+
+            size = _tree_size(tree_dir)
+            fs_utils.remove_tree(tree_dir)
+            stats = self.read_stats()
+            stats["size"] = max(0, stats["size"] - size)
+            self._write_stats(stats)
+
+        self._with_lock(remove)
+
+    def materialize(self, tree_key: str, node_modules: str) -> bool:
+        """Creates 'node_modules' from the tree in the store. Returns False if
+        the tree or any of its packages is not in the store."""
+
+        tree_dir = self._path("trees", tree_key)
+        incomplete = False
+
+        def materialize() -> bool:
+            nonlocal incomplete
+
+            manifest = self._load_tree_manifest(tree_dir)
+            if manifest is None:
+                return False
+
+            dst_dirs, file_pairs = fs_utils.list_tree(
+                os.path.join(tree_dir, "rest"), node_modules
+            )
+            used_dirs = [tree_dir]
+            for path, key in manifest["packages"].items():
+                package_dir = self._path("packages", key)
+                if not os.path.isdir(package_dir):
+                    incomplete = True
+                    return False
+
+                sub_dirs, sub_pairs = fs_utils.list_tree(
+                    package_dir, os.path.join(node_modules, path)
+                )
+                dst_dirs += sub_dirs
+                file_pairs += sub_pairs
+                used_dirs.append(package_dir)
+
+            for dst_dir in dst_dirs:
+                os.makedirs(dst_dir, exist_ok=True)
+            fs_utils.copy_files(file_pairs, link_mode="auto")
+
+            # The mtime of an entry is the LRU clock.
+            for used_dir in used_dirs:
+                os.utime(used_dir)
+            return True
+
+        found = self._with_lock(materialize, shared=True)
+        if incomplete:
+            # So that the tree is stored again after the install.
+            self._remove_incomplete_tree(tree_dir)
+        self.update_stats(**{"hits" if found else "misses": 1})
+        return found
+
+    def store_tree(
+        self, tree_key: str, package_lock: dict, node_modules: str
+    ) -> None:
+        """Stores the tree of 'node_modules' installed from 'package_lock',
+        and the packages of it which are not in the store yet."""
+
+        tree_dir = self._path("trees", tree_key)
+        if os.path.isdir(tree_dir):
+            return
+
+        packages = {
+            path: self.get_package_key(info)
+            for path, info in get_locked_packages(package_lock).items()
+            if os.path.isdir(os.path.join(node_modules, path))
+        }
+
+        # Each new entry is copied into a temporary directory next to it,
+        # then renamed into place.
+        new_entries = []
+        dst_dirs = []
+        file_pairs = []
+
+        def add_entry(kind: str, key: str, list_entry) -> None:
+            entry_dir = self._path(kind, key)
+            os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+            tmp_dir = tempfile.mkdtemp(
+                prefix=".tmp-", dir=os.path.dirname(entry_dir)
+            )
+            new_entries.append((tmp_dir, entry_dir))
+
+            sub_dirs, sub_pairs = list_entry(tmp_dir)
+            dst_dirs.extend(sub_dirs)
+            file_pairs.extend(sub_pairs)
+
+        try:
+            # The same package could be installed at several paths.
+            new_keys = set()
+            for path, key in packages.items():
+                if key in new_keys or os.path.isdir(
+                    self._path("packages", key)
+                ):
+                    continue
+                new_keys.add(key)
+                add_entry(
+                    "packages",
+                    key,
+                    lambda tmp_dir, path=path: _list_package(
+                        os.path.join(node_modules, path), tmp_dir
+                    ),
+                )
+
+            add_entry(
+                "trees",
+                tree_key,
+                lambda tmp_dir: _list_rest(
+                    node_modules,
+                    set(packages),
+                    os.path.join(tmp_dir, "rest"),
+                ),
+            )
+            with open(
+                os.path.join(new_entries[-1][0], "manifest.json"),
+                "w",
+                encoding="utf-8",
+            ) as f:
+                json.dump({"packages": packages}, f, indent=2)
+
+            for dst_dir in dst_dirs:
+                os.makedirs(dst_dir, exist_ok=True)
+            # Never link the store to 'node_modules', the read-only mode would
+            # be shared with it, and so would be its modifications. The copy
+            # is still done by reflinking on a copy-on-write file system.
+            fs_utils.copy_files(file_pairs, link_mode="copy")
+            for _, dst_file in file_pairs:
+                _make_read_only(dst_file)
+
+            # The tree is renamed last, after all of its packages.
+            size = 0
+            for tmp_dir, entry_dir in new_entries:
+                entry_size = _tree_size(tmp_dir)
+                try:
+                    os.rename(tmp_dir, entry_dir)
+                except OSError:
+                    # Another install stored the same entry concurrently.
+                    continue
+                size += entry_size
+        finally:
+            for tmp_dir, _ in new_entries:
+                if os.path.isdir(tmp_dir):
+                    fs_utils.remove_tree(tmp_dir)
+
+        stats = self.update_stats(size=size)
+        if stats["size"] > self.max_size:
+            self._with_lock(self.evict)
+
+    def evict(self) -> None:
+        """Removes the least recently used packages and trees until the store
+        is below 90% of its maximum size. A tree whose packages are evicted is
+        not materialized any more, it is removed when it is looked up."""
+
+        entries = []
+        for kind in ["packages", "trees"]:
+            for bucket in _scandir(os.path.join(self.store_dir, kind)):
+                for entry in _scandir(bucket.path):
+                    if entry.name.startswith(".tmp-"):
+                        continue
+                    try:
+                        mtime = entry.stat().st_mtime
+                    except OSError:
+                        continue
+                    entries.append(
+                        (mtime, entry.path, _tree_size(entry.path))
+                    )
+
+        total = sum(size for _, _, size in entries)
+        evictions = 0
+        target = self.max_size * 9 // 10
+        for _, path, size in sorted(entries):
+            if total <= target:
+                break
+            fs_utils.remove_tree(path)
+            total -= size
+            evictions += 1
+
+        stats = self.read_stats()
+        stats["size"] = total
+        stats["evictions"] = stats.get("evictions", 0) + evictions
+        self._write_stats(stats)
+
+    def clear(self) -> None:
+        def clear():
+            for kind in ["packages", "trees"]:
+                fs_utils.remove_tree(os.path.join(self.store_dir, kind))
+            self._write_stats(dict(self.read_stats(), size=0, evictions=0))
+
+        self._with_lock(clear)
+
+
+def format_stats(store: NpmStore) -> str:
+    stats = store.read_stats()
+    lookups = stats["hits"] + stats["misses"]
+    hit_rate = stats["hits"] * 100.0 / lookups if lookups else 0.0
+
+    return "\n".join(
+        [
+            f"npm store: {store.store_dir}",
+            f"  hits:      {stats['hits']}",
+            f"  misses:    {stats['misses']}",
+            f"  hit rate:  {hit_rate:.1f}%",
+            f"  evictions: {stats['evictions']}",
+            f"  size:      {stats['size'] / 1024 / 1024:.1f} MB"
+            f" / {store.max_size / 1024 / 1024:.0f} MB",
+        ]
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Show or clear the npm package store."
+    )
+    parser.add_argument("action", choices=["stats", "clear"])
+    parser.add_argument("--store-dir", type=str, default="")
+    parser.add_argument(
+        "--max-size-mb", type=int, default=DEFAULT_MAX_SIZE_MB
+    )
+
+    arg_info = ArgumentInfo()
+    args = parser.parse_args(namespace=arg_info)
+
+    store = NpmStore(
+        args.store_dir or get_default_store_dir(), args.max_size_mb
+    )
+    if args.action == "stats":
+        print(format_stats(store))
+    else:
+        store.clear()
+        print(f"npm store {store.store_dir} is cleared.")
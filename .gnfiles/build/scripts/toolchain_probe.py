@@ -0,0 +1,171 @@
+#
+# Copyright © 2025 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+# Gathers the facts of the host which the gn files need, in one process, and
+# writes them to 'tgn_toolchain_probe.json' in the out dir. tgn runs the probe
+# before 'gn gen', and the gn files read the file through
+# toolchain/toolchain_probe.gni instead of running a script for each fact.
+#
+# The facts of the compilers, which need to run the compilers, are cached in
+# the file and only probed again when the compiler binaries change. The CPU
+# count and the link pool depth are computed every time, the depth is kept
+# stable across the small changes of the available memory.
+#
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+# gn runs the script from the out dir, without PYTHONPATH if gn is not started
+# by tgn.
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ),
+)
+
+from build.scripts import (  # noqa: E402
+    get_cpu_count,
+    get_gcc_version,
+    get_ninja_path,
+    link_memory,
+)
+
+
+PROBE_FILE = "tgn_toolchain_probe.json"
+PROBE_VERSION = 2
+
+# The compilers whose binaries key the cached facts.
+COMPILERS = ["gcc", "g++", "clang", "clang++"]
+
+# The facts returned by probe_compilers().
+COMPILER_FACTS = [
+    "gcc_version",
+    "libstdcxx_static_x64",
+    "libstdcxx_static_arm64",
+]
+
+
+class ArgumentInfo(argparse.Namespace):
+    def __init__(self):
+        super().__init__()
+
+        self.out_dir: str
+
+
+def get_binary_identity(name: str) -> str:
+    """Returns '<name>=<path>:<size>:<mtime>' of the binary found in PATH, or
+    '<name>=' if there is none."""
+
+    path = shutil.which(name)
+    if not path:
+        return f"{name}="
+
+    path = os.path.realpath(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return f"{name}="
+    return f"{name}={path}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def probe_compilers() -> dict:
+    """Probes the facts which need to run the compilers. The facts are ""
+    if gcc is not found or its version is unknown, the gn files using them
+    assert on that."""
+
+    gcc_version = ""
+    if shutil.which("gcc"):
+        try:
+            output = subprocess.check_output(
+                ["gcc", "--version"], stderr=subprocess.DEVNULL
+            )
+            gcc_version = get_gcc_version.parse_major_version(output)
+        except (OSError, subprocess.CalledProcessError, IndexError):
+            pass
+
+    if not gcc_version.isdigit():
+        return {key: "" for key in COMPILER_FACTS}
+
+    return {
+        "gcc_version": gcc_version,
+        "libstdcxx_static_x64": (
+            f"/usr/lib/gcc/x86_64-linux-gnu/{gcc_version}/libstdc++.a"
+        ),
+        "libstdcxx_static_arm64": (
+            f"/usr/lib/gcc/aarch64-linux-gnu/{gcc_version}/libstdc++.a"
+        ),
+    }
+
+
+def load_probe(out_dir: str) -> dict:
+    try:
+        probe_file = os.path.join(out_dir, PROBE_FILE)
+        with open(probe_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def probe(out_dir: str) -> dict:
+    """Gathers the facts, and writes them to the out dir if any of them has
+    changed. Returns the facts."""
+
+    previous = load_probe(out_dir)
+
+    compilers = [get_binary_identity(name) for name in COMPILERS]
+    if (
+        previous.get("version") == PROBE_VERSION
+        and previous.get("compilers") == compilers
+        and all(key in previous for key in COMPILER_FACTS)
+    ):
+        compiler_facts = {key: previous[key] for key in COMPILER_FACTS}
+    else:
+        compiler_facts = probe_compilers()
+
+    cpu_count = get_cpu_count.get_cpu_count()
+
+    previous_depth = 0
+    if previous.get("cpu_count") == cpu_count:
+        previous_depth = previous.get("link_pool_depth", 0)
+    link_pool_depth = link_memory.get_link_pool_depth(
+        out_dir, cpu_count, previous_depth
+    )
+
+    facts = {
+        "version": PROBE_VERSION,
+        "compilers": compilers,
+        **compiler_facts,
+        "ninja_path": get_ninja_path.get_ninja_path(),
+        "cpu_count": cpu_count,
+        "link_pool_depth": link_pool_depth,
+    }
+
+    # Only touch the file when the facts change, gn lists it as an input of
+    # 'build.ninja'.
+    if facts != previous:
+        os.makedirs(out_dir, exist_ok=True)
+        tmp_file = os.path.join(out_dir, f"{PROBE_FILE}.{os.getpid()}.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(facts, f, indent=2)
+        os.replace(tmp_file, os.path.join(out_dir, PROBE_FILE))
+
+    return facts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Gather the facts of the host toolchain."
+    )
+    parser.add_argument("--out-dir", type=str, required=True)
+
+    arg_info = ArgumentInfo()
+    args = parser.parse_args(namespace=arg_info)
+
+    print(json.dumps(probe(args.out_dir), indent=2))
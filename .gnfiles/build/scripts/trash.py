@@ -0,0 +1,239 @@
+#
+# Copyright © 2025 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+# The background removal of the directory trees, see
+# fs_utils.remove_tree(background=True).
+#
+# A tree is renamed into the trash directory of the out dir of gn containing
+# it, or next to it if it is in none, which is on the same file system, and
+# this script is started detached to remove it:
+#
+#   trash.py purge <trash dir>
+#
+# The trash directories are registered in TRASH_REGISTRY_FILE, tgn runs
+# collect_trash() on start, so that the trash left by an interrupted removal is
+# removed eventually.
+#
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+try:
+    import fcntl
+
+    has_fcntl = True
+except ImportError:
+    has_fcntl = False
+
+
+TRASH_DIR_NAME = ".tgn_trash"
+TRASH_REGISTRY_FILE = os.path.join(
+    os.path.expanduser("~"), ".cache", "tgn", "trash_dirs.json"
+)
+
+# Held by the process purging a trash directory.
+PURGE_LOCK_FILE = ".purge.lock"
+
+
+class ArgumentInfo(argparse.Namespace):
+    def __init__(self):
+        super().__init__()
+
+        self.action: str
+        self.trash_dir: str
+
+
+def _update_registry(update) -> None:
+    """Applies 'update' to the list of the trash directories, the concurrent
+    updates are serialized by a lock file."""
+
+    os.makedirs(os.path.dirname(TRASH_REGISTRY_FILE), exist_ok=True)
+    with open(TRASH_REGISTRY_FILE + ".lock", "a", encoding="utf-8") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            try:
+                with open(TRASH_REGISTRY_FILE, "r", encoding="utf-8") as f:
+                    trash_dirs = json.load(f)
+            except (OSError, ValueError):
+                trash_dirs = []
+
+            new_trash_dirs = update(list(trash_dirs))
+            if new_trash_dirs != trash_dirs:
+                tmp_file = f"{TRASH_REGISTRY_FILE}.{os.getpid()}.tmp"
+                with open(tmp_file, "w", encoding="utf-8") as f:
+                    json.dump(new_trash_dirs, f, indent=2)
+                os.replace(tmp_file, TRASH_REGISTRY_FILE)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _start_purging(trash_dir: str) -> None:
+    try:
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "purge", trash_dir],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+            close_fds=True,
+        )
+    except OSError:
+        pass
+
+
+def get_trash_dir(path: str) -> str:
+    """The trash directory of 'path'. The one of the out dir is outside of
+    the package directories, which the later actions might copy or package
+    while the trash is removed."""
+
+    from build.scripts import fs_utils
+
+    parent = os.path.dirname(path)
+    trash_root = fs_utils.find_out_root(parent) or parent
+    return os.path.join(trash_root, TRASH_DIR_NAME)
+
+
+def move_to_trash(path: str) -> bool:
+    """Moves 'path' into its trash directory, and starts removing it in the
+    background. Returns False if it could not be moved, the caller should
+    remove it by itself then."""
+
+    if not has_fcntl:
+        return False
+
+    path = os.path.abspath(path)
+    trash_dir = get_trash_dir(path)
+    trash_path = os.path.join(
+        trash_dir,
+        f"{os.path.basename(path)}.{os.getpid()}.{os.urandom(4).hex()}",
+    )
+
+    try:
+        os.makedirs(trash_dir, exist_ok=True)
+        os.rename(path, trash_path)
+    except OSError:
+        return False
+
+    try:
+        _update_registry(
+            lambda trash_dirs: (
+                trash_dirs
+                if trash_dir in trash_dirs
+                else trash_dirs + [trash_dir]
+            )
+        )
+    except OSError:
+        pass
+
+    _start_purging(trash_dir)
+    return True
+
+
+def purge_trash_dir(trash_dir: str) -> None:
+    """Removes everything in 'trash_dir', then the directory itself. Only one
+    process purges a trash directory at a time."""
+
+    from concurrent.futures import ThreadPoolExecutor
+    from build.scripts import fs_utils
+
+    def remove(path: str) -> None:
+        try:
+            fs_utils.remove_path(path)
+        except OSError:
+            pass
+
+    try:
+        lock = open(
+            os.path.join(trash_dir, PURGE_LOCK_FILE), "a", encoding="utf-8"
+        )
+    except OSError:
+        return
+
+    try:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return
+
+        # Keep going until no more trash is moved in.
+        while True:
+            trees = [
+                entry.path
+                for entry in os.scandir(trash_dir)
+                if entry.name != PURGE_LOCK_FILE
+            ]
+            if not trees:
+                break
+
+            # Remove the sub trees of all the trees in parallel, then the
+            # trees, which are empty by then.
+            sub_trees = []
+            for tree in trees:
+                if os.path.isdir(tree) and not os.path.islink(tree):
+                    sub_trees += [entry.path for entry in os.scandir(tree)]
+
+            with ThreadPoolExecutor(
+                max_workers=fs_utils.get_copy_jobs()
+            ) as executor:
+                for _ in executor.map(remove, sub_trees):
+                    pass
+            for tree in trees:
+                remove(tree)
+
+        # Another process might be moving a tree in, leave the directory to
+        # it then.
+        os.remove(os.path.join(trash_dir, PURGE_LOCK_FILE))
+        os.rmdir(trash_dir)
+    except OSError:
+        pass
+    finally:
+        lock.close()
+
+
+def collect_trash() -> None:
+    """Starts purging the trash directories which still exist, the previous
+    removals in them were interrupted, and forgets the others."""
+
+    if not has_fcntl or not os.path.exists(TRASH_REGISTRY_FILE):
+        return
+
+    trash_dirs_to_purge = []
+
+    def update(trash_dirs: list[str]) -> list[str]:
+        trash_dirs_to_purge.extend(d for d in trash_dirs if os.path.isdir(d))
+        return trash_dirs_to_purge
+
+    try:
+        _update_registry(update)
+    except OSError:
+        return
+
+    for trash_dir in trash_dirs_to_purge:
+        _start_purging(trash_dir)
+
+
+if __name__ == "__main__":
+    # gn does not run this script, it is started by tgn or by the scripts
+    # which already have the .gnfiles directory in sys.path, but be safe.
+    sys.path.insert(
+        0,
+        os.path.dirname(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ),
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Remove the trees in a trash directory."
+    )
+    parser.add_argument("action", choices=["purge"])
+    parser.add_argument("trash_dir", type=str)
+
+    arg_info = ArgumentInfo()
+    args = parser.parse_args(namespace=arg_info)
+
+    purge_trash_dir(args.trash_dir)
@@ -0,0 +1,93 @@
+#
+# Copyright © 2025 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+GNFILES_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+
+@unittest.skipUnless(
+    shutil.which("ar") and shutil.which("cc") and shutil.which("nm"),
+    "ar, cc and nm are needed",
+)
+class IncrementalCombineTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def path(self, *parts):
+        return os.path.join(self.tmp_dir, *parts)
+
+    def compile(self, obj, symbol):
+        src = obj[: -len(".o")] + ".c"
+        os.makedirs(os.path.dirname(src), exist_ok=True)
+        with open(src, "w", encoding="utf-8") as f:
+            f.write("int {}(void) {{ return 0; }}\n".format(symbol))
+        subprocess.run(["cc", "-c", src, "-o", obj], check=True)
+
+    def combine(self, output, inputs):
+        rspfile = output + ".rsp"
+        with open(rspfile, "w", encoding="utf-8") as f:
+            f.write("\n".join(inputs))
+        env = dict(os.environ, PYTHONPATH=GNFILES_DIR)
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "build.scripts.combine",
+                "--incremental",
+                "ar",
+                output,
+                "@" + rspfile,
+            ],
+            check=True,
+            env=env,
+            cwd=self.tmp_dir,
+        )
+
+    def symbols(self, archive):
+        output = subprocess.run(
+            ["nm", archive], check=True, capture_output=True, text=True
+        ).stdout
+        return {
+            line.split()[-1] for line in output.splitlines() if " T " in line
+        }
+
+    def test_object_named_like_a_nested_member(self):
+        # The nested archive has a member named like one of the objects, the
+        # object must not replace it when it changes.
+        nested = self.path("libz.a")
+        self.compile(self.path("b", "u.o"), "ub")
+        subprocess.run(["ar", "rcs", nested, self.path("b", "u.o")], check=True)
+
+        obj_u = self.path("a", "u.o")
+        obj_v = self.path("v.o")
+        self.compile(obj_u, "ua")
+        self.compile(obj_v, "v")
+
+        output = self.path("out.a")
+        self.combine(output, [obj_u, obj_v, nested])
+        self.assertEqual(self.symbols(output), {"ua", "ub", "v"})
+
+        # The mtime has to change even on a coarse-grained filesystem.
+        time.sleep(0.01)
+        self.compile(obj_u, "ua2")
+        self.combine(output, [obj_u, obj_v, nested])
+        self.assertEqual(self.symbols(output), {"ua2", "ub", "v"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,17 +1,33 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import filecmp
+import hashlib
 import json
 import os
+import re
 import sys
 import subprocess
 import shutil
 import platform
 import argparse
+import threading
+import time
 
 
 VERSION = "0.1.0"
 
+# The file in the out dir which records the inputs of the last successful
+# 'gn gen', so that an unchanged configuration does not need to be generated
+# again.
+GEN_FINGERPRINT_FILE = "tgn_gen_fingerprint.json"
+GEN_FINGERPRINT_VERSION = 1
+
+# The file in the out dir which caches the output of 'gn ls', so that a target
+# specified in the command line can be resolved without running gn.
+LABEL_INDEX_FILE = "tgn_labels.json"
+LABEL_INDEX_VERSION = 1
+
 # The script determines the directory of the script itself and constructs paths
 # for .gnfiles/, bin/, and specific executables (gn and ninja) based on the
 # operating system.
@@ -28,6 +44,17 @@ class MainArgumentInfo(argparse.Namespace):
         self.build_type: str
         self.out_dir: str
         self.out_file: str
+        self.force_gen: bool
+        self.jobs: int | None
+        self.out_dir_per_build_type: bool
+        self.matrix_phase: str | None
+        self.base_out_dir: str
+        self.matrix: list[tuple[str, str, str]]
+        self.stats: bool
+        self.graph_depth: int | None
+        self.graph_prefix: str
+        self.graph_collapse: bool
+        self.graph_format: str
 
 
 class AllArgumentInfo(MainArgumentInfo):
@@ -259,11 +286,34 @@ def validate_build_command(build_command: str) -> None:
         "refs",
         "check",
         "args",
+        "stats",
+        "critical_path",
+        "compile_cache",
     ]:
         print(f"\n Invalid command '{build_command}'\n")
         exit(-1)
 
 
+def split_matrix_values(
+    values: str, valid_values: list[str], name: str
+) -> list[str]:
+    """Splits a comma separated list of values given in the command line, such
+    as 'x64,arm64', and validates each of them."""
+
+    result = []
+    for value in values.split(","):
+        value = value.strip()
+        if value not in valid_values:
+            print(
+                f"\n Invalid {name} '{value}', possible values are:"
+                f" {', '.join(valid_values)}\n"
+            )
+            exit(-1)
+        if value not in result:
+            result.append(value)
+    return result
+
+
 def validate_cpu(target_cpu: str, target_os: str) -> None:
     """Validates that the target CPU is valid for the target OS."""
 
@@ -323,6 +373,84 @@ def parse_main_args(
         required=False,
         default="out",
     )
+    main_args_parser.add_argument(
+        "--force-gen",
+        dest="force_gen",
+        help="always run 'gn gen', even if the out dir is up to date",
+        action="store_true",
+        default=False,
+    )
+    main_args_parser.add_argument(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        help=(
+            "number of ninja jobs to run in parallel, in the matrix mode it is"
+            "\nshared by all configurations"
+        ),
+        type=int,
+        required=False,
+        default=None,
+    )
+    main_args_parser.add_argument(
+        "--out-dir-per-build-type",
+        dest="out_dir_per_build_type",
+        help=(
+            "use 'out/<os>/<cpu>_<build-type>' as the out dir, this is the"
+            "\ndefault in the matrix mode if several build types are given"
+        ),
+        action="store_true",
+        default=False,
+    )
+    main_args_parser.add_argument(
+        "--stats",
+        dest="stats",
+        help="show the build time report after 'build' or 'rebuild'",
+        action="store_true",
+        default=False,
+    )
+    main_args_parser.add_argument(
+        "--graph-depth",
+        dest="graph_depth",
+        help="'graph': only export the dependencies within this depth",
+        type=int,
+        required=False,
+        default=None,
+    )
+    main_args_parser.add_argument(
+        "--graph-prefix",
+        dest="graph_prefix",
+        help="'graph': only export the targets under this directory",
+        type=str,
+        required=False,
+        default="",
+    )
+    main_args_parser.add_argument(
+        "--graph-collapse",
+        dest="graph_collapse",
+        help="'graph': collapse the internal targets of each ten_package",
+        action="store_true",
+        default=False,
+    )
+    main_args_parser.add_argument(
+        "--graph-format",
+        dest="graph_format",
+        help=(
+            "'graph': comma separated output formats, possible values are:\n"
+            "json   dot   html   svg (needs graphviz), default is 'json,dot'"
+        ),
+        type=str,
+        required=False,
+        default="json,dot",
+    )
+    main_args_parser.add_argument(
+        "--matrix-phase",
+        dest="matrix_phase",
+        help=argparse.SUPPRESS,
+        type=str,
+        choices={"gen", "run"},
+        default=None,
+    )
     main_args_parser.add_argument(
         "command",
         metavar="command",
@@ -330,7 +458,8 @@ def parse_main_args(
             "possible commands are:\n"
             "gen         build        rebuild            refs    clean\n"
             "graph       uninstall    explain_build      desc    check\n"
-            "show_deps   show_input   show_input_output  path    args"
+            "show_deps   show_input   show_input_output  path    args\n"
+            "stats       critical_path  compile_cache"
         ),
         type=str,
         action=CommandAction,
@@ -338,39 +467,96 @@ def parse_main_args(
     main_args_parser.add_argument(
         "target_os",
         metavar="target-OS",
-        help="possible OS values are:\nwin   mac   linux",
+        help=(
+            "possible OS values are:\nwin   mac   linux\n"
+            "several values could be separated by ',' in the matrix mode"
+        ),
         type=str,
-        choices={"win", "mac", "linux"},
     )
     main_args_parser.add_argument(
         "target_cpu",
         metavar="target-CPU",
-        help="possible values are:\nx86   x64   arm   arm64",
+        help=(
+            "possible values are:\nx86   x64   arm   arm64\n"
+            "several values could be separated by ',' in the matrix mode"
+        ),
         type=str,
-        choices={"x86", "x64", "arm", "arm64"},
     )
     main_args_parser.add_argument(
         "build_type",
         metavar="build-type",
-        help="possible values are:\ndebug   release",
+        help=(
+            "possible values are:\ndebug   release\n"
+            "several values could be separated by ',' in the matrix mode"
+        ),
         type=str,
-        choices={"debug", "release"},
     )
 
     arg_info = MainArgumentInfo()
     main_args = main_args_parser.parse_args(main_args_list, namespace=arg_info)
 
-    validate_cpu(main_args.target_cpu, main_args.target_os)
-
-    # Append OS and CPU into out_dir.
-    main_args.out_dir = os.path.join(
-        main_args.out_dir, (main_args.target_os + "/" + main_args.target_cpu)
+    target_oses = split_matrix_values(
+        main_args.target_os, ["win", "mac", "linux"], "OS"
+    )
+    target_cpus = split_matrix_values(
+        main_args.target_cpu, ["x86", "x64", "arm", "arm64"], "CPU"
     )
-    main_args.out_dir = os.path.abspath(main_args.out_dir)
+    build_types = split_matrix_values(
+        main_args.build_type, ["debug", "release"], "build type"
+    )
+
+    main_args.matrix = [
+        (target_os, target_cpu, build_type)
+        for target_os in target_oses
+        for target_cpu in target_cpus
+        for build_type in build_types
+    ]
+
+    for target_os, target_cpu, _ in main_args.matrix:
+        validate_cpu(target_cpu, target_os)
+
+    # Debug and release builds of the same OS and CPU can not share one out
+    # dir, if they are built at the same time.
+    if len(build_types) > 1:
+        main_args.out_dir_per_build_type = True
+
+    main_args.base_out_dir = os.path.abspath(main_args.out_dir)
+
+    if len(main_args.matrix) == 1:
+        (
+            main_args.target_os,
+            main_args.target_cpu,
+            main_args.build_type,
+        ) = main_args.matrix[0]
+
+        main_args.out_dir = get_out_dir(
+            main_args.base_out_dir,
+            main_args.target_os,
+            main_args.target_cpu,
+            main_args.build_type,
+            main_args.out_dir_per_build_type,
+        )
 
     all_args = merge(all_args, main_args)
 
 
+def get_out_dir(
+    base_out_dir: str,
+    target_os: str,
+    target_cpu: str,
+    build_type: str,
+    per_build_type: bool,
+) -> str:
+    # Append OS and CPU into out_dir.
+    cpu_dir = target_cpu
+    if per_build_type:
+        cpu_dir += "_" + build_type
+
+    return os.path.abspath(
+        os.path.join(base_out_dir, target_os + "/" + cpu_dir)
+    )
+
+
 def create_out_dir(all_args: AllArgumentInfo) -> None:
     if not os.path.exists(all_args.out_dir):
         os.makedirs(all_args.out_dir)
@@ -396,32 +582,47 @@ def get_generator(main_args: AllArgumentInfo) -> str:
     return generator
 
 
-def write_gn_args(
+def render_gn_args(
     all_args: AllArgumentInfo, project_configs: list[str]
-) -> None:
+) -> str:
+    """Renders the contents of the 'args.gn' file."""
+
+    lines = [
+        # os and cpu and is_debug
+        f'target_os = "{all_args.target_os}"',
+        f'target_cpu = "{all_args.target_cpu}"',
+        "is_debug = {}".format(
+            "true" if all_args.build_type == "debug" else "false"
+        ),
+        # The gn files read the facts written by 'probe_toolchain'.
+        "tgn_toolchain_probe = true",
+    ]
+
+    lines += project_configs
+
+    # Write the 'extra_args' specified in the command line to 'args.gn', so
+    # that gn can recognize them.
+    lines += [str(arg).replace("#", '"') for arg in all_args.extra_args_list]
+
+    return "".join(line + "\n" for line in lines)
+
+
+def write_gn_args(all_args: AllArgumentInfo, content: str) -> None:
     """Writes GN arguments to a file named 'args.gn'.
 
-    This 'args.gn' file would be in the 'out/' folder.
+    This 'args.gn' file would be in the 'out/' folder. The file is only
+    rewritten when its contents change, because 'args.gn' is one of the inputs
+    of 'build.ninja', and touching it would make ninja re-run 'gn gen'.
     """
 
     args_gn = os.path.join(os.getcwd(), all_args.out_dir, "args.gn")
-    with open(args_gn, "w", encoding="utf-8") as f:
-        # os and cpu and is_debug
-        f.write(f'target_os = "{all_args.target_os}"\n')
-        f.write(f'target_cpu = "{all_args.target_cpu}"\n')
-        f.write(
-            "is_debug = {}\n".format(
-                "true" if all_args.build_type == "debug" else "false"
-            )
-        )
-
-        for arg in project_configs:
-            f.write(arg + "\n")
+    if os.path.exists(args_gn):
+        with open(args_gn, "r", encoding="utf-8") as f:
+            if f.read() == content:
+                return
 
-        # Write the 'extra_args' specified in the command line to 'args.gn', so
-        # that gn can recognize them.
-        for arg in all_args.extra_args_list:
-            f.write(str(arg).replace("#", '"') + "\n")
+    with open(args_gn, "w", encoding="utf-8") as f:
+        f.write(content)
 
 
 def dump_gn_args(all_args: AllArgumentInfo) -> None:
@@ -434,8 +635,11 @@ def dump_gn_args(all_args: AllArgumentInfo) -> None:
     run_and_redirect_output(cmd, tgn_args_file)
 
 
-def prepare_gn_args(all_args: AllArgumentInfo) -> None:
-    """Prepares GN arguments by reading a PROJECTCONFIG.gn file."""
+def prepare_gn_args(all_args: AllArgumentInfo) -> str:
+    """Prepares GN arguments by reading a PROJECTCONFIG.gn file.
+
+    Returns the rendered contents of 'args.gn'.
+    """
 
     # Read the PROJECTCONFIG.gn file and parse out the project configs.
     project_configs = []
@@ -445,7 +649,157 @@ def prepare_gn_args(all_args: AllArgumentInfo) -> None:
                 project_configs.append(line.strip())
 
     # Write the project configs to the GN args file.
-    write_gn_args(all_args, project_configs)
+    content = render_gn_args(all_args, project_configs)
+    write_gn_args(all_args, content)
+    return content
+
+
+def hash_file_contents(path: str) -> str:
+    """Returns the sha256 of the file contents, or "" if it does not exist."""
+
+    if not os.path.isfile(path):
+        return ""
+
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def compute_gen_fingerprint(
+    all_args: AllArgumentInfo, args_gn_content: str
+) -> dict[str, str]:
+    """Collects everything that could change the result of 'gn gen'.
+
+    The .gn/.gni/BUILD.gn files read by gn are not part of the fingerprint,
+    because 'build.ninja.d' already tracks them, see 'is_build_ninja_current'.
+    """
+
+    # The gn binary is identified by its path, size and mtime, hashing its
+    # contents on every run would cost more than the check saves.
+    gn_stat = os.stat(all_args.gn_path)
+
+    return {
+        "version": str(GEN_FINGERPRINT_VERSION),
+        "args_gn": hashlib.sha256(args_gn_content.encode("utf-8")).hexdigest(),
+        "project_config": hash_file_contents("PROJECTCONFIG.gn"),
+        "extra_args": json.dumps(all_args.extra_args_list),
+        "gn": f"{all_args.gn_path}:{gn_stat.st_size}:{gn_stat.st_mtime_ns}",
+        "tgnconfig": hash_file_contents(
+            os.path.join(os.getcwd(), ".tgnconfig.json")
+        ),
+        "root": os.path.abspath(".").replace("\\", "/"),
+        "generator": all_args.generator,
+        "build_target": all_args.build_target,
+    }
+
+
+def load_gen_fingerprint(out_dir: str) -> dict[str, str]:
+    fingerprint_file = os.path.join(out_dir, GEN_FINGERPRINT_FILE)
+    try:
+        with open(fingerprint_file, "r", encoding="utf-8") as f:
+            fingerprint = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(fingerprint, dict):
+        return {}
+    return fingerprint
+
+
+def save_gen_fingerprint(out_dir: str, fingerprint: dict[str, str]) -> None:
+    fingerprint_file = os.path.join(out_dir, GEN_FINGERPRINT_FILE)
+    with open(fingerprint_file, "w", encoding="utf-8") as f:
+        json.dump(fingerprint, f, indent=2)
+
+
+def remove_gen_fingerprint(out_dir: str) -> None:
+    fingerprint_file = os.path.join(out_dir, GEN_FINGERPRINT_FILE)
+    if os.path.exists(fingerprint_file):
+        os.remove(fingerprint_file)
+
+
+def is_build_ninja_current(out_dir: str) -> bool:
+    """Checks whether 'build.ninja' is newer than every file gn read.
+
+    gn writes all the files it loads during 'gn gen' into 'build.ninja.d', this
+    is the same check ninja does before deciding to re-run 'gn gen'.
+    """
+
+    build_ninja = os.path.join(out_dir, "build.ninja")
+    build_ninja_d = build_ninja + ".d"
+
+    try:
+        build_ninja_mtime = os.stat(build_ninja).st_mtime_ns
+        with open(build_ninja_d, "r", encoding="utf-8") as f:
+            content = f.read()
+    except OSError:
+        return False
+
+    _, separator, deps = content.partition(": ")
+    if not separator:
+        return False
+
+    # Paths containing spaces are escaped with a backslash.
+    for dep in re.findall(r"(?:\\.|[^\s\\])+", deps):
+        dep = dep.replace("\\ ", " ")
+        if not os.path.isabs(dep):
+            dep = os.path.join(out_dir, dep)
+        try:
+            if os.stat(dep).st_mtime_ns > build_ninja_mtime:
+                return False
+        except OSError:
+            return False
+
+    return True
+
+
+def is_gen_up_to_date(
+    all_args: AllArgumentInfo, fingerprint: dict[str, str]
+) -> bool:
+    if all_args.force_gen:
+        return False
+
+    previous = load_gen_fingerprint(all_args.out_dir)
+
+    # The IDE files are only generated by 'tgn gen', the other commands do not
+    # need them, and are fine with the ones generated last time, if any.
+    if not fingerprint["generator"] and "generator" in previous:
+        previous = dict(previous, generator="")
+
+    if previous != fingerprint:
+        return False
+
+    for output in ["tgn_args.txt", "compile_commands.json"]:
+        if not os.path.exists(os.path.join(all_args.out_dir, output)):
+            return False
+
+    return is_build_ninja_current(all_args.out_dir)
+
+
+def copy_compile_commands(out_dir: str) -> None:
+    # Copy the generated compile_commands.json to the project root folder, so
+    # that some other tools can find it. Write a temporary file first, the
+    # tools might be reading the file meanwhile. An identical file is left
+    # alone, so that the tools do not reload it for nothing.
+    src_file = os.path.join(out_dir, "compile_commands.json")
+    if not os.path.exists(src_file):
+        return
+
+    dst_file = os.path.join(os.getcwd(), "compile_commands.json")
+    if os.path.exists(dst_file) and filecmp.cmp(
+        src_file, dst_file, shallow=False
+    ):
+        return
+
+    tmp_file = f"{dst_file}.{os.getpid()}.tmp"
+    try:
+        shutil.copy(src_file, tmp_file)
+        os.replace(tmp_file, dst_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
 
 
 def prepare_gn_files(all_args: AllArgumentInfo) -> None:
@@ -458,7 +812,8 @@ def prepare_gn_files(all_args: AllArgumentInfo) -> None:
     )
     default_build_file: str = os.path.abspath(all_args.script_path)
 
-    # If the symlink already exists, there's nothing to do.
+    # If the files are there rather than the symlinks, e.g. in the repo of
+    # tgn, there's nothing to do.
     if (
         os.path.exists(dot_file)
         and not os.path.islink(dot_file)
@@ -466,41 +821,109 @@ def prepare_gn_files(all_args: AllArgumentInfo) -> None:
     ):
         return
 
-    if sys.platform == "win32":
-        # On Windows, we can't just use ln, so we need to use mklink for both
-        # of these.
-        run_cmd("del -f .gn", False)
-        run_cmd("rmdir /s /q .gnfiles", False)
-        run_cmd(f"mklink .gn {default_dot_file}", False)
-        run_cmd(f"mklink /d .gnfiles {default_build_file}", False)
-    else:
-        # On other platforms, we can just use ln.
-        run_cmd(f"rm -f .gn; ln -s {default_dot_file} .gn", False)
-        run_cmd(
-            f"rm -f .gnfiles; ln -s {default_build_file} .gnfiles",
-            False,
+    def is_linked(path: str, target: str) -> bool:
+        return os.path.islink(path) and os.path.realpath(
+            path
+        ) == os.path.realpath(target)
+
+    # If the symlinks already exist, there's nothing to do either.
+    if is_linked(dot_file, default_dot_file) and is_linked(
+        build_file, default_build_file
+    ):
+        return
+
+    from build.scripts import fs_utils
+
+    try:
+        fs_utils.create_symlink(default_dot_file, dot_file)
+
+        if os.path.isdir(build_file) and not os.path.islink(build_file):
+            fs_utils.remove_tree(build_file)
+        fs_utils.create_symlink(
+            default_build_file, build_file, target_is_directory=True
         )
+    except OSError as e:
+        print(f"\n Failed to link the gn files of tgn: {e}\n")
+        sys.exit(-1)
 
 
-def filter_target(all_args: AllArgumentInfo) -> str:
-    """Get the label of the specified build target from 'gn ls' command.
+def get_build_ninja_stamp(out_dir: str) -> list[int]:
+    """Returns the size and mtime of 'build.ninja' and 'build.ninja.d', which
+    change whenever gn regenerates the build graph."""
+
+    stamp = []
+    for name in ["build.ninja", "build.ninja.d"]:
+        st = os.stat(os.path.join(out_dir, name))
+        stamp += [st.st_size, st.st_mtime_ns]
+    return stamp
+
+
+def create_label_index(labels: list[str]) -> dict:
+    """Creates the lookup tables of the gn labels.
 
-    It first runs the 'gn gen' command to generate build files. Then, it lists
-    all defined targets using the 'gn ls' command. It loops through each label
-    and checks if it matches the desired build target. If a match is found, it
-    returns the label. Otherwise, it returns an empty string.
+    'by_name' maps the short name of a target to all the labels with that name,
+    and 'by_dir_name' maps 'dir:name' to the label.
     """
 
-    if not all_args.build_target:
-        return ""
+    by_name: dict[str, list[str]] = {}
+    by_dir_name: dict[str, str] = {}
 
-    # 'gen' first.
-    cmd = "{} gen {} --root={}".format(
-        all_args.gn_path,
-        all_args.out_dir,
-        os.path.abspath(".").replace("\\", "/"),
-    )
-    run_cmd(cmd, echo=all_args.verbose)
+    for label in labels:
+        label = label.strip()
+        if label.find(":") == -1:
+            # Every gn label should contain a ":", so I wonder if this case
+            # could happen.
+            continue
+
+        label_dir, label_name = label.split(":", 1)
+
+        by_name.setdefault(label_name, []).append(label)
+        by_dir_name.setdefault(f"{label_dir}:{label_name}", label)
+
+    return {
+        "version": LABEL_INDEX_VERSION,
+        "by_name": by_name,
+        "by_dir_name": by_dir_name,
+    }
+
+
+def load_label_index(out_dir: str) -> dict | None:
+    """Loads the label index if the build graph has not changed since it was
+    created."""
+
+    label_index_file = os.path.join(out_dir, LABEL_INDEX_FILE)
+    try:
+        with open(label_index_file, "r", encoding="utf-8") as f:
+            label_index = json.load(f)
+        build_ninja_stamp = get_build_ninja_stamp(out_dir)
+    except (OSError, ValueError):
+        return None
+
+    if (
+        not isinstance(label_index, dict)
+        or label_index.get("version") != LABEL_INDEX_VERSION
+        or label_index.get("build_ninja_stamp") != build_ninja_stamp
+    ):
+        return None
+
+    if not is_build_ninja_current(out_dir):
+        return None
+
+    return label_index
+
+
+def update_label_index(all_args: AllArgumentInfo) -> dict:
+    """Lists all the targets with 'gn ls', and saves them into the label
+    index."""
+
+    # 'gen' first, if the build graph is out of date.
+    if not is_build_ninja_current(all_args.out_dir):
+        cmd = "{} gen {} --root={}".format(
+            all_args.gn_path,
+            all_args.out_dir,
+            os.path.abspath(".").replace("\\", "/"),
+        )
+        run_cmd(cmd, echo=all_args.verbose)
 
     # Then, list all defined targets.
     cmd = "{} ls {} --root={}".format(
@@ -508,34 +931,103 @@ def filter_target(all_args: AllArgumentInfo) -> str:
         all_args.out_dir,
         os.path.abspath(".").replace("\\", "/"),
     )
-    _, labels = get_cmd_output(cmd, echo=all_args.verbose)
+    status, labels = get_cmd_output(cmd, echo=all_args.verbose)
 
-    separator = all_args.build_target.find(":")
-    if separator != -1:
-        desired_label_name = all_args.build_target[(separator + 1) :]  # noqa
-        desired_label_dir = all_args.build_target[0:separator]
-    else:
-        desired_label_name = all_args.build_target
-        desired_label_dir = ""
+    label_index = create_label_index(labels.split("\n"))
 
-    for label in labels.split("\n"):
-        if str(label).find(":") == -1:
-            # Every gn label should contain a ":", so I wonder if this case
-            # could happen.
-            continue
+    # Do not cache the result of a failed 'gn ls', it may be incomplete.
+    if status == 0:
+        try:
+            label_index["build_ninja_stamp"] = get_build_ninja_stamp(
+                all_args.out_dir
+            )
+            with open(
+                os.path.join(all_args.out_dir, LABEL_INDEX_FILE),
+                "w",
+                encoding="utf-8",
+            ) as f:
+                json.dump(label_index, f)
+        except OSError:
+            pass
 
-        label_dir, label_name = label.split(":")
+    return label_index
 
-        if desired_label_dir and label_dir != desired_label_dir:
-            continue
 
-        if label_name == desired_label_name:
+def restamp_label_index(out_dir: str, previous_stamp: list[int]) -> None:
+    """'gn gen --filters' rewrites 'build.ninja', but does not change the
+    targets. Moves the label index which was valid for 'previous_stamp' to
+    the new 'build.ninja', so that the filtered 'gn gen' does not invalidate
+    it."""
+
+    label_index_file = os.path.join(out_dir, LABEL_INDEX_FILE)
+    try:
+        with open(label_index_file, "r", encoding="utf-8") as f:
+            label_index = json.load(f)
+        if (
+            not isinstance(label_index, dict)
+            or label_index.get("version") != LABEL_INDEX_VERSION
+            or label_index.get("build_ninja_stamp") != previous_stamp
+        ):
+            return
+
+        label_index["build_ninja_stamp"] = get_build_ninja_stamp(out_dir)
+        with open(label_index_file, "w", encoding="utf-8") as f:
+            json.dump(label_index, f)
+    except (OSError, ValueError):
+        pass
+
+
+def filter_target(all_args: AllArgumentInfo) -> str:
+    """Get the label of the specified build target.
+
+    The labels of all defined targets are cached in the label index in the out
+    dir. The index is reused as long as 'build.ninja' is up to date and
+    unchanged since the index was created, otherwise it is recreated by
+    running 'gn gen' (if needed) and 'gn ls'. The desired build target, either
+    'name' or 'dir:name', is then looked up in the index. If the target is
+    unknown or the name is ambiguous, the process exits.
+    """
+
+    if not all_args.build_target:
+        return ""
+
+    label_index = load_label_index(all_args.out_dir)
+    if label_index is None:
+        label_index = update_label_index(all_args)
+
+    if all_args.build_target.find(":") != -1:
+        label = label_index["by_dir_name"].get(all_args.build_target)
+        if label:
             return label
+    else:
+        candidates = label_index["by_name"].get(all_args.build_target, [])
+        if len(candidates) == 1:
+            return candidates[0]
+
+        if len(candidates) > 1:
+            print(
+                f"\nAmbiguous target '{all_args.build_target}', candidates"
+                " are:"
+            )
+            for candidate in candidates:
+                print(f"  {candidate}")
+            print("\nPlease specify the target as 'dir:name'.\n")
+            sys.exit(-1)
 
     print(f"\nUnknown target '{all_args.build_target}'\n")
     sys.exit(-1)
 
 
+def probe_toolchain(all_args: AllArgumentInfo) -> None:
+    """Writes the facts of the host toolchain needed by the gn files to the
+    out dir, so that 'gn gen' does not need to run a script for each of them.
+    The file is only rewritten when the facts change."""
+
+    from build.scripts import toolchain_probe
+
+    toolchain_probe.probe(all_args.out_dir)
+
+
 def generate_solution(all_args: AllArgumentInfo) -> None:
     """This function prepares GN (Generate Ninja) arguments and files.
 
@@ -543,20 +1035,49 @@ def generate_solution(all_args: AllArgumentInfo) -> None:
     the appropriate flags. It runs the 'gn gen' command to generate the build
     files. If a compile_commands.json file is generated, it copies this file to
     the project root directory. So that many other tools could find this file.
+
+    If nothing affecting the generated files has changed since the last
+    successful generation, 'gn gen' is skipped, unless '--force-gen' is
+    specified.
     """
 
-    prepare_gn_args(all_args)
-    prepare_gn_files(all_args)
+    # In the matrix mode, the parent process prepares the gn files once, and
+    # copies the compile_commands.json of one of the configurations, the
+    # configurations are generated concurrently.
+    is_matrix_child = all_args.matrix_phase is not None
+
+    args_gn_content = prepare_gn_args(all_args)
+    if not is_matrix_child:
+        prepare_gn_files(all_args)
+    probe_toolchain(all_args)
     all_args.generator = get_generator(all_args)
 
+    fingerprint = compute_gen_fingerprint(all_args, args_gn_content)
+    if is_gen_up_to_date(all_args, fingerprint):
+        if all_args.verbose:
+            print(f"'{all_args.out_dir}' is up to date, skip 'gn gen'.")
+
+        # The project root might hold the file of another out dir.
+        if not is_matrix_child:
+            copy_compile_commands(all_args.out_dir)
+        return
+
+    # The previous fingerprint is no longer valid, even if the following 'gn
+    # gen' fails.
+    remove_gen_fingerprint(all_args.out_dir)
+
     ide_arg = (
         f"--ide={all_args.generator}" if len(all_args.generator) != 0 else ""
     )
     ide_flag = ""
     generator_target = ""
+    label_index_stamp = None
 
     if all_args.build_target:
         generator_target = '--filters="' + filter_target(all_args) + '"'
+        # filter_target() leaves the label index valid for the current
+        # 'build.ninja'.
+        label_index_stamp = get_build_ninja_stamp(all_args.out_dir)
 
     if str(all_args.generator).startswith("xcode"):
         ide_flag = "--xcode-build-system=new"
@@ -575,37 +1096,63 @@ def generate_solution(all_args: AllArgumentInfo) -> None:
     )
     run_or_die(cmd, echo=all_args.verbose)
 
-    # Copy the generated compile_commands.json to the project root folder, so
-    # that some other tools can find it.
-    if os.path.exists(os.path.join(all_args.out_dir, "compile_commands.json")):
-        shutil.copy(
-            os.path.join(all_args.out_dir, "compile_commands.json"),
-            os.path.join(os.getcwd(), "compile_commands.json"),
-        )
+    if label_index_stamp is not None:
+        restamp_label_index(all_args.out_dir, label_index_stamp)
+
+    if not is_matrix_child:
+        copy_compile_commands(all_args.out_dir)
 
     dump_gn_args(all_args)
 
+    save_gen_fingerprint(all_args.out_dir, fingerprint)
+
 
 def generate_dep_graph(all_args: AllArgumentInfo):
-    """Use the 'gn gen' command with the --dot flag to generate a dependency
-    graph between projects.
-    """
+    """Exports the dependency graph between the gn targets into the out dir.
 
-    prepare_gn_args(all_args)
-    prepare_gn_files(all_args)
+    The graph is read from the generated ninja files, and written as
+    'ag_graph.json' and 'ag_graph.dot' by default. 'ag_graph.html' is a
+    self-contained viewer for large graphs, and 'ag_graph.svg' is rendered by
+    graphviz 'dot' if requested.
+    """
 
-    keeprsp_flag = "-d keeprsp" if all_args.build_type == "debug" else ""
+    from build.scripts import graph_export
 
-    cmd = (
-        f"{all_args.ninja_path} {keeprsp_flag} -C {all_args.out_dir} -t graph"
-        f" {all_args.build_target} >/tmp/ag_graph.dot"
+    formats = split_matrix_values(
+        all_args.graph_format, ["json", "dot", "html", "svg"], "graph format"
     )
-    run_or_die(cmd, echo=all_args.verbose)
 
-    cmd = "dot -Tsvg /tmp/ag_graph.dot -o {}".format(
-        os.path.join(all_args.out_dir, "ag_graph.svg")
-    )
-    run_or_die(cmd, echo=all_args.verbose)
+    export_formats = [fmt for fmt in formats if fmt != "svg"]
+    if "svg" in formats and "dot" not in export_formats:
+        export_formats.append("dot")
+
+    try:
+        written_files = graph_export.export_graph(
+            all_args.out_dir,
+            all_args.build_target,
+            all_args.graph_depth,
+            all_args.graph_prefix,
+            all_args.graph_collapse,
+            export_formats,
+        )
+    except ValueError as exc:
+        print(f"\n{exc}\n")
+        sys.exit(-1)
+
+    if "svg" in formats:
+        dot_file = os.path.join(
+            all_args.out_dir, graph_export.GRAPH_FILE_NAME + ".dot"
+        )
+        svg_file = os.path.join(
+            all_args.out_dir, graph_export.GRAPH_FILE_NAME + ".svg"
+        )
+        run_or_die(
+            f"dot -Tsvg {dot_file} -o {svg_file}", echo=all_args.verbose
+        )
+        written_files.append(svg_file)
+
+    for written_file in written_files:
+        print(written_file)
 
 
 def build_solution(all_args: AllArgumentInfo) -> None:
@@ -615,9 +1162,10 @@ def build_solution(all_args: AllArgumentInfo) -> None:
     """
 
     keeprsp_flag = "-d keeprsp" if all_args.build_type == "debug" else ""
+    jobs_flag = f"-j {all_args.jobs}" if all_args.jobs else ""
 
     cmd: str = (
-        f"{all_args.ninja_path} {keeprsp_flag} -C"
+        f"{all_args.ninja_path} {keeprsp_flag} {jobs_flag} -C"
         f" {all_args.out_dir} {'-v' if all_args.verbose else ''}"
         f" {all_args.build_target}"
     )
@@ -748,21 +1296,107 @@ def clean_solution(all_args: AllArgumentInfo) -> None:
     )
 
 
+def stats_solution(all_args: AllArgumentInfo, top: int = 10) -> None:
+    """Reports where the time of the last build went, based on the
+    '.ninja_log' in the out dir. The report is also saved as JSON in the out
+    dir, so that it could be tracked over time."""
+
+    from build.scripts import build_stats
+
+    stats = build_stats.collect_build_stats(all_args.out_dir, top)
+    print(build_stats.format_build_stats(stats))
+
+    stats_file = build_stats.write_build_stats(all_args.out_dir, stats)
+    if all_args.verbose:
+        print(f"\nBuild stats are saved to {stats_file}")
+
+
+def show_critical_path(all_args: AllArgumentInfo) -> None:
+    """Prints the longest chain of edges of the build target, weighted by the
+    durations of the last build, and estimates the best-case wall time."""
+
+    from build.scripts import critical_path
+
+    try:
+        result = critical_path.find_critical_path(
+            all_args.out_dir, all_args.build_target
+        )
+    except ValueError as exc:
+        print(f"\n{exc}\n")
+        sys.exit(-1)
+
+    print(critical_path.format_critical_path(result, get_cpu_count()))
+
+
+def read_dumped_gn_args(out_dir: str) -> dict[str, str]:
+    """Reads the values of the gn args saved by 'dump_gn_args'."""
+
+    args: dict[str, str] = {}
+    tgn_args_file = os.path.join(out_dir, "tgn_args.txt")
+    if not os.path.exists(tgn_args_file):
+        return args
+
+    with open(tgn_args_file, "r", encoding="utf-8") as f:
+        for line in f:
+            name, separator, value = line.partition(" = ")
+            if separator:
+                args[name.strip()] = value.strip().strip('"')
+    return args
+
+
+def show_compile_cache(all_args: AllArgumentInfo) -> None:
+    """Shows the statistics of the compile cache used by the out dir, or clears
+    the cache with 'compile_cache:clear'."""
+
+    from build.scripts import compile_cache
+
+    gn_args = read_dumped_gn_args(all_args.out_dir)
+
+    cache_dir = gn_args.get("compile_cache_dir", "")
+    if cache_dir.startswith("//"):
+        cache_dir = os.path.join(os.getcwd(), cache_dir[2:])
+    elif cache_dir:
+        cache_dir = os.path.abspath(cache_dir)
+    else:
+        cache_dir = compile_cache.get_default_cache_dir()
+
+    max_size_mb = int(
+        gn_args.get(
+            "compile_cache_max_size_mb", compile_cache.DEFAULT_MAX_SIZE_MB
+        )
+    )
+
+    cache = compile_cache.CompileCache(cache_dir, max_size_mb)
+
+    if all_args.build_target == "clear":
+        cache.clear()
+        print(f"Compile cache {cache.cache_dir} is cleared.")
+    elif all_args.build_target:
+        print(f"\n Invalid compile_cache action '{all_args.build_target}'\n")
+        sys.exit(-1)
+    else:
+        if gn_args.get("enable_compile_cache", "false") != "true":
+            print(
+                "The compile cache is not enabled in"
+                f" {all_args.out_dir}, set 'enable_compile_cache = true' in"
+                " the gn args to enable it.\n"
+            )
+        print(compile_cache.format_stats(cache))
+
+
 def uninstall_solution() -> None:
     """This function removes the .gn and .gnfiles directories from the project
     root.
     """
 
-    if os.path.exists(".gn"):
-        if sys.platform == "win32":
-            run_cmd("del /f .gn", False)
-        else:
-            run_cmd("rm -rf .gn", False)
-    if os.path.exists(".gnfiles"):
-        if sys.platform == "win32":
-            run_cmd("rmdir /s /q .gnfiles", False)
-        else:
-            run_cmd("rm -rf .gnfiles", False)
+    from build.scripts import fs_utils
+
+    for path in [".gn", ".gnfiles"]:
+        try:
+            fs_utils.remove_path(path)
+        except OSError as e:
+            print(f"\n Failed to remove {path}: {e}\n")
+            sys.exit(-1)
 
 
 def setup_pythonpath() -> None:
@@ -795,116 +1429,323 @@ def setup_pythonpath() -> None:
                 os.environ["PYTHONPATH"] = new_pythonpath
 
 
+def setup_script_path(all_args: AllArgumentInfo) -> None:
+    """Makes the helper modules in '.gnfiles/build/scripts' importable, even if
+    tgn is not started by the 'tgn' wrapper, which sets PYTHONPATH."""
+
+    if all_args.script_path not in sys.path:
+        sys.path.insert(0, all_args.script_path)
+
+
+def collect_trash() -> None:
+    """Resumes removing the trees left by the interrupted background removals
+    of the previous builds, in the background."""
+
+    from build.scripts import trash
+
+    trash.collect_trash()
+
+
 def setup_env() -> None:
     setup_pythonpath()
     os.environ["NINJA_STATUS"] = "[%f/%t](%r) "
 
 
-def main(argv: list[str]) -> int:
-    """This is the main function that orchestrates the entire script.
-
-    = It first checks the Python version.
-    = It parses the command-line arguments to determine the desired action
-      (e.g., generate dependency graph, build, clean).
-    = Depending on the provided command, it calls the appropriate function to
-    perform the desired action.
-    """
+def generate_if_needed(all_args: AllArgumentInfo) -> None:
+    # Check if the project has already been generated. If not, generate the
+    # project first.
+    gn_file = os.path.join(".", all_args.out_dir, "build.ninja")
+    if not os.path.exists(gn_file):
+        generate_solution(all_args)
 
-    check_python_version()
-    setup_env()
 
-    all_args = create_all_args()
-    determine_essential_paths(all_args)
+def prepare_solution(all_args: AllArgumentInfo) -> None:
+    """Generates the build files needed by the command."""
 
-    # If there is a '--' in the command line, the part preceding it is
-    # considered as 'main_args', while the part following it is considered as
-    # 'extra_args'.
-    if "--" in argv:
-        main_args_list = argv[: argv.index("--")]
-        extra_args_list = argv[argv.index("--") + 1 :]  # noqa
+    if all_args.build_command in ["gen", "rebuild"]:
+        generate_solution(all_args)
+    elif all_args.build_command in ["uninstall", "stats"]:
+        pass
     else:
-        main_args_list = argv
-        extra_args_list = []
+        generate_if_needed(all_args)
 
-    parse_main_args(all_args, main_args_list)
-    all_args.extra_args_list = extra_args_list
 
-    create_out_dir(all_args)
+def run_solution(all_args: AllArgumentInfo) -> None:
+    """Performs the command on the generated build files."""
 
     if all_args.build_command == "graph":
         generate_dep_graph(all_args)
     elif all_args.build_command == "gen":
-        generate_solution(all_args)
+        pass
     elif all_args.build_command == "build":
-        # Check if the project has already been generated. If not, generate the
-        # project first.
-        gn_file = os.path.join(".", all_args.out_dir, "build.ninja")
-        if not os.path.exists(gn_file):
-            generate_solution(all_args)
         build_solution(all_args)
+        if all_args.stats:
+            stats_solution(all_args, top=5)
     elif all_args.build_command == "rebuild":
         # Cleanup the build results, and build again.
-        generate_solution(all_args)
         gn_file = os.path.join(".", all_args.out_dir, "build.ninja")
         if os.path.exists(gn_file):
             clean_solution(all_args)
         build_solution(all_args)
+        if all_args.stats:
+            stats_solution(all_args, top=5)
     elif all_args.build_command == "clean":
-        gn_file = os.path.join(".", all_args.out_dir, "build.ninja")
-        if not os.path.exists(gn_file):
-            generate_solution(all_args)
         clean_solution(all_args)
     elif all_args.build_command == "uninstall":
         uninstall_solution()
     elif all_args.build_command == "explain_build":
-        gn_file = os.path.join(".", all_args.out_dir, "build.ninja")
-        if not os.path.exists(gn_file):
-            generate_solution(all_args)
         explain_build_solution(all_args)
     elif all_args.build_command == "show_input_output":
-        gn_file = os.path.join(".", all_args.out_dir, "build.ninja")
-        if not os.path.exists(gn_file):
-            generate_solution(all_args)
         show_input_output_solution(all_args)
     elif all_args.build_command == "show_input":
-        gn_file = os.path.join(".", all_args.out_dir, "build.ninja")
-        if not os.path.exists(gn_file):
-            generate_solution(all_args)
         show_input_solution(all_args)
     elif all_args.build_command == "show_deps":
-        gn_file = os.path.join(".", all_args.out_dir, "build.ninja")
-        if not os.path.exists(gn_file):
-            generate_solution(all_args)
         show_deps_solution(all_args)
     elif all_args.build_command == "desc":
-        gn_file = os.path.join(".", all_args.out_dir, "build.ninja")
-        if not os.path.exists(gn_file):
-            generate_solution(all_args)
         desc_solution(all_args)
     elif all_args.build_command == "path":
-        gn_file = os.path.join(".", all_args.out_dir, "build.ninja")
-        if not os.path.exists(gn_file):
-            generate_solution(all_args)
         show_path(all_args)
     elif all_args.build_command == "refs":
-        gn_file = os.path.join(".", all_args.out_dir, "build.ninja")
-        if not os.path.exists(gn_file):
-            generate_solution(all_args)
         show_refs(all_args)
     elif all_args.build_command == "args":
-        gn_file = os.path.join(".", all_args.out_dir, "build.ninja")
-        if not os.path.exists(gn_file):
-            generate_solution(all_args)
         show_args(all_args)
     elif all_args.build_command == "check":
-        gn_file = os.path.join(".", all_args.out_dir, "build.ninja")
-        if not os.path.exists(gn_file):
-            generate_solution(all_args)
         check_solution(all_args)
+    elif all_args.build_command == "stats":
+        stats_solution(all_args)
+    elif all_args.build_command == "critical_path":
+        show_critical_path(all_args)
+    elif all_args.build_command == "compile_cache":
+        show_compile_cache(all_args)
     else:
         pass
+
+
+# Commands which could be performed on several configurations at once.
+MATRIX_COMMANDS = ["gen", "build", "rebuild", "clean", "stats"]
+
+
+def get_cpu_count() -> int:
+    """Returns the number of CPUs the build could use, which honors the cgroup
+    CPU quota in a container."""
+
+    from build.scripts import get_cpu_count as cpu_count_detector
+
+    return cpu_count_detector.get_cpu_count()
+
+
+def split_jobs(total_jobs: int, count: int) -> list[int]:
+    """Splits the ninja job slots as evenly as possible, every configuration
+    gets at least one slot."""
+
+    jobs = [max(1, total_jobs // count)] * count
+    for i in range(max(0, total_jobs - sum(jobs))):
+        jobs[i % count] += 1
+    return jobs
+
+
+def create_matrix_child_argv(
+    all_args: AllArgumentInfo,
+    config: tuple[str, str, str],
+    phase: str,
+    jobs: int | None,
+) -> list[str]:
+    target_os, target_cpu, build_type = config
+
+    argv = [sys.executable, os.path.realpath(__file__)]
+    if all_args.verbose:
+        argv.append("--verbose")
+    if all_args.force_gen:
+        argv.append("--force-gen")
+    if all_args.out_dir_per_build_type:
+        argv.append("--out-dir-per-build-type")
+    if all_args.stats:
+        argv.append("--stats")
+    if jobs:
+        argv += ["-j", str(jobs)]
+    argv += ["--out-dir", all_args.base_out_dir, "--matrix-phase", phase]
+
+    command = all_args.build_command
+    if all_args.build_target:
+        command += ":" + all_args.build_target
+    argv += [command, target_os, target_cpu, build_type]
+
+    if all_args.extra_args_list:
+        argv += ["--"] + all_args.extra_args_list
+    return argv
+
+
+def run_matrix_phase(
+    all_args: AllArgumentInfo,
+    configs: list[tuple[str, str, str]],
+    phase: str,
+    jobs: list[int | None],
+) -> dict[tuple[str, str, str], tuple[int, float]]:
+    """Runs one phase of all the configurations concurrently in child
+    processes. Each line of the output of a child is prefixed with its
+    configuration. Returns the exit code and the duration of each
+    configuration."""
+
+    output_lock = threading.Lock()
+    results: dict[tuple[str, str, str], tuple[int, float]] = {}
+    start = time.monotonic()
+
+    def forward_output(
+        config: tuple[str, str, str], child: subprocess.Popen
+    ) -> None:
+        prefix = "[{}]".format("/".join(config))
+
+        assert child.stdout is not None
+        for line in child.stdout:
+            with output_lock:
+                sys.stdout.write(f"{prefix} {line.rstrip()}\n")
+                sys.stdout.flush()
+
+        results[config] = (child.wait(), time.monotonic() - start)
+
+    children = []
+    for config, config_jobs in zip(configs, jobs):
+        argv = create_matrix_child_argv(all_args, config, phase, config_jobs)
+        if all_args.verbose:
+            print(f">>> {' '.join(argv)}")
+
+        child = subprocess.Popen(
+            argv,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        )
+        reader = threading.Thread(
+            target=forward_output, args=(config, child), daemon=True
+        )
+        reader.start()
+        children.append(reader)
+
+    for reader in children:
+        reader.join()
+
+    return results
+
+
+def run_matrix(all_args: AllArgumentInfo) -> int:
+    """Performs the command on every OS/CPU/build-type combination.
+
+    All the configurations are generated in parallel first, then the command
+    is performed on all of them in parallel, and the ninja job slots are split
+    across the builds. Returns a non-zero exit code if any configuration
+    fails.
+    """
+
+    if all_args.build_command not in MATRIX_COMMANDS:
+        print(
+            f"\n Command '{all_args.build_command}' does not support"
+            " several configurations, possible commands are:"
+            f" {', '.join(MATRIX_COMMANDS)}\n"
+        )
+        return -1
+
+    configs = all_args.matrix
+    status: dict[tuple[str, str, str], int] = {}
+    durations: dict[tuple[str, str, str], float] = {}
+
+    # Once for all the configurations, before they are generated
+    # concurrently.
+    prepare_gn_files(all_args)
+
+    gen_results = run_matrix_phase(
+        all_args, configs, "gen", [None] * len(configs)
+    )
+    for config in configs:
+        status[config], durations[config] = gen_results[config]
+
+    # The compile_commands.json in the project root is the one of the first
+    # configuration which is generated successfully.
+    for config in configs:
+        if status[config] == 0:
+            copy_compile_commands(
+                get_out_dir(
+                    all_args.base_out_dir,
+                    *config,
+                    all_args.out_dir_per_build_type,
+                )
+            )
+            break
+
+    if all_args.build_command != "gen":
+        run_configs = [config for config in configs if status[config] == 0]
+        if run_configs:
+            total_jobs = all_args.jobs
+            if not total_jobs:
+                # The same default as ninja.
+                total_jobs = get_cpu_count() + 2
+
+            run_results = run_matrix_phase(
+                all_args,
+                run_configs,
+                "run",
+                list(split_jobs(total_jobs, len(run_configs))),
+            )
+            for config in run_configs:
+                status[config], duration = run_results[config]
+                durations[config] += duration
+
+    print("")
+    for config in configs:
+        print(
+            "[{}] {} ({:.1f}s)".format(
+                "/".join(config),
+                "succeeded" if status[config] == 0 else "FAILED",
+                durations[config],
+            )
+        )
+
+    return 0 if all(code == 0 for code in status.values()) else 1
+
+
+def main(argv: list[str]) -> int:
+    """This is the main function that orchestrates the entire script.
+
+    = It first checks the Python version.
+    = It parses the command-line arguments to determine the desired action
+      (e.g., generate dependency graph, build, clean).
+    = Depending on the provided command, it calls the appropriate function to
+    perform the desired action.
+    """
+
+    check_python_version()
+    setup_env()
+
+    all_args = create_all_args()
+    determine_essential_paths(all_args)
+    setup_script_path(all_args)
+    collect_trash()
+
+    # If there is a '--' in the command line, the part preceding it is
+    # considered as 'main_args', while the part following it is considered as
+    # 'extra_args'.
+    if "--" in argv:
+        main_args_list = argv[: argv.index("--")]
+        extra_args_list = argv[argv.index("--") + 1 :]  # noqa
+    else:
+        main_args_list = argv
+        extra_args_list = []
+
+    parse_main_args(all_args, main_args_list)
+    all_args.extra_args_list = extra_args_list
+
+    if len(all_args.matrix) > 1:
+        return run_matrix(all_args)
+
+    create_out_dir(all_args)
+
+    if all_args.matrix_phase != "run":
+        prepare_solution(all_args)
+    if all_args.matrix_phase != "gen":
+        run_solution(all_args)
     return 0
 
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    sys.exit(main(sys.argv[1:]))